@@ -18,9 +18,16 @@ General hotkeys:
 
 __version__ =  "220115"
 
-import sys, re
+import sys, re, time, struct, mmap
 from math import *
-from inspect import stack
+from bisect import bisect
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 if sys.version_info[0] == 3:
     from tkinter.colorchooser import *
@@ -41,6 +48,306 @@ P = lambda x, y: x - 2 * y * int(x / (2 * y) + [-1, 1][x > 0] / 2.0)
 """Return Tk color by RGB."""
 rgb = lambda r, g, b: '#%02x%02x%02x' % (r, g, b)
 
+class ProjCache:
+    """LRU cache of projected `points` by projection key and object tag.
+    Size is bounded by number of cached points."""
+    def __init__(self, maxpoints=1000000):
+        """MAXPOINTS (opt.) max. number of points to keep."""
+        self.maxpoints = maxpoints
+        self.npoints = 0
+        self.items = OrderedDict()  # (key, ftag): points
+        self.keys = {}              # ftag: set of keys
+
+    def get(self, key, ftag):
+        """Return cached `points` or None. Mark as recently used."""
+        points = self.items.pop((key, ftag), None)
+        if points is not None:
+            self.items[(key, ftag)] = points
+        return points
+
+    def put(self, key, ftag, points):
+        """Save `points` of object FTAG for projection KEY."""
+        self.npoints -= len(self.items.pop((key, ftag), ()))
+        self.items[(key, ftag)] = points
+        self.keys.setdefault(ftag, set()).add(key)
+        self.npoints += len(points)
+        # drop least recently used
+        while self.npoints > self.maxpoints and len(self.items) > 1:
+            (_key, _ftag), _points = self.items.popitem(last=False)
+            self.npoints -= len(_points)
+            self.keys[_ftag].discard(_key)
+
+    def discard(self, *ftags):
+        """Drop cached `points` of objects in all projections."""
+        for ftag in ftags:
+            for key in self.keys.pop(ftag, ()):
+                self.npoints -= len(self.items.pop((key, ftag), ()))
+
+    def clear(self):
+        self.items.clear()
+        self.keys.clear()
+        self.npoints = 0
+
+class GridIndex:
+    """Uniform grid spatial index of objects bounds (in degrees)."""
+    def __init__(self, cell=10.0):
+        """CELL (opt.) cell size (in degrees)."""
+        self.cell = cell
+        self.cells = {}   # (i, j): set of ftags
+        self.bounds = {}  # ftag: [left, bottom, right, top]
+
+    def __cells(self, left, bottom, right, top):
+        """Return list of cell keys covered by rect."""
+        cl = lambda v, lim: int(floor((min(max(v, -lim), lim) + lim) / self.cell))
+        return [(i, j) for i in range(cl(left, 180), cl(right, 180) + 1)
+                       for j in range(cl(bottom, 90), cl(top, 90) + 1)]
+
+    def insert(self, ftag, bounds):
+        """Add or move object FTAG with BOUNDS [left, bottom, right, top]."""
+        self.remove(ftag)
+        if bounds:
+            self.bounds[ftag] = bounds
+            for key in self.__cells(*bounds):
+                self.cells.setdefault(key, set()).add(ftag)
+
+    def remove(self, ftag):
+        """Delete object FTAG from index."""
+        bounds = self.bounds.pop(ftag, None)
+        if bounds:
+            for key in self.__cells(*bounds):
+                self.cells[key].discard(ftag)
+                if not self.cells[key]:
+                    del self.cells[key]
+
+    def intersects(self, ftag, rects):
+        """Return True if bounds of FTAG intersect one of RECTS."""
+        left, bottom, right, top = self.bounds.get(ftag, (0, 0, -1, -1))
+        for _left, _bottom, _right, _top in rects:
+            if left <= _right and _left <= right and bottom <= _top and _bottom <= top:
+                return True
+        return False
+
+    def query(self, *rects):
+        """Return set of tags with bounds intersecting one of RECTS [left, bottom, right, top]."""
+        found = set()
+        for rect in rects:
+            for key in self.__cells(*rect):
+                found.update(self.cells.get(key, ()))
+        return set([ftag for ftag in found if self.intersects(ftag, rects)])
+
+    def clear(self):
+        self.cells.clear()
+        self.bounds.clear()
+
+class TkBatch:
+    """Canvas commands queued in batch mode and evaluated by one Tcl call.
+    Use as context manager, nested blocks are flushed at exit of outer one.
+    Out of batch mode commands are called at once."""
+    def __init__(self, canvas):
+        """CANVAS Tk Canvas."""
+        self.canvas = canvas
+        self.depth = 0
+        self.cmds = []
+        self.defined = 0
+
+    def __enter__(self):
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if not self.depth:
+            self.flush()
+        return False
+
+    def __queue(self, *args, **kw):
+        """Add canvas command with options. Return index of its result in flush."""
+        for k, v in kw.items():
+            if v is not None:
+                args += ('-' + k, v)
+        self.cmds.append((str(self.canvas),) + args)
+        return len(self.cmds) - 1
+
+    def create(self, kind, points, **kw):
+        """Create item KIND {line|polygon|oval|text|image} by POINTS.
+        Return item id or index of id in flush if batch."""
+        if not self.depth:
+            return getattr(self.canvas, 'create_' + kind)(points, **kw)
+        return self.__queue('create', kind, tuple(points), **kw)
+
+    def delete(self, *tags):
+        if not self.depth:
+            return self.canvas.delete(*tags)
+        self.__queue('delete', *tags)
+
+    def coords(self, tag, points):
+        if not self.depth:
+            return self.canvas.coords(tag, *points)
+        self.__queue('coords', tag, tuple(points))
+
+    def itemconfigure(self, tag, **kw):
+        if not self.depth:
+            return self.canvas.itemconfigure(tag, **kw)
+        self.__queue('itemconfigure', tag, **kw)
+
+    def scale(self, tag, x, y, xscale, yscale):
+        if not self.depth:
+            return self.canvas.scale(tag, x, y, xscale, yscale)
+        self.__queue('scale', tag, x, y, xscale, yscale)
+
+    def lower(self, tag, below):
+        if not self.depth:
+            return self.canvas.tag_lower(tag, below)
+        self.__queue('lower', tag, below)
+
+    def flush(self):
+        """Evaluate queued commands by one Tcl call. Return list of results (item ids for create)."""
+        cmds, self.cmds = self.cmds, []
+        if not cmds:
+            return []
+        tk = self.canvas.tk
+        if not self.defined:
+            tk.eval('proc dbcarta_batch {cmds} {set res {}; foreach cmd $cmds {lappend res [{*}$cmd]}; return $res}')
+            self.defined = 1
+        return list(tk.splitlist(tk.call('dbcarta_batch', tuple(cmds))))
+
+class LayerIndex:
+    """Registry of objects by layer with monotonic tag counters."""
+    def __init__(self):
+        self.seq = 0       # number of next object
+        self.ftags = {}    # ftype: set of ftags
+        self.ftype = {}    # ftag: ftype
+        self.counters = {} # ftype: last index from freeTag
+
+    def newTag(self, ftype, tag):
+        """Return new unique tag of object as `number_ftype_tag` and add it to layer FTYPE."""
+        ftag = '%04d_%s_%s' % (self.seq, ftype, tag)
+        self.seq += 1
+        self.add(ftag, ftype)
+        return ftag
+
+    def add(self, ftag, ftype):
+        """Add object FTAG to layer FTYPE."""
+        self.remove(ftag)
+        self.ftype[ftag] = ftype
+        self.ftags.setdefault(ftype, set()).add(ftag)
+
+    def remove(self, ftag):
+        """Delete object FTAG from its layer."""
+        ftype = self.ftype.pop(ftag, None)
+        if ftype is not None:
+            self.ftags[ftype].discard(ftag)
+            if not self.ftags[ftype]:
+                del self.ftags[ftype]
+
+    def members(self, ftype):
+        """Return set of tags in layer FTYPE."""
+        return self.ftags.get(ftype, set())
+
+    def count(self, ftype):
+        """Return number of objects in layer FTYPE."""
+        return len(self.ftags.get(ftype, ()))
+
+    def freeIndex(self, ftype, i=1):
+        """Return next free index of layer FTYPE starting from I."""
+        self.counters[ftype] = max(self.counters.get(ftype, 0) + 1, i)
+        return self.counters[ftype]
+
+    def clear(self):
+        self.ftags.clear()
+        self.ftype.clear()
+
+class Coords(object):
+    """Compact list of coords [[x,y],[x1,y1]...] stored as flat array('d') [x,y,x1,y1...].
+    Items are read and set as [x,y] lists."""
+    __slots__ = ('flat',)
+
+    def __init__(self, coords=(), flat=None):
+        """COORDS (opt.) list of coords [[x,y],...] or Coords.
+        FLAT (opt.) flat array('d') [x,y,x1,y1...] to use without copy."""
+        if flat is None:
+            if isinstance(coords, Coords):
+                flat = array('d', coords.flat)
+            else:
+                flat = array('d', [float(v) for xy in coords for v in xy[:2]])
+        self.flat = flat
+
+    def __len__(self):
+        return len(self.flat) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return Coords(flat=self.flat[2 * start:2 * max(start, stop)])
+            return Coords([self[i] for i in range(start, stop, step)])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Coords: index out of range')
+        return list(self.flat[2 * index:2 * index + 2])
+
+    def __setitem__(self, index, xy):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Coords: index out of range')
+        self.flat[2 * index], self.flat[2 * index + 1] = float(xy[0]), float(xy[1])
+
+    def __iter__(self):
+        flat = self.flat
+        for i in range(0, len(flat), 2):
+            yield [flat[i], flat[i + 1]]
+
+    def __iadd__(self, coords):
+        self.extend(coords)
+        return self
+
+    def __eq__(self, coords):
+        return list(self) == list(coords)
+
+    def __ne__(self, coords):
+        return not self == coords
+
+    def __repr__(self):
+        return 'Coords(%r)' % (self.tolist(),)
+
+    def append(self, xy):
+        self.flat.extend([float(xy[0]), float(xy[1])])
+
+    def extend(self, coords):
+        self.flat.extend(Coords(coords).flat)
+
+    def tolist(self):
+        """Return list of coords [[x,y],[x1,y1]...]."""
+        return list(self)
+
+class Feature(object):
+    """Object of mflood. Fields are read and set as dict items, e.g. value['coords']."""
+    __slots__ = ('ftype', 'coords', 'label', 'centerof', 'icon', 'fg', 'bg', 'lod')
+
+    def __init__(self, **kw):
+        for k, v in kw.items():
+            setattr(self, k, v)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return [k for k in self.__slots__ if hasattr(self, k)]
+
 class dbCarta:
     """Main class."""
     # Public
@@ -57,10 +364,17 @@ class dbCarta:
         'Figure':       {'cls': 'Line', 'fg': rgb(0,130,200), 'width': 2},
         'CurrFigure':   {'cls': 'Line', 'fg': rgb(0,130,200), 'anchor': 'ne', 'width': 2},
         'UserLine':     {'cls': 'Line', 'fg': rgb(0,0,0), 'anchor': 'nw'},
+        '.CivilTwilight':        {'cls': 'Polygon', 'fg': '', 'bg': rgb(0,0,40), 'stipple': 'gray12'},
+        '.NauticalTwilight':     {'cls': 'Polygon', 'fg': '', 'bg': rgb(0,0,40), 'stipple': 'gray25'},
+        '.AstronomicalTwilight': {'cls': 'Polygon', 'fg': '', 'bg': rgb(0,0,40), 'stipple': 'gray50'},
+        '.Night':                {'cls': 'Polygon', 'fg': '', 'bg': rgb(0,0,40), 'stipple': 'gray75'},
     }
     delta = 3600.0
     halfX = 648000.0
     ylimit = 84
+    lodtol = (0.5, 0.2, 0.05, 0.01)  # simplification tolerances of detail levels (in degrees)
+    framems = 40  # frame budget of Globe drag rotation and coalesced updates (in ms)
+    densifytol = 0.5  # max. deviation of Globe segments from great circles (in pixels)
     mflood = {}
     # Private
     __wkt_mopt = {
@@ -73,6 +387,7 @@ class dbCarta:
     }
     __temp = {}
     __usercl = {}
+    __np_min = 64  # min. points to use numpy in batch projection
     
     def __init__(self, master, **kw):
         """Constructor.
@@ -81,7 +396,8 @@ class dbCarta:
           PROJECT projection id.
           BG Canvas bg color.
           VIEWPORTX scroll width in degrees.
-          VIEWPORTY scroll height in degrees."""
+          VIEWPORTY scroll height in degrees.
+          CULL paint only objects in visible area {1|0 (default)}."""
         self.lang()
         master.protocol('WM_DELETE_WINDOW', master.quit)
         master.title('Tk Widget dbCarta')
@@ -94,6 +410,11 @@ class dbCarta:
         self.bg = kw.get('bg')
         self.viewportx = kw.get('viewportx', 360+180)
         self.viewporty = kw.get('viewporty', 180+90)
+        self.cull = kw.get('cull', 0)
+        self.pcache = ProjCache()
+        self.sindex = GridIndex()
+        self.layers = LayerIndex()
+        self.events = {}
         self.__createCtls()
         self.project = 0
         self.changeProject(self.project)
@@ -141,12 +462,13 @@ class dbCarta:
         self.master.bind('<Shift-Key>', self.__master_keyPressShift)
         # Slider widget for scale
         self.slider = Scale(self.parent, label=_('Lon Lat'), orient='horizontal', showvalue=0,
-                            from_=0.0005, to=1.0, resolution=0.0005, command=self.scaleCarta)
+                            from_=0.0005, to=1.0, resolution=0.0005, command=self.__zoomIdle)
         self.slider.var = DoubleVar()
         self.slider.config(variable=self.slider.var)
         self.slider.grid(column=0, row=0, columnspan=2, sticky='ew')
         # Canvas with scrollbars
         self.dw = Canvas(self.parent, bd=0, bg=self.bg or rgb(186,196,205))
+        self.tkbatch = TkBatch(self.dw)
         self.scrollX = Scrollbar(self.parent, orient='horizontal',
                                  command=lambda *ev: self.dw.xview(*ev))
         self.scrollY = Scrollbar(self.parent, orient='vertical',
@@ -261,15 +583,20 @@ class dbCarta:
         # zoom/scale map
         if ev.keysym in ('KP_Add', 'plus', 'space', 'KP_Subtract', 'minus', 'BackSpace', 4, 5):
             self.slider.var.set(self.slider.get() + self.slider['resolution'] * (1, -1)[ev.keysym in ('KP_Subtract', 'minus', 'BackSpace', 5)])
-            self.scaleCarta()
+            self.__zoomIdle()
+            # user callback with new scale, see __zoomApply
+            self.__zoomCl('__master_keyPress')
+            return
         # move map
         elif ev.keysym in ('Left', 'Right'):
             self.dw.xview('scroll', (1, -1)[ev.keysym == 'Left'], 'units')
             self.labelPoint()
+            self.fireEvent('scroll')
         elif ev.keysym in ('Up', 'Down'):
             self.dw.yview('scroll', (1, -1)[ev.keysym == 'Up'], 'units')
             self.labelPoint()
-        self.clfunc()
+            self.fireEvent('scroll')
+        self.clfunc(fn='__master_keyPress')
 
     def __master_keyPressCtrl(self, ev):
         """`Ctrl + Key` callback."""
@@ -282,7 +609,7 @@ class dbCarta:
             return
         self.changeProject(self.project)
         self.labelPoint()
-        self.clfunc()
+        self.clfunc(fn='__master_keyPressCtrl')
 
     def __master_keyPressShift(self, ev):
         """`Shift + Key` callback."""
@@ -305,7 +632,29 @@ class dbCarta:
             self.labelPoint()
         else:
             self.__master_keyPress(ev)
-        self.clfunc()
+            if self.__temp.get('zoom'):
+                self.__zoomCl('__master_keyPressShift')
+                return
+        self.clfunc(fn='__master_keyPressShift')
+
+    def __zoomIdle(self, *ev):
+        """Slider and zoom keys callback. Coalesce zoom steps to one scaleCarta when idle."""
+        if not self.__temp.get('zoom'):
+            self.__temp['zoom'] = self.master.after_idle(self.__zoomApply)
+
+    def __zoomCl(self, fn):
+        """Defer user callback FN (see clfunc) until pending zoom is applied."""
+        fns = self.__temp.setdefault('zoomcl', [])
+        if fn not in fns:
+            fns.append(fn)
+
+    def __zoomApply(self):
+        """Apply pending zoom, fire `zoom` event and deferred user callbacks. See __zoomIdle."""
+        self.__temp.pop('zoom', None)
+        self.scaleCarta()
+        self.fireEvent('zoom', self.slider.var.get())
+        for fn in self.__temp.pop('zoomcl', []):
+            self.clfunc(fn=fn)
 
     def __dw_mouseDown(self, ev):
         """MouseDown callback."""
@@ -331,19 +680,20 @@ class dbCarta:
             GEOMETRYCOLLECTION(POINT(2 3),LINESTRING(2 3,3 4))"""
             mnu = [('menu', _('Add Figure(s)...'), lambda : self.loadCartaWKT( [(False, askstring(_('Add Figures'), _('Type coordinate\'s WKT-string: %s') % (pmsg,)))] ))]
             # clrmenu
-            lclear = []
-            for pid in self.dw.find_all():
-                ftag, ftype = self.dw.gettags(pid)[:2]
-                if ftype in self.mopt and not ftype in lclear:
-                    lclear += [ftype]
+            # layers of objects from registry, others from canvas
+            for ftype in self.mopt:
+                if self.layers.count(ftype) or self.dw.find_withtag(ftype):
                     mnu.append( ('menu.clrmenu', _('%s') % (ftype,), self.clearLayers, ftype) )
-            # under cursor (not labels)
+            # under cursor (not labels): mflood by index, others from canvas
+            ftags = self.findCarta(x, y)
             for pid in self.dw.find_overlapping(x - 5, y - 5, x + 5, y + 5):
                 ftag, ftype = self.dw.gettags(pid)[:2]
-                if ftype in self.mopt and ftag[0] != '.':
-                    label = ftag
-                    mnu.append( ('menu', (_('Information %s') + '...') % (label,), self.__listCoords, _('Info %s') % (label,), ftag, ev.x_root, ev.y_root) )
-                    mnu.append( ('menu.clrmenu', _('%s') % (label,), self.clearCarta, ftag) )
+                if ftype in self.mopt and ftag[0] != '.' and not ftag in self.mflood and not ftag in ftags:
+                    ftags.append(ftag)
+            for ftag in ftags:
+                label = ftag
+                mnu.append( ('menu', (_('Information %s') + '...') % (label,), self.__listCoords, _('Info %s') % (label,), ftag, ev.x_root, ev.y_root) )
+                mnu.append( ('menu.clrmenu', _('%s') % (label,), self.clearCarta, ftag) )
             self.__createMenu(mnu)
             self.menu['menu'].tk_popup(ev.x_root, ev.y_root)
         elif ev.num in (4,5): # wheel
@@ -357,11 +707,12 @@ class dbCarta:
         if 'Figure' in self.__temp:
             self.__temp['Figure'][1] += self.__temp['Figure'][0]
             self.__temp['Figure'][2] = self.fromPoints([x, y], dosphere=1)
-            self.paintCarta(self.__temp['Figure'][2], 'Figure', '%04d_%s_%s' % (len(self.mflood)-1, 'Figure', self.__temp['Figure'][3]), addcoords=1)
+            self.paintCarta(self.__temp['Figure'][2], 'Figure', self.__temp['Figure'][4], addcoords=1)
         else:
             # remember init figure values of distance, coords, tag
             self.__temp['Figure'] = [0, 0, self.fromPoints([x, y], dosphere=1), self.freeTag('Figure')]
             self.loadCarta( [('Figure', self.__temp['Figure'][3], str(self.__temp['Figure'][2]))] )
+            self.__temp['Figure'].append('%04d_%s_%s' % (self.layers.seq - 1, 'Figure', self.__temp['Figure'][3]))
 
     def __dw_mouseMove(self, ev):
         """MouseMove callback."""
@@ -382,26 +733,53 @@ class dbCarta:
                 centerof = self.__temp['shift'][2]
                 mcenterof = self.fromPoints(pts)
                 self.__temp['centerof'] = [[ centerof[0][0] + mcenterof[0][0], centerof[0][1] + mcenterof[0][1]]]  
-                self.changeProject(self.project)
-                self.labelPoint()
+                self.__dragIdle()
             else:
                 # center on move and remember new visible center
                 self.centerPoint(*pts)
                 self.__temp['shift'][0] = ev
-            self.clfunc()
+                self.fireEvent('scroll')
+            self.clfunc(fn='__dw_mouseMove')
         # calc and show coords under cursor
         coords = self.fromPoints((x, y), dosphere=1) or [('', '')]
         self.slider.config(label=_('Lon %s Lat %s') % (str(coords[0][0]), str(coords[0][1])))
 
+    def __dragIdle(self):
+        """Coalesce Globe drag rotation to one redraw per frame. See framems."""
+        if not self.__temp.get('drag'):
+            wait = self.framems - (time.time() - self.__temp.get('dragtime', 0)) * 1000
+            self.__temp['drag'] = self.master.after(max(1, int(wait)), self.__dragApply)
+
+    def __dragApply(self):
+        """Redraw Globe by pending rotation with coarse level of detail, without labels."""
+        self.__temp.pop('drag', None)
+        self.__temp['dragtime'] = time.time()
+        if not self.__temp.get('coarse'):
+            self.__temp['coarse'] = 1
+            # labels are drawn after drag
+            for pid, points, text in self.__temp.pop('labels', {}).values():
+                self.tkbatch.delete(pid)
+        self.changeProject(self.project)
+
+    def __dragDone(self):
+        """Stop drag rotation and repaint with full quality."""
+        drag = self.__temp.pop('drag', None)
+        if drag:
+            self.master.after_cancel(drag)
+        if drag or self.__temp.pop('coarse', None):
+            self.__temp.pop('coarse', None)
+            self.changeProject(self.project)
+
     def __dw_mouseUp(self, ev):
         """MouseUp callback."""
         self.__temp.pop('shift', '')
+        self.__dragDone()
         self.labelPoint()
-        self.clfunc()
+        self.clfunc(fn='__dw_mouseUp')
 
     def __dw_mouseUpCtrl(self, ev):
         """Control + MouseUp callback."""
-        self.clfunc()
+        self.clfunc(fn='__dw_mouseUpCtrl')
 
     #-------------------------------------
 
@@ -426,10 +804,11 @@ class dbCarta:
             x = -180
             while x < 180:
                 x += 30
-                lat += [[x, y]]
+                # parallel is not great circle, see interpolateLine
+                lat += [[x - 30 + dx, y] for dx in range(5, 35, 5)]
                 lonlat += [('.Latitude', str([x, y]), str(lat), str(y), str(centerof))]
                 label = centerof = None
-                lat.pop(0)
+                lat = lat[-1:]
             y += 30
         return lonlat
 
@@ -459,51 +838,74 @@ class dbCarta:
             101 mercator |
             203 ortho globe/sphere }.
         CENTEROF center point to set (opt.)."""
-        mcenterof = []
-        if not self.project == new_project:
-            mcenterof = self.__temp['centerof'] = (centerof or self.centerOf())
-        if new_project == 101:    # mercator
-            self.scaleX = self.viewportx * self.delta
-            self.scaleY = self.toMercator(90.0) * self.delta * self.viewporty/90.0
-        elif new_project == 0:   # linear
-            self.scaleX = self.viewportx * self.delta
-            self.scaleY = self.viewporty * self.delta
-        elif new_project == 203: # globe
-            self.scaleX = self.viewportx * self.delta
-            self.scaleY = self.viewporty * self.delta
-        self.halfX = self.scaleX / 2.0
-        self.halfY = self.scaleY / 2.0
-        self.project = new_project
-        self.scaleCarta(docenter=0)
-        self.clfunc('Before')
-        self.paintBound()
-        # redraw all in mflood by new projection
-        mkeys = list(self.mflood.keys())
-        mkeys.sort()
-        for ftag in mkeys:
-            value = self.mflood[ftag]
-            self.paintCarta(value['coords'], value['ftype'], ftag)
-        if mcenterof:
-            self.centerCarta(mcenterof)
-        self.clfunc('After')
+        with self.tkbatch:
+            mcenterof = []
+            if not self.project == new_project:
+                mcenterof = self.__temp['centerof'] = (centerof or self.centerOf())
+            if new_project == 101:    # mercator
+                self.scaleX = self.viewportx * self.delta
+                self.scaleY = self.toMercator(90.0) * self.delta * self.viewporty/90.0
+            elif new_project == 0:   # linear
+                self.scaleX = self.viewportx * self.delta
+                self.scaleY = self.viewporty * self.delta
+            elif new_project == 203: # globe
+                self.scaleX = self.viewportx * self.delta
+                self.scaleY = self.viewporty * self.delta
+            self.halfX = self.scaleX / 2.0
+            self.halfY = self.scaleY / 2.0
+            self.project = new_project
+            self.scaleCarta(docenter=0)
+            self.fireEvent('changeProject.Before')
+            self.paintBound()
+            # redraw all in mflood by new projection, visible only while Globe drag
+            self.__paintAll(cull=self.__temp.get('coarse'))
+            if mcenterof:
+                self.centerCarta(mcenterof)
+            self.fireEvent('changeProject.After')
+
+    def __paintAll(self, cull=0):
+        """Redraw all objects in mflood by current projection and level of detail.
+        CULL (opt.) paint only objects in visible area {1|0 (default cull mode)}."""
+        with self.tkbatch:
+            mkeys = list(self.mflood.keys())
+            mkeys.sort()
+            self.__temp['unpainted'] = set()
+            if self.cull or cull:
+                # paint visible only, others later by labelPoint
+                visible = self.sindex.query(*self.viewboundsOf())
+                self.__temp['unpainted'] = set([ftag for ftag in mkeys if not ftag in visible])
+                if self.__temp['unpainted']:
+                    self.tkbatch.delete(*self.__temp['unpainted'])
+                mkeys = [ftag for ftag in mkeys if ftag in visible]
+            self.__temp['lod'] = self.lodOf()
+            self.__temp['band'] = self.isSpherical() and self.zoomBand()
+            mpoints = self.projectCarta(mkeys)
+            for ftag, points in zip(mkeys, mpoints):
+                value = self.mflood[ftag]
+                self.drawCarta(points, value['coords'], value['ftype'], ftag)
 
     def freeTag(self, ftype, i=1):
-        """Return label with increment index.
+        """Return label with increment index. Index of layer is not reused.
         FTYPE layer's name from mopt.
         I (opt.) init index value (1 default)."""
-        ftag = str(len(self.dw.find_withtag(ftype)) + i)
-        if self.dw.find_withtag('%s_%s' % (ftype, ftag)):
-            return self.freeTag(ftype, i + 1)
-        return ftag
+        return str(self.layers.freeIndex(ftype, i))
 
     def labelPoint(self):
-        """Draw labels of objects in visible area. Also mouse ButtonRelease callback."""
+        """Draw labels of objects in visible area. Also mouse ButtonRelease callback.
+        Labels are kept between calls: move, create or delete only changed, see labelstat.
+        Labels are not drawn while Globe drag rotation."""
+        if self.__temp.get('coarse'):
+            return
         rect = self.fromPoints(self.viewsizeOf(), 0)
         left, top, right, bottom = rect[0] + rect[1]
         mleft = [left, -180][left < -180]
         mtop = [top, [90, self.ylimit][self.project == 101]][top > 90]
-        # clear all labels and draw again in visible area
-        for ftag, value in self.mflood.items():
+        rects = self.viewboundsOf()
+        self.__paintVisible(rects)
+        # labels in visible area as (tag, ftype, coords, text, icon)
+        mlabel = []
+        for ftag in self.sindex.query(*(rects + [[left, bottom, right, top]])):
+            value = self.mflood[ftag]
             ftype  = value['ftype']
             _ftag = '.' + ftag             # tag of label
             __ftag = '.' + _ftag           # tag of icon
@@ -519,28 +921,57 @@ class dbCarta:
             if self.project == 101:
                 if abs(center_y) > self.ylimit:
                     center_y = self.ylimit * [-1, 1][center_y > 0]
-            self.dw.delete(_ftag)
-            self.dw.delete(__ftag)
             if ftype in ('.Longtitude'):
                 if self.isSpherical():
                     if -180 < center_x <= 180:
-                        self.paintCarta([[center_x, 0]], ftype, _ftag, ftext=label)
+                        mlabel += [(_ftag, ftype, [[center_x, 0]], label, None)]
                 elif left <= center_x <= right:
-                    self.paintCarta([[center_x, mtop]], ftype, _ftag, ftext=label)
+                    mlabel += [(_ftag, ftype, [[center_x, mtop]], label, None)]
             elif ftype in ('.Latitude'):
                 if self.isSpherical():
-                    self.paintCarta([[0, center_y]], ftype, _ftag, ftext=label)
+                    mlabel += [(_ftag, ftype, [[0, center_y]], label, None)]
                 elif bottom <= center_y <= top:
                     # limit merc
                     if self.project == 101:
                         label = str(int(center_y))
-                    self.paintCarta([[mleft, center_y]], ftype, _ftag, ftext=label)
+                    mlabel += [(_ftag, ftype, [[mleft, center_y]], label, None)]
             else:
                 if (left <= center_x <= right and bottom <= center_y <= top) or self.isSpherical():
                     _d = self.slider['from'] / self.slider.var.get() ; d = 3 * _d # shift label (3 degrees)
                     if icon:  # icon & text
-                        self.paintCarta([[center_x + d, center_y]], ftype, __ftag, fimage=icon) ; d = icon.width() * _d
-                    self.paintCarta([[center_x + d, center_y]], ftype, _ftag, ftext=label)
+                        mlabel += [(__ftag, ftype, [[center_x + d, center_y]], None, icon)] ; d = icon.width() * _d
+                    mlabel += [(_ftag, ftype, [[center_x + d, center_y]], label, None)]
+        # diff with labels on canvas
+        self.labelstat = {'created': 0, 'moved': 0, 'deleted': 0}
+        labels, _labels = self.__temp.get('labels', {}), {}
+        mpoints = self.toPointsMany([x[2] for x in mlabel], doscale=1)
+        created = []
+        with self.tkbatch:
+            for (tag, ftype, coords, text, icon), points in zip(mlabel, mpoints):
+                if not points:
+                    continue
+                if tag in labels:
+                    pid, _points, _text = labels.pop(tag)
+                    if _points != points:
+                        self.tkbatch.coords(pid, points)
+                        self.labelstat['moved'] += 1
+                    if _text != text:
+                        self.tkbatch.itemconfigure(pid, text=' ' + text + '   ')
+                else:
+                    pid = self.__createLabel(points, ftype, tag, text, icon)
+                    created.append(tag)
+                    self.labelstat['created'] += 1
+                _labels[tag] = (pid, points, text)
+            # out of visible area
+            for pid, _points, _text in labels.values():
+                self.tkbatch.delete(pid)
+                self.labelstat['deleted'] += 1
+            # ids of new labels
+            ids = self.tkbatch.flush()
+        for tag in created:
+            pid, points, text = _labels[tag]
+            _labels[tag] = (int(ids[pid]), points, text)
+        self.__temp['labels'] = _labels
 
     """Set language from locale .po files"""
     def lang(self, lang=''):
@@ -567,15 +998,28 @@ class dbCarta:
             5 see loadCarta: data[6],
             6 see loadCarta: data[7] ).
         DOCENTER see loadCarta: docenter."""
+        self.__loadGeometry(data, docenter, self.fromWKT, 'WKT')
+
+    def loadCartaWKB(self, data=(), docenter=0):
+        """Display WKB-objects (ISO/OGC WKB or PostGIS EWKB). Use loadCarta.
+        DATA (opt.) list of list as loadCartaWKT: data with
+            1 WKB as bytes or memoryview.
+        DOCENTER see loadCarta: docenter."""
+        self.__loadGeometry(data, docenter, self.fromWKB, 'WKB')
+
+    def __loadGeometry(self, data, docenter, parse, fmt):
+        """Split geometries to objects by __wkt_mopt and load. See loadCartaWKT.
+        PARSE function to get list of coords from data[1], e.g. fromWKT.
+        FMT format name for messages."""
         _data = []
         for row in data:
             try:
                 _row = dict([[i, x] for i, x in enumerate(row)])
                 if not _row.get(1):
                     continue
-                obj_coords = self.fromWKT(_row[1])
+                obj_coords = parse(_row[1])
                 if not obj_coords:
-                    raise ValueError("Invalid WKT")
+                    raise ValueError("Invalid %s" % fmt)
                 for i1, wl in enumerate(obj_coords):
                     tp, coords1 = wl
                     for i2, coords2 in enumerate(coords1):
@@ -584,7 +1028,7 @@ class dbCarta:
                             if not _row[0]: _row[0] = self.freeTag(self.__wkt_mopt[tp])
                             _data += [(self.__wkt_mopt[tp], '%s_%s_%s_%s' % (_row[0], i1, i2, i), coords, _row.get(2), _row.get(3), _row.get(4), _row.get(5), _row.get(6))]
             except:
-                print('loadCartaWKT: ', sys.exc_info()[0], sys.exc_info()[1])
+                print('loadCarta%s: ' % fmt, sys.exc_info()[0], sys.exc_info()[1])
                 raise
         if _data:
             self.loadCarta(_data, docenter)
@@ -595,57 +1039,130 @@ class dbCarta:
             0 layer name from mopt,
             1 tag of object (unique within layer),
             2 string of coords as "((x1,y1),...,(xn,yn))"  (in degrees),
+              list of coords or Coords (kept without copy, e.g. from readData),
             3 (opt.) label,
             4 (opt.) center for label as {'' (no label)|"(x,y)"},
             5 (opt.) icon (GIF),
             6 (opt.) fgcolor,
             7 (opt.) bgcolor).
         DOCENTER (opt.) center after display {1|0 (default)}."""
-        for row in data:
-            try:
-                _row = dict([[i, x] for i, x in enumerate(row) if not x == None])
-                if not ( _row[2] and _row[0] in self.mopt and _row[1] ):
-                    continue
-                ftype, tag = _row[0], _row[1]
-                ftag = '%04d_%s_%s' % (len(self.mflood), ftype, tag)
-                coords, centerof = _row[2], _row.get(4)
-                if type(coords) is str:
-                    coords = self.toCoords(coords)
-                if type(centerof) is str:
-                    centerof = self.toCoords(centerof)
-                # save in mflood label, coords..
-                self.mflood[ftag] = {
-                    'ftype': ftype,
-                    'coords': coords,
-                    'label': _row.get(3),
-                    'centerof': centerof,
-                    'icon': _row.get(5),
-                    'fg': _row.get(6, self.mopt[ftype]['fg']),
-                    'bg': _row.get(7, self.mopt[ftype].get('bg', ''))}
-                # draw object
-                self.paintCarta(coords, ftype, ftag)
-            except:
-                print('loadCarta: ', sys.exc_info()[0], sys.exc_info()[1])
-                raise
-        if data:
-            if docenter and centerof:
-                # remember center for Globe projection
-                if self.isSpherical():
-                    self.__temp['centerof'] = centerof
-                    self.changeProject(self.project)
-                self.centerCarta(centerof)
+        rects = self.cull and self.viewboundsOf()
+        centerof = None
+        ftags = []
+        with self.tkbatch:
+            for row in data:
+                ftag = self.__loadRow(row, rects)
+                if ftag:
+                    centerof = self.mflood[ftag]['centerof']
+                    ftags.append(ftag)
+            if data:
+                self.__loadDone(centerof, docenter, ftags)
+
+    def __loadRow(self, row, rects=None):
+        """Save object in mflood and draw. Return tag of object or None if skipped.
+        ROW see loadCarta: data.
+        RECTS (opt.) visible area to defer objects out of it, see viewboundsOf."""
+        try:
+            _row = dict([[i, x] for i, x in enumerate(row) if not x == None])
+            if not ( _row[2] and _row[0] in self.mopt and _row[1] ):
+                return
+            ftype, tag = _row[0], _row[1]
+            ftag = self.layers.newTag(ftype, tag)
+            coords, centerof = _row[2], _row.get(4)
+            if type(coords) is str:
+                coords = Coords(flat=self.toCoords(coords, flat=1))
+            elif not isinstance(coords, Coords):
+                coords = Coords(coords)
+            if type(centerof) is str:
+                centerof = self.toCoords(centerof)
+            # save in mflood label, coords..
+            self.mflood[ftag] = Feature(
+                ftype=ftype,
+                coords=coords,
+                label=_row.get(3),
+                centerof=centerof,
+                icon=_row.get(5),
+                fg=_row.get(6, self.mopt[ftype]['fg']),
+                bg=_row.get(7, self.mopt[ftype].get('bg', '')))
+            # draw object or defer if out of visible area
+            self.__indexCarta(ftag)
+            self.pcache.discard(ftag)
+            if rects and not self.sindex.intersects(ftag, rects):
+                self.dw.delete(ftag)
+                self.__temp.setdefault('unpainted', set()).add(ftag)
             else:
-                self.labelPoint()
+                self.drawCarta(self.projectCarta([ftag])[0], coords, ftype, ftag)
+            return ftag
+        except:
+            print('loadCarta: ', sys.exc_info()[0], sys.exc_info()[1])
+            raise
+
+    def __loadDone(self, centerof=None, docenter=0, ftags=()):
+        """Center or draw labels after loading and fire `load` event. See loadCarta."""
+        if docenter and centerof:
+            # remember center for Globe projection
+            if self.isSpherical():
+                self.__temp['centerof'] = centerof
+                self.changeProject(self.project)
+            self.centerCarta(centerof)
+        else:
+            self.labelPoint()
+        self.fireEvent('load', list(ftags))
+
+    def streamCarta(self, data=(), docenter=0, timeslice=20):
+        """Display objects by time slices from mainloop without blocking it. Use loadCarta.
+        Call user callbacks `streamCarta` Progress after each slice and After at the end,
+        progress is in loadstat {'done': rows, 'total': rows or None, 'cancel': {1|0}}.
+        DATA (opt.) iterable or generator of rows, see loadCarta.
+        DOCENTER see loadCarta.
+        TIMESLICE (opt.) time of one step (in ms)."""
+        self.cancelCarta()
+        self.loadstat = {'done': 0, 'total': None, 'cancel': 0}
+        if hasattr(data, '__len__'):
+            self.loadstat['total'] = len(data)
+        rows = iter(data)
+        state = {'centerof': None, 'ftags': []}
+        def step():
+            rects = self.cull and self.viewboundsOf()
+            start = time.time()
+            done = False
+            # canvas commands of slice by one Tcl call
+            with self.tkbatch:
+                for row in rows:
+                    ftag = self.__loadRow(row, rects)
+                    self.loadstat['done'] += 1
+                    if ftag:
+                        state['centerof'] = self.mflood[ftag]['centerof']
+                        state['ftags'].append(ftag)
+                    if time.time() - start >= timeslice / 1000.0:
+                        break
+                else:
+                    done = True
+                    self.__temp.pop('stream', None)
+                    self.__loadDone(state['centerof'], docenter, state['ftags'])
+            if not done:
+                self.__temp['stream'] = self.master.after(1, step)
+            self.clfunc('Progress', 'streamCarta')
+            if done:
+                self.clfunc('After', 'streamCarta')
+        self.__temp['stream'] = self.master.after(1, step)
+
+    def cancelCarta(self):
+        """Stop streamCarta. Objects already loaded are kept."""
+        stream = self.__temp.pop('stream', None)
+        if stream:
+            self.master.after_cancel(stream)
+            self.loadstat['cancel'] = 1
 
     def paintBound(self):
         """Draw Sphere radii bounds."""
-        self.dw.delete('sphereBounds')
+        self.tkbatch.delete('sphereBounds')
         if self.isSpherical():
             radii = 180 / pi * self.delta * self.slider.var.get()
             vx, vy = self.scaleX * self.slider.var.get(), self.scaleY * self.slider.var.get()
-            self.dw.create_oval(vx/2.0 - radii, vy/2.0 - radii, vx/2.0 + radii, vy/2.0 + radii,
+            self.tkbatch.create('oval', [vx/2.0 - radii, vy/2.0 - radii, vx/2.0 + radii, vy/2.0 + radii],
                                 outline=self.mopt['.Latitude']['fg'], 
-                                fill=self.mopt['.Water']['bg'], tags=('.Water', 'sphereBounds'))            
+                                fill=self.mopt['.Water']['bg'], tags=('.Water', 'sphereBounds'))
 
     def paintCarta(self, coords, ftype, ftag, ftext='', fimage=None, addcoords=0):
         """Draw object, label, icon.
@@ -655,19 +1172,125 @@ class dbCarta:
         FTEXT (opt.) label.
         FIMAGE (opt.) icon (GIF).
         ADDCOORDS (opt.) create or continue outline {1|0 (default)}."""
-        # interpolate coords for Globe projection
-        _coords = []
-        if self.isSpherical():
-            for i in range(len(coords) - 1):
-                _coords += self.interpolateCoords(coords[i:i + 2])
-        if not _coords:
-            _coords = coords
+        # new geometry of object
+        if ftag in self.mflood:
+            self.pcache.discard(ftag)
+            self.__temp.get('unpainted', set()).discard(ftag)
+            if coords is self.mflood[ftag]['coords'] and not addcoords:
+                self.__indexCarta(ftag)
+                self.drawCarta(self.projectCarta([ftag])[0], coords, ftype, ftag, ftext, fimage)
+                return
+        points = self.toPoints(self.interpolateLine(coords), doscale=1)
+        self.drawCarta(points, coords, ftype, ftag, ftext, fimage, addcoords)
+        if ftag in self.mflood:
+            self.__indexCarta(ftag)
+
+    def updateCarta(self, ftag, coords):
+        """Move object to new coords. See updateCartaMany.
+        FTAG tag of object from mflood.
+        COORDS list of coords [[x,y],[x1,y1]...] or string (in degrees)."""
+        self.updateCartaMany({ftag: coords})
 
-        points = self.toPoints(_coords, doscale=1)
+    def updateCartaMany(self, mcoords):
+        """Move objects to new coords with labels and icons. Pending updates are applied
+        together once per frame (see framems), the last coords of object wins.
+        MCOORDS dict {ftag: coords} of objects from mflood, see updateCarta."""
+        self.__temp.setdefault('update', {}).update(mcoords)
+        if not self.__temp.get('updateid'):
+            wait = self.framems - (time.time() - self.__temp.get('updatetime', 0)) * 1000
+            self.__temp['updateid'] = self.master.after(max(1, int(wait)), self.__updateApply)
+
+    def __updateApply(self):
+        """Apply pending updates of coords. Move items on canvas by coords, redraw others."""
+        self.__temp.pop('updateid', None)
+        self.__temp['updatetime'] = time.time()
+        pending = self.__temp.pop('update', {})
+        ftags = sorted([ftag for ftag in pending if ftag in self.mflood])
+        unpainted = self.__temp.get('unpainted', set())
+        empty = self.__temp.get('empty', set())
+        rects = self.cull and self.viewboundsOf()
+        for ftag in ftags:
+            value = self.mflood[ftag]
+            coords = pending[ftag]
+            if type(coords) is str:
+                value['coords'] = Coords(flat=self.toCoords(coords, flat=1))
+            else:
+                value['coords'] = Coords(coords)
+            self.pcache.discard(ftag)
+            self.__indexCarta(ftag)
+        with self.tkbatch:
+            # out of visible area in cull mode, paint later by labelPoint
+            if rects:
+                hidden = [ftag for ftag in ftags if not self.sindex.intersects(ftag, rects)]
+                if hidden:
+                    self.tkbatch.delete(*hidden)
+                    unpainted.update(hidden)
+                    self.__temp['unpainted'] = unpainted
+                    ftags = [ftag for ftag in ftags if not ftag in unpainted]
+            for ftag, points in zip(ftags, self.projectCarta(ftags)):
+                value = self.mflood[ftag]
+                ftype = value['ftype']
+                if ftag in unpainted or ftag in empty or not points:
+                    unpainted.discard(ftag)
+                    self.drawCarta(points, value['coords'], ftype, ftag)
+                elif self.mopt[ftype]['cls'] == 'Dot':
+                    size = self.mopt[ftype].get('size', 0)
+                    self.tkbatch.coords(ftag, [points[0] - size/2.0, points[1] - size/2.0,
+                                               points[0] + size/2.0, points[1] + size/2.0])
+                else:
+                    self.tkbatch.coords(ftag, [points, points * 2][len(points) < 4])
+            self.labelPoint()
+
+    def __indexCarta(self, ftag):
+        """Update bounds of object in spatial index (include label center)
+        and level of detail pyramid."""
+        value = self.mflood[ftag]
+        value['lod'] = self.simplifyCoords(value['coords'], self.mopt[value['ftype']]['cls'])
+        bounds = self.boundsOf(value['coords'])
+        center = self.boundsOf(value.get('centerof'))
+        if bounds and center:
+            bounds = [min(bounds[0], center[0]), min(bounds[1], center[1]), max(bounds[2], center[2]), max(bounds[3], center[3])]
+        bounds = bounds or center
+        if bounds:
+            # meridian labels are placed by one axis, wrap lon. beyond 180
+            if value['ftype'] == '.Latitude' or bounds[0] < -180 or bounds[2] > 180:
+                bounds[0], bounds[2] = -180, 180
+            elif value['ftype'] == '.Longtitude':
+                bounds[1], bounds[3] = -90, 90
+        self.sindex.insert(ftag, bounds)
+
+    def __paintVisible(self, rects):
+        """Paint objects deferred by cull mode which are in visible area.
+        RECTS see viewboundsOf."""
+        unpainted = self.__temp.get('unpainted', set())
+        ftags = sorted(unpainted & self.sindex.query(*rects))
+        if not ftags:
+            return
+        unpainted.difference_update(ftags)
+        with self.tkbatch:
+            for ftag, points in zip(ftags, self.projectCarta(ftags)):
+                value = self.mflood[ftag]
+                self.drawCarta(points, value['coords'], value['ftype'], ftag)
+            # keep stacking order of loading
+            mkeys = sorted(self.mflood)
+            self.tkbatch.flush()
+            for ftag in ftags:
+                for _ftag in mkeys[bisect(mkeys, ftag):]:
+                    if not _ftag in unpainted and self.dw.find_withtag(_ftag):
+                        self.tkbatch.lower(ftag, _ftag)
+                        break
+
+    def drawCarta(self, points, coords, ftype, ftag, ftext='', fimage=None, addcoords=0):
+        """Draw object, label, icon by projected points. See paintCarta.
+        POINTS list of `points` [pt1, pt2,...] from toPoints."""
         if not addcoords:
-            self.dw.delete(ftag)
+            self.tkbatch.delete(ftag)
+        # objects without item on canvas, see updateCartaMany
         if not points:
+            if ftag in self.mflood:
+                self.__temp.setdefault('empty', set()).add(ftag)
             return
+        self.__temp.get('empty', set()).discard(ftag)
 
         # colors of layer or self
         fg = self.mopt[ftype]['fg']
@@ -678,47 +1301,62 @@ class dbCarta:
             bg = mflood.get('bg', bg)
         # create/add points
         if addcoords:
-            self.dw.coords(ftag, tuple(self.dw.coords(ftag) + points))
+            self.tkbatch.flush()
+            self.tkbatch.coords(ftag, tuple(self.dw.coords(ftag) + points))
             self.mflood[ftag]['coords'] += coords
-        elif ftext:
-            self.dw.create_text(points, anchor=self.mopt[ftype].get('anchor', 'w'), text=' ' + ftext + '   ', fill=self.mopt[ftype].get('labelcolor', 'black'), tags=(ftag, ftype))
-        elif fimage:
-            self.dw.create_image(points, anchor=self.mopt[ftype].get('anchor', 'w'), image=fimage, tags=(ftag, ftype))
+        elif ftext or fimage:
+            self.__createLabel(points, ftype, ftag, ftext, fimage)
         elif self.mopt[ftype]['cls'] in ('Line'):
             if len(points) < 4:
                 points = points * 2
-            self.dw.create_line(points, fill=fg, 
+            self.tkbatch.create('line', points, fill=fg, 
                                 dash=self.mopt[ftype].get('dash'), smooth=self.mopt[ftype].get('smooth'), 
                                 width=self.mopt[ftype].get('width', 1), tags=(ftag, ftype))
         elif self.mopt[ftype]['cls'] in ('Polygon'):
             if len(points) < 4:
                 points = points * 2
-            self.dw.create_polygon(points, fill=bg, outline=fg, tags=(ftag, ftype))
+            self.tkbatch.create('polygon', points, fill=bg, outline=fg,
+                                stipple=self.mopt[ftype].get('stipple'), tags=(ftag, ftype))
         elif self.mopt[ftype]['cls'] in ('Dot'):
             if len(points) < 4:
                 points = points * 2
             size = self.mopt[ftype].get('size', 0)
-            self.dw.create_oval(points[0] - size/2.0, points[1] - size/2.0,
-                                points[0] + size/2.0, points[1] + size/2.0,
+            self.tkbatch.create('oval', [points[0] - size/2.0, points[1] - size/2.0,
+                                points[0] + size/2.0, points[1] + size/2.0],
                                 width=self.mopt[ftype].get('width', 1), fill=bg, outline=fg, tags=(ftag, ftype))
 
+    def __createLabel(self, points, ftype, ftag, ftext='', fimage=None):
+        """Create label or icon and return item id (or index of id if batch, see TkBatch.create). See drawCarta."""
+        if fimage:
+            return self.tkbatch.create('image', points, anchor=self.mopt[ftype].get('anchor', 'w'), image=fimage, tags=(ftag, ftype))
+        return self.tkbatch.create('text', points, anchor=self.mopt[ftype].get('anchor', 'w'), text=' ' + ftext + '   ', fill=self.mopt[ftype].get('labelcolor', 'black'), tags=(ftag, ftype))
+
     def clearLayers(self, *ftypes):
         """Delete all objects by layer.
         *FTYPES layers from mopt."""
         ftags = list(ftypes)
-        for ftag, value in self.mflood.items():
-            if value['ftype'] in ftypes:
-                ftags.append(ftag)
+        for ftype in ftypes:
+            ftags.extend(self.layers.members(ftype))
         self.clearCarta(*ftags)
 
     def clearCarta(self, *ftags):
         """Delete objects, labels, icons from canvas and mflood.
         *FTAGS tags of objects."""
         for ftag in ftags:
-            self.dw.delete(ftag)
-            self.dw.delete('.' + ftag)
-            self.dw.delete('..' + ftag)
+            self.tkbatch.delete(ftag, '.' + ftag, '..' + ftag)
+            self.__temp.get('labels', {}).pop('.' + ftag, None)
+            self.__temp.get('labels', {}).pop('..' + ftag, None)
             self.mflood.pop(ftag, '')
+            self.pcache.discard(ftag)
+            self.sindex.remove(ftag)
+            self.layers.remove(ftag)
+            self.__temp.get('unpainted', set()).discard(ftag)
+            self.__temp.get('empty', set()).discard(ftag)
+
+    def batch(self):
+        """Return batch of canvas commands (TkBatch) to use as `with dbcarta.batch(): ...`.
+        Commands by tkbatch methods in block are evaluated by one Tcl call at exit."""
+        return self.tkbatch
 
     def colorCarta(self, option='fg', dotransparent=0, *ftypes):
         """Select and save layer'color (transparent) of layers.
@@ -746,15 +1384,37 @@ class dbCarta:
         self.__temp['center_x'] = (self.dw.xview()[0] + self.dw.xview()[1]) / 2.0
         self.__temp['center_y'] = (self.dw.yview()[0] + self.dw.yview()[1]) / 2.0
         # calc ratio of current and previous scale
-        ratio = self.slider.var.get() / self.__temp.get('scale', self.slider['resolution'])
+        scale = self.slider.var.get()
+        ratio = scale / self.__temp.get('scale', self.slider['resolution'])
         # scale and center with ratio, show labels by new scale
-        self.dw['scrollregion'] = (0, 0, self.scaleX * self.slider.var.get(), self.scaleY * self.slider.var.get())
-        self.dw.scale('all', 0, 0, ratio, ratio)
+        self.dw['scrollregion'] = (0, 0, self.scaleX * scale, self.scaleY * scale)
+        # remember scale after changing
+        self.__temp['scale'] = scale
         if docenter:
             self.centerPoint()
+            # objects far from visible area are updated later by labelPoint
+            self.__dirtyCarta()
+        # far objects are deleted above, so `all` is near objects, labels and user items
+        self.tkbatch.scale('all', 0, 0, ratio, ratio)
+        if docenter:
+            # other level of detail or densify band (Globe) by new scale
+            if self.lodOf() != self.__temp.get('lod') or \
+               (self.isSpherical() and self.zoomBand()) != self.__temp.get('band'):
+                self.__paintAll(cull=1)
             self.labelPoint()
-        # remember scale after changing
-        self.__temp['scale'] = self.slider.var.get()
+
+    def __dirtyCarta(self, margin=0.5):
+        """Delete painted objects far from visible area and mark to paint by labelPoint.
+        MARGIN (opt.) part of visible size around it to keep."""
+        rects = []
+        for left, bottom, right, top in self.viewboundsOf():
+            dx, dy = (right - left) * margin, (top - bottom) * margin
+            rects += [[left - dx, bottom - dy, right + dx, top + dy]]
+        unpainted = self.__temp.setdefault('unpainted', set())
+        dirty = set(self.mflood) - unpainted - self.sindex.query(*rects)
+        if dirty:
+            self.tkbatch.delete(*dirty)
+            unpainted.update(dirty)
 
     def isSpherical(self, project=False):
         if project == False:
@@ -764,17 +1424,48 @@ class dbCarta:
     def usercl(self, cl, func, when=''):
         """Add user info/callback.
         CL key/event name.
-        FUNC value/user function name.
+        FUNC value/user callback as [`function name`, symtable] or function.
         WHEN (opt.) Before/After key."""
         self.__usercl[cl + when] = func
 
-    def clfunc(self, when=''):
-        """Execute user callback.
-        WHEN see usercl."""
-        fn = stack()[1][3]
-        if fn + when in self.__usercl:
-            clfunc, symtable = self.__usercl[fn + when]
-            exec(clfunc + '()', symtable)
+    def clfunc(self, when='', fn=''):
+        """Execute user callback. See usercl.
+        WHEN see usercl.
+        FN (opt.) key/event name (caller function name default)."""
+        clfunc = self.__usercl.get((fn or sys._getframe(1).f_code.co_name) + when)
+        if callable(clfunc):
+            clfunc()
+        elif clfunc:
+            clfunc, symtable = clfunc
+            # function by name or expression
+            func = symtable.get(clfunc)
+            if callable(func):
+                func()
+            else:
+                exec(clfunc + '()', symtable)
+
+    def bindEvent(self, event, func):
+        """Add subscriber of event. Return FUNC.
+        EVENT name {changeProject.Before|changeProject.After|scroll|zoom|load}.
+        FUNC function called as func(event, *args), args for zoom: scale, for load: list of tags."""
+        self.events.setdefault(event, []).append(func)
+        return func
+
+    def unbindEvent(self, event, func=None):
+        """Delete subscriber of event or all if FUNC is None. See bindEvent."""
+        funcs = self.events.get(event, [])
+        if func is None:
+            del funcs[:]
+        elif func in funcs:
+            funcs.remove(func)
+
+    def fireEvent(self, event, *args):
+        """Call subscribers of event and user callback from usercl by name
+        as `event` or `name`+`when` for `name.when`, e.g. changeProjectBefore. See bindEvent."""
+        for func in self.events.get(event, ()):
+            func(event, *args)
+        name, _, when = event.partition('.')
+        self.clfunc(when, name)
 
     def centerOf(self):
         """Return centerof [[x,y]] (in degrees)."""
@@ -799,6 +1490,50 @@ class dbCarta:
         return [ (rect[0] + rect[2]) / 2.0,
                  (rect[1] + rect[3]) / 2.0 ]
 
+    def viewboundsOf(self):
+        """Return list of rects [[left,bottom,right,top],...] covering visible area (in degrees)."""
+        left, top, right, bottom = self.viewsizeOf()
+        if not self.isSpherical():
+            coords = self.fromPoints([left, top, right, top, right, bottom, left, bottom])
+            rect = self.boundsOf(coords)
+            # mercator shows lat. above limit on bound
+            if self.project == 101:
+                if rect[1] <= -self.ylimit: rect[1] = -90
+                if rect[3] >= self.ylimit: rect[3] = 90
+            return [rect]
+        # spherical cap around visible center
+        corners = self.fromPoints([left, top, right, top, right, bottom, left, bottom], dosphere=1)
+        center = self.fromPoints(self.viewcenterOf(), dosphere=1)
+        if len(corners) == 4 and center:
+            rad = max([self.arcOf(center + [coords]) for coords in corners]) * 1.1
+        else:
+            center, rad = self.__temp.get('centerof', [[0,0]]), 90.0
+        lon, lat = center[0]
+        lat = degrees(P(radians(lat), pi / 2.0))
+        if lat - rad <= -90 or lat + rad >= 90 or sin(radians(rad)) >= cos(radians(lat)):
+            return [[-180, max(lat - rad, -90), 180, min(lat + rad, 90)]]
+        dlon = degrees(asin(sin(radians(rad)) / cos(radians(lat))))
+        lon = degrees(P(radians(lon), pi))
+        rects = [[lon - dlon, lat - rad, lon + dlon, lat + rad]]
+        # across 180 meridian
+        if lon - dlon < -180:
+            rects += [[lon - dlon + 360, lat - rad, 180, lat + rad]]
+        if lon + dlon > 180:
+            rects += [[-180, lat - rad, lon + dlon - 360, lat + rad]]
+        return rects
+
+    def boundsOf(self, coords):
+        """Return rect [left,bottom,right,top] of coords or None (in degrees).
+        COORDS list of coords [[x,y],[x1,y1]...] (in degrees)."""
+        if isinstance(coords, Coords):
+            if coords:
+                xs, ys = coords.flat[0::2], coords.flat[1::2]
+                return [min(xs), min(ys), max(xs), max(ys)]
+        elif coords:
+            xs = [float(c[0]) for c in coords]
+            ys = [float(c[1]) for c in coords]
+            return [min(xs), min(ys), max(xs), max(ys)]
+
     def langOf(self):
         return self.__lang
 
@@ -808,88 +1543,268 @@ class dbCarta:
         """Return list of `points` [pt1, pt2,...] from coords. Rev. to fromPoints.
         COORDS list of coords [[x,y],[x1,y1]...] (in degrees).
         DOSCALE (opt.) consider scale {1|0 (default)}."""
+        return self.toPointsMany([coords], doscale)[0]
+
+    def toPointsMany(self, mcoords=[], doscale=0):
+        """Return list of `points` lists for many objects projected by one pass. See toPoints.
+        MCOORDS list of coords lists [[[x,y],...],[[x1,y1],...],...] (in degrees).
+        DOSCALE (opt.) consider scale {1|0 (default)}."""
+        prm = self.__projParams(doscale)
+        if numpy and sum([len(coords) for coords in mcoords]) >= self.__np_min:
+            return self.__toPointsNp(mcoords, prm)
+        return [self.__toPointsPy(coords, prm) for coords in mcoords]
+
+    def projectCarta(self, ftags=(), doscale=1):
+        """Return list of `points` lists of mflood objects. Use projected geometry cache.
+        FTAGS tags of objects from mflood.
+        DOSCALE (opt.) consider scale {1 (default)|0}."""
+        if self.__temp.get('coarse'):
+            # Globe drag: coarse level, no interpolation and cache
+            level = len(self.lodtol)
+            mpoints = self.toPointsMany([self.levelCoords(ftag, level) for ftag in ftags])
+        else:
+            level = self.lodOf()
+            key = self.__projKey() + (level, self.zoomBand())
+            mpoints = [self.pcache.get(key, ftag) for ftag in ftags]
+        # project not cached by one pass
+        missed = [i for i, points in enumerate(mpoints) if points is None]
+        if missed:
+            for i, points in zip(missed, self.toPointsMany([self.densifyCarta(ftags[i], level) for i in missed])):
+                self.pcache.put(key, ftags[i], points)
+                mpoints[i] = points
+        if doscale:
+            scale = self.slider.var.get()
+            mpoints = [[v * scale for v in points] for points in mpoints]
+        return mpoints
+
+    def __projKey(self):
+        """Return key of current projection params for projected geometry cache."""
+        z_angle = self.__temp.get('z_angle', 0)
+        if self.isSpherical():
+            center = tuple(self.__temp.get('centerof', [[0,0]])[0])
+        elif z_angle:
+            center = tuple(self.__viewcenterRaw())
+        else:
+            center = None
+        return (self.project, center, z_angle, self.halfX, self.halfY, self.ylimit)
+
+    def __projParams(self, doscale=0):
+        """Return tuple of projection constants for toPointsMany.
+        DOSCALE see toPoints."""
+        scale = [1, self.slider.var.get()][doscale]
+        k = self.delta * scale
+        roll = radians(self.__temp.get('z_angle', 0))
+        rcx = rcy = cx = sin_cy = cos_cy = 0
+        if self.project == 203:
+            self.__temp['centerof'] = centerof = self.__temp.get('centerof', [[0,0]])
+            cx, cy = [radians(float(x)) for x in centerof[0]]
+            cx += pi
+            sin_cy, cos_cy = sin(cy), cos(cy)
+        elif roll:
+            # rotate around visible center
+            rcx, rcy = self.__viewcenterRaw()
+        return (self.project, k, self.halfX * scale, [-k, k][self.project == 203], self.halfY * scale,
+                roll, cos(roll), sin(roll), rcx, rcy, cx, sin_cy, cos_cy)
+
+    def __toPointsPy(self, coords, prm):
+        """Return list of `points` from coords (pure Python). See toPointsMany."""
+        project, kx, bx, ky, by, roll, rc, rs, rcx, rcy, cx, sin_cy, cos_cy = prm
+        ylimit = self.ylimit
         points = []
-        centerof = self.fromPoints(self.viewcenterOf())
+        if isinstance(coords, Coords):
+            coords = zip(coords.flat[0::2], coords.flat[1::2])
         for x, y in coords:
-            if self.project in (0, 101):
-                x = float(x)
-                y = [self.toMercator(float(y)), float(y)][self.project != 101]
-                x, y = self.rotateZ([x, y], centerof)
-                y = -y
-            elif self.project == 203:
-                tmp = self.toSphere([x, y])
-                if not tmp:
+            x, y = float(x), float(y)
+            if project == 203:
+                x, y = radians(x), radians(y)
+                cos_y, sin_y, cos_dx = cos(y), sin(y), cos(cx - x)
+                # back side of sphere
+                if sin_y * sin_cy - cos_y * cos_cy * cos_dx <= 0:
                     continue
-                x, y = self.rotateZ(tmp)
-            _x = x * self.delta + self.halfX 
-            _y = y * self.delta + self.halfY
-            if doscale:
-                points += [_x * self.slider.var.get(), _y * self.slider.var.get()]
+                x, y = degrees(cos_y * sin(cx - x)), degrees(-sin_y * cos_cy - sin_cy * cos_y * cos_dx)
+                if roll:
+                    x, y = x * rc + y * rs, y * rc - x * rs
             else:
-                points += [_x, _y]
+                if project == 101:
+                    if abs(y) > ylimit:
+                        y = [-ylimit, ylimit][y > 0]
+                    y = degrees(log(tan(radians(y) / 2.0 + pi / 4.0)))
+                if roll:
+                    dx, dy = rcx - x, y - rcy
+                    x, y = rcx - dx * rc + dy * rs, rcy + dy * rc + dx * rs
+            points += [x * kx + bx, y * ky + by]
         return points
 
+    def __toPointsNp(self, mcoords, prm):
+        """Return list of `points` lists from coords lists (numpy). See toPointsMany."""
+        project, kx, bx, ky, by, roll, rc, rs, rcx, rcy, cx, sin_cy, cos_cy = prm
+        sizes = [len(coords) for coords in mcoords]
+        # compact coords without copy to lists
+        xy = numpy.concatenate([numpy.frombuffer(coords.flat, dtype=float) if isinstance(coords, Coords)
+                                else numpy.array(coords, dtype=float).reshape(-1) for coords in mcoords if len(coords)] or [numpy.empty(0)]).reshape(-1, 2)
+        x, y = xy[:, 0], xy[:, 1]
+        mask = None
+        if project == 203:
+            x, y = numpy.radians(x), numpy.radians(y)
+            cos_y, sin_y, cos_dx = numpy.cos(y), numpy.sin(y), numpy.cos(cx - x)
+            mask = sin_y * sin_cy - cos_y * cos_cy * cos_dx > 0
+            x, y = numpy.degrees(cos_y * numpy.sin(cx - x)), numpy.degrees(-sin_y * cos_cy - sin_cy * cos_y * cos_dx)
+            if roll:
+                x, y = x * rc + y * rs, y * rc - x * rs
+        else:
+            if project == 101:
+                y = numpy.clip(y, -self.ylimit, self.ylimit)
+                y = numpy.degrees(numpy.log(numpy.tan(numpy.radians(y) / 2.0 + pi / 4.0)))
+            if roll:
+                dx, dy = rcx - x, y - rcy
+                x, y = rcx - dx * rc + dy * rs, rcy + dy * rc + dx * rs
+        pts = numpy.empty((len(xy), 2))
+        pts[:, 0] = x * kx + bx
+        pts[:, 1] = y * ky + by
+        mpoints, i = [], 0
+        for n in sizes:
+            part = pts[i:i + n]
+            if mask is not None:
+                part = part[mask[i:i + n]]
+            mpoints.append(part.ravel().tolist())
+            i += n
+        return mpoints
+
     def fromPoints(self, points=[], dorotatez=1, dosphere=0):
         """Return list of coords [[x,y],[x1,y1]...] from `points`(in degrees). Rev. to toPoints.
         Call rotateZ if DOROTATEZ and `fromSphere if DOSPHERE.
         POINTS list [pt1, pt2,...] of `points`."""
-        b, coords = 0, []
+        scale = self.slider.var.get()
+        center_x, center_y = self.__viewcenterRaw()
+        roll = [0, radians(self.__temp.get('z_angle', 0))][bool(dorotatez)]
+        dosphere = self.isSpherical() and dosphere
+        if not dosphere:
+            roll = -roll
+        prm = (scale, dosphere, roll, cos(roll), sin(roll), center_x, center_y)
+        if numpy and len(points) >= 2 * self.__np_min:
+            return self.__fromPointsNp(points, prm)
+        return self.__fromPointsPy(points, prm)
+
+    def __viewcenterRaw(self):
+        """Return center of visible area as [x,y] before projection (in degrees)."""
+        scale = self.slider.var.get()
         center_x, center_y = self.viewcenterOf()
-        for point in points:
-            if not b:
-                x, center_x = [(point / self.slider.var.get() - self.halfX) / self.delta for point in [point, center_x]]
+        return [ (center_x / scale - self.halfX) / self.delta,
+                 -(center_y / scale - self.halfY) / self.delta ]
+
+    def __fromPointsPy(self, points, prm):
+        """Return list of coords from `points` (pure Python). See fromPoints."""
+        scale, dosphere, roll, rc, rs, center_x, center_y = prm
+        kx, bx = 1.0 / (scale * self.delta), self.halfX / self.delta
+        ky, by = -kx, -self.halfY / self.delta
+        # inverse ortho projection, see fromSphere
+        asinz = lambda x: asin([x, ([-1.0, 1.0][x > 1.0])][abs(x) > 1.0])
+        adjust_lon = lambda x: [(x - ([1, -1][x < 0] * 2.0 * pi)), x][abs( x ) < pi]
+        EPSLN = 1.0e-10
+        cx, cy = [radians(float(x)) for x in self.__temp.get('centerof', [[0,0]])[0]]
+        sin_p14, cos_p14 = sin(cy), cos(cy)
+        ispole = abs(abs(cy) - pi / 2.0) <= EPSLN
+        coords = []
+        for i in range(1, len(points), 2):
+            x, y = points[i - 1] * kx - bx, points[i] * ky - by
+            if dosphere:
+                if roll:
+                    x, y = x * rc + y * rs, y * rc - x * rs
+                x, y = radians(x), radians(y)
+                rh = sqrt(x * x + y * y) + EPSLN
+                if rh > 1:
+                    continue
+                z = asinz(rh)
+                sinz, cosz = sin(z), cos(z)
+                lon = cx
+                lat = asinz(cosz * sin_p14 + (y * sinz * cos_p14) / rh)
+                if ispole:
+                    if cy >= EPSLN:
+                        lon = adjust_lon(cx + atan2(x, y))
+                    else:
+                        lon = adjust_lon(cx - atan2(-x, y))
+                con = cosz - sin_p14 * sin(lat)
+                if abs(con) >= EPSLN or abs(x) >= EPSLN:
+                    lon = adjust_lon(cx + atan2((x * sinz * cos_p14), (con * rh)))
+                coords += [[degrees(lon), degrees(lat)]]
             else:
-                y, center_y = [-(point / self.slider.var.get() - self.halfY) / self.delta for point in [point, center_y]]
-                if self.isSpherical() and dosphere:
-                    if dorotatez:
-                        x, y = self.rotateZ([x, y])
-                    _coords = self.fromSphere([x, y])
-                    if _coords:
-                        coords += [_coords]
-                else:
-                    if dorotatez:
-                        x, y = self.rotateZ([x, y], [[center_x, center_y]], reverse=1)
-                    y = [self.fromMercator(y), y][self.project != 101]
-                    coords += [[x, y]]
-            b = not b
+                if roll:
+                    dx, dy = center_x - x, y - center_y
+                    x, y = center_x - dx * rc + dy * rs, center_y + dy * rc + dx * rs
+                if self.project == 101:
+                    y = self.fromMercator(y)
+                coords += [[x, y]]
         return coords
 
-    def toCoords(self, strcoords):
+    def __fromPointsNp(self, points, prm):
+        """Return list of coords from `points` (numpy). See fromPoints."""
+        scale, dosphere, roll, rc, rs, center_x, center_y = prm
+        xy = numpy.array(points[:len(points) // 2 * 2], dtype=float).reshape(-1, 2)
+        x = (xy[:, 0] / scale - self.halfX) / self.delta
+        y = -(xy[:, 1] / scale - self.halfY) / self.delta
+        if dosphere:
+            if roll:
+                x, y = x * rc + y * rs, y * rc - x * rs
+            # inverse ortho projection, see fromSphere
+            EPSLN = 1.0e-10
+            cx, cy = [radians(float(v)) for v in self.__temp.get('centerof', [[0,0]])[0]]
+            sin_p14, cos_p14 = sin(cy), cos(cy)
+            x, y = numpy.radians(x), numpy.radians(y)
+            rh = numpy.sqrt(x * x + y * y) + EPSLN
+            inside = rh <= 1
+            x, y, rh = x[inside], y[inside], rh[inside]
+            z = numpy.arcsin(numpy.clip(rh, -1.0, 1.0))
+            sinz, cosz = numpy.sin(z), numpy.cos(z)
+            lat = numpy.arcsin(numpy.clip(cosz * sin_p14 + (y * sinz * cos_p14) / rh, -1.0, 1.0))
+            lon = numpy.full(len(x), cx)
+            if abs(abs(cy) - pi / 2.0) <= EPSLN:
+                if cy >= EPSLN:
+                    lon = cx + numpy.arctan2(x, y)
+                else:
+                    lon = cx - numpy.arctan2(-x, y)
+            con = cosz - sin_p14 * numpy.sin(lat)
+            lon = numpy.where((numpy.abs(con) >= EPSLN) | (numpy.abs(x) >= EPSLN),
+                              cx + numpy.arctan2(x * sinz * cos_p14, con * rh), lon)
+            # adjust_lon
+            lon = numpy.where(numpy.abs(lon) < pi, lon, lon - numpy.where(lon < 0, -2.0 * pi, 2.0 * pi))
+            x, y = numpy.degrees(lon), numpy.degrees(lat)
+        else:
+            if roll:
+                dx, dy = center_x - x, y - center_y
+                x, y = center_x - dx * rc + dy * rs, center_y + dy * rc + dx * rs
+            if self.project == 101:
+                y = numpy.degrees(2.0 * (numpy.arctan(numpy.exp(numpy.radians(y))) - pi / 4.0))
+        return numpy.column_stack((x, y)).tolist()
+
+    def toCoords(self, strcoords, flat=0):
         """Return list of coords [[x,y],[x1,y1]...] from string (in degrees).
-        STRCOORDS string of coords, e.g. '(x,y),(x1,y1),...'."""
+        STRCOORDS string of coords, e.g. '(x,y),(x1,y1),...'.
+        FLAT (opt.) return flat array('d') [x,y,x1,y1...] {1|0 (default)}."""
         regstr = '(-?\d+\.?\d*)[ \t]*,[ \t]*(-?\d+\.?\d*)'
+        if flat:
+            return array('d', [float(v) for xy in re.findall(regstr, strcoords or '') for v in xy])
         coords = []
         if strcoords:
             coords = [[float(x), float(y)] for x, y in re.findall(regstr, strcoords)]
         return coords
 
     def fromWKT(self, wkt):
-        """Return list of coords from wkt-string.
+        """Return list of coords from wkt-string or None if invalid. See parseWKT.
         WKT string, e.g. 'MULTIPOINT((0 0),(20 30))'."""
-        r = '(-?\\d+\\.?\\d*)[ \t]+[ \t]*(-?\\d+\\.?\\d*)'
-        r1 = '((?:POINT|MULTIPOINT|LINESTRING|MULTILINESTRING|POLYGON|MULTIPOLYGON)[^a-zA-Z]+)'
-        # wkt-string -> type and coords
-        wkt = wkt.replace("(", "[").replace(")", "]")
-        tp = wkt[:wkt.find("[")]
-        # recurse call
-        if (tp in ('GEOMETRYCOLLECTION')):
-            m = re.findall(r1, wkt[:len(wkt)-1])
-            coords = []
-            for x in m:
-                coords += self.fromWKT(x.rstrip(","))
-            return coords
         try:
-            e = eval(re.sub(r, '[\\1,\\2]', wkt[wkt.find("["):]))
-        except:
+            geoms = parseWKT(wkt)
+        except ValueError:
+            return
+        return [[tp, [[pairsOf(ring) for ring in part] for part in parts]] for tp, parts in geoms]
+
+    def fromWKB(self, wkb):
+        """Return list of coords from WKB as fromWKT or None if invalid. See parseWKB.
+        WKB bytes or memoryview."""
+        try:
+            geoms = parseWKB(wkb)
+        except ValueError:
             return
-        if (tp in ('MULTIPOINT')):
-            return [[tp, [[[x]] for x in e]]]
-        if (tp in ('POINT', 'LINESTRING')):
-            return [[tp, [[e]]]]
-        if (tp in ('MULTILINESTRING', 'POLYGON')):
-            return [[tp, [e]]]
-        if (tp in ('MULTIPOLYGON')):
-            return [[tp, e]]
+        return [[tp, [[pairsOf(ring) for ring in part] for part in parts]] for tp, parts in geoms]
 
     def toMercator(self, y, ylimit=None):
         """Return latitude in Mercator project. Rev. to fromMercator.
@@ -977,23 +1892,649 @@ class dbCarta:
         x, y, x1, y1 = [radians(x) for x in coords[0] + coords[1]]
         return 6378.136 * acos(cos(y) * cos(y1) * cos(x - x1) + sin(y) * sin(y1))
 
+    def lodOf(self, scale=None):
+        """Return level of detail for scale: 0 all coords or index in lodtol + 1.
+        SCALE (opt.) slider value (current default)."""
+        # half of pixel (in degrees)
+        pixel = 0.5 / (self.delta * (scale or self.slider.var.get()))
+        for i, tol in enumerate(self.lodtol):
+            if tol <= pixel:
+                return i + 1
+        return 0
+
+    def levelCoords(self, ftag, level=0):
+        """Return coords of mflood object for level of detail. See lodOf.
+        FTAG tag of object.
+        LEVEL (opt.) level of detail (0 all coords default)."""
+        value = self.mflood[ftag]
+        if level and value.get('lod'):
+            return value['lod'][level - 1]
+        return value['coords']
+
+    def simplifyCoords(self, coords, cls='Line'):
+        """Return list of coords lists simplified by Douglas-Peucker for each tolerance from lodtol
+        or None if not need.
+        COORDS list of coords [[x,y],[x1,y1]...] (in degrees).
+        CLS (opt.) class of layer {Line (default)|Polygon|Dot}."""
+        n = len(coords)
+        minpts = {'Line': 2, 'Polygon': 4}.get(cls)
+        if not minpts or n <= 2 * minpts:
+            return
+        pts = [[float(x), float(y)] for x, y in coords]
+        # weight of point is max tolerance which keeps it
+        weight = [0.0] * n
+        weight[0] = weight[-1] = float('inf')
+        stack = [(0, n - 1, float('inf'))]
+        while stack:
+            i, j, parent = stack.pop()
+            if j - i < 2:
+                continue
+            k, dmax = i + 1, -1.0
+            for m in range(i + 1, j):
+                d = self.__segmentDist(pts[m][0], pts[m][1], pts[i], pts[j])
+                if d > dmax:
+                    k, dmax = m, d
+            weight[k] = min(dmax, parent)
+            stack += [(i, k, weight[k]), (k, j, weight[k])]
+        # levels from coarse to fine, reuse list if no profit
+        lod, prev = [], coords
+        for tol in reversed(self.lodtol):
+            level = [pts[i] for i in range(n) if weight[i] > tol]
+            if len(level) < minpts or len(level) > 0.9 * len(prev):
+                level = prev
+            elif isinstance(coords, Coords):
+                level = Coords(level)
+            lod.insert(0, level)
+            prev = level
+        return lod
+
+    def arcOf(self, coords):
+        """Return the angle of the great circle between two points (in degrees).
+        COORDS points list [[x,y],[x1,y1]] (in degrees)."""
+        x, y, x1, y1 = [radians(x) for x in coords[0] + coords[1]]
+        return degrees(acos(max(-1.0, min(1.0, cos(y) * cos(y1) * cos(x - x1) + sin(y) * sin(y1)))))
+
+    def findCarta(self, x, y, d=5):
+        """Return list of tags of mflood objects under point. Use spatial index.
+        X, Y `points` on canvas.
+        D (opt.) tolerance (in points)."""
+        coords = self.fromPoints([x, y, x + d, y + d], dosphere=1)
+        if len(coords) < 2:
+            return []
+        (cx, cy), (dx, dy) = coords
+        tol = max(abs(dx - cx), abs(dy - cy))
+        ftags = []
+        for ftag in sorted(self.sindex.query([cx - tol, cy - tol, cx + tol, cy + tol])):
+            value = self.mflood[ftag]
+            pts = [[float(px), float(py)] for px, py in value['coords']]
+            cls = self.mopt[value['ftype']]['cls']
+            if cls == 'Polygon' and value.get('bg') and self.__inPolygon(cx, cy, pts):
+                ftags.append(ftag)
+            elif cls == 'Dot' and max(abs(pts[0][0] - cx), abs(pts[0][1] - cy)) <= tol:
+                ftags.append(ftag)
+            elif cls != 'Dot':
+                if cls == 'Polygon':
+                    pts = pts + pts[:1]
+                for i in range(len(pts) - 1):
+                    if self.__segmentDist(cx, cy, pts[i], pts[i + 1]) <= tol:
+                        ftags.append(ftag)
+                        break
+        return ftags
+
+    def __inPolygon(self, x, y, pts):
+        """Return True if point x,y is inside polygon PTS (even-odd rule)."""
+        inside = False
+        for i in range(len(pts)):
+            (x1, y1), (x2, y2) = pts[i - 1], pts[i]
+            if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                inside = not inside
+        return inside
+
+    def __segmentDist(self, x, y, pt1, pt2):
+        """Return distance from point x,y to segment [pt1, pt2]."""
+        (x1, y1), (x2, y2) = pt1, pt2
+        dx, dy = x2 - x1, y2 - y1
+        t = 0
+        if dx or dy:
+            t = max(0, min(1, ((x - x1) * dx + (y - y1) * dy) / float(dx * dx + dy * dy)))
+        return sqrt((x1 + t * dx - x) ** 2 + (y1 + t * dy - y) ** 2)
+
+    def interpolateLine(self, coords):
+        """Return coords densified along great circles for Globe projection
+        within densifytol at current zoom band. See densifyCoords.
+        COORDS list of coords [[x,y],[x1,y1]...] (in degrees)."""
+        if self.isSpherical() and len(coords) > 1:
+            return self.densifyCoords(coords, self.densifyStep())
+        return coords
+
     def interpolateCoords(self, coords, scalestep=500):
-        """Return list of coords as interpol. of two points [[x,y],[x1,y1]].
+        """Return list of coords along great circle of two points [[x,y],[x1,y1]].
         COORDS points list [[x,y],[x1,y1]] (in degrees).
         SCALESTEP step (in km)."""
-        x, y, x1, y1 = coords[0] + coords[1]
-        scalestep = int(self.distance(coords) / scalestep)
-        if not scalestep:
+        return self.densifyCoords(coords, scalestep / 6378.136).tolist()
+
+    def zoomBand(self, scale=None):
+        """Return zoom band of scale as power of 2 (scales of band are up to 2 ** band).
+        SCALE (opt.) slider value (current default)."""
+        return int(ceil(log(scale or self.slider.var.get(), 2)))
+
+    def densifyStep(self, scale=None):
+        """Return max. angle of segment (in radians) which deviates from great circle
+        within densifytol on Globe at upper scale of zoom band. See zoomBand.
+        SCALE (opt.) slider value (current default)."""
+        # Globe radius (in pixels), sagitta of arc R * (1 - cos(angle / 2))
+        radius = 180 / pi * self.delta * 2.0 ** self.zoomBand(scale)
+        return 2 * acos(max(0.0, 1 - self.densifytol / radius))
+
+    def densifyCarta(self, ftag, level=0):
+        """Return coords of mflood object densified for Globe (see interpolateLine)
+        by level of detail. Cached by object, zoom band and level.
+        FTAG tag of object.
+        LEVEL (opt.) level of detail, see levelCoords."""
+        coords = self.levelCoords(ftag, level)
+        if not self.isSpherical() or len(coords) < 2:
+            return coords
+        key = ('densify', self.zoomBand(), level)
+        _coords = self.pcache.get(key, ftag)
+        if _coords is None:
+            _coords = self.densifyCoords(coords, self.densifyStep())
+            self.pcache.put(key, ftag, _coords)
+        return _coords
+
+    def densifyCoords(self, coords, step):
+        """Return Coords with points inserted along great circles of segments
+        longer than STEP. Segments of antipodal points are kept.
+        COORDS list of coords [[x,y],[x1,y1]...] or Coords (in degrees).
+        STEP max. angle of segment (in radians)."""
+        if not isinstance(coords, Coords):
+            coords = Coords(coords)
+        n = len(coords)
+        if n < 2:
             return coords
-        scale_dx = (x1 - x) / scalestep
-        scale_dy = (y1 - y) / scalestep
-        _x, _y = x, y
-        interpol_pts = [[_x, _y]]
-        for i in range(scalestep):
-            _x += scale_dx
-            _y += scale_dy
-            interpol_pts += [[_x, _y]]
-        return interpol_pts
+        if numpy and n >= self.__np_min:
+            xy = numpy.frombuffer(coords.flat, dtype=float).reshape(-1, 2)
+            lon, lat = numpy.radians(xy[:, 0]), numpy.radians(xy[:, 1])
+            v = numpy.column_stack((numpy.cos(lat) * numpy.cos(lon), numpy.cos(lat) * numpy.sin(lon), numpy.sin(lat)))
+            angle = numpy.arccos(numpy.clip((v[:-1] * v[1:]).sum(axis=1), -1.0, 1.0))
+            parts = numpy.maximum(numpy.ceil(angle / step), 1).astype(int)
+            parts[angle > pi - 1e-9] = 1
+            if (parts == 1).all():
+                return coords
+            seg = numpy.repeat(numpy.arange(n - 1), parts)
+            t = (numpy.arange(len(seg)) - numpy.repeat(numpy.cumsum(parts) - parts, parts)) / numpy.repeat(parts, parts).astype(float)
+            angle, sin_a = angle[seg], numpy.sin(angle[seg])
+            small = sin_a < 1e-12
+            sin_a[small] = 1.0
+            w0 = numpy.where(small, 1 - t, numpy.sin((1 - t) * angle) / sin_a)
+            w1 = numpy.where(small, t, numpy.sin(t * angle) / sin_a)
+            p = w0[:, None] * v[seg] + w1[:, None] * v[seg + 1]
+            out = numpy.empty((len(seg) + 1, 2))
+            out[:-1, 0] = numpy.degrees(numpy.arctan2(p[:, 1], p[:, 0]))
+            out[:-1, 1] = numpy.degrees(numpy.arctan2(p[:, 2], numpy.hypot(p[:, 0], p[:, 1])))
+            # keep vertices as is
+            out[numpy.cumsum(parts) - parts] = xy[:-1]
+            out[-1] = xy[-1]
+            return Coords(flat=array('d', out.ravel().tolist()))
+        flat = coords.flat
+        out = array('d', flat[:2])
+        x0, y0 = radians(flat[0]), radians(flat[1])
+        v0 = [cos(y0) * cos(x0), cos(y0) * sin(x0), sin(y0)]
+        for i in range(2, len(flat), 2):
+            x1, y1 = radians(flat[i]), radians(flat[i + 1])
+            v1 = [cos(y1) * cos(x1), cos(y1) * sin(x1), sin(y1)]
+            angle = acos(max(-1.0, min(1.0, v0[0] * v1[0] + v0[1] * v1[1] + v0[2] * v1[2])))
+            parts = int(ceil(angle / step))
+            if parts > 1 and angle <= pi - 1e-9:
+                sin_a = sin(angle)
+                for k in range(1, parts):
+                    t = k / float(parts)
+                    w0, w1 = sin((1 - t) * angle) / sin_a, sin(t * angle) / sin_a
+                    px, py, pz = [w0 * a + w1 * b for a, b in zip(v0, v1)]
+                    out.extend([degrees(atan2(py, px)), degrees(atan2(pz, sqrt(px * px + py * py)))])
+            out.extend(flat[i:i + 2])
+            v0 = v1
+        return Coords(flat=out)
+
+"""WKT geometry types and its depth of coords nesting."""
+WKT_TYPES = {
+    'POINT': 1, 'LINESTRING': 1, 'POLYGON': 2,
+    'MULTIPOINT': 2, 'MULTILINESTRING': 2, 'MULTIPOLYGON': 3,
+    'GEOMETRYCOLLECTION': 0,
+}
+_wkt_token = re.compile(r'\s*([A-Za-z]+|.?)', re.S)
+
+def parseWKT(wkt):
+    """Return list of geometries [[type, parts],...] from wkt-string.
+    Parts as list of rings [[ring,...],...], ring is flat array('d') of coords [x,y,x1,y1...].
+    Z, M values are dropped, GEOMETRYCOLLECTION is unfolded. Raise ValueError if invalid.
+    WKT string, e.g. 'MULTIPOINT((0 0),(20 30))' (EWKT `SRID=n;` prefix allowed)."""
+    geoms = []
+    pos = 0
+    if wkt[:5].upper() == 'SRID=':
+        pos = wkt.index(';') + 1
+    pos = _wktGeometry(wkt, pos, geoms)
+    if wkt[pos:].strip():
+        raise ValueError('WKT: unexpected %r at %s' % (wkt[pos:pos + 20], pos))
+    return geoms
+
+def iterWKT(fileobj, bufsize=65536):
+    """Generate geometries [type, parts] from file-like object with WKT-strings
+    separated by spaces, newlines, `;` or `,`. See parseWKT.
+    FILEOBJ object with read(size) method.
+    BUFSIZE (opt.) size of read block."""
+    delim = re.compile(r'[()]|EMPTY', re.I)
+    buf, scan, depth = '', 0, 0
+    while True:
+        chunk = fileobj.read(bufsize)
+        if not isinstance(chunk, str):
+            chunk = chunk.decode('ascii')
+        buf += chunk
+        start = 0
+        for m in delim.finditer(buf, scan):
+            scan = m.end()
+            if m.group(0) == '(':
+                depth += 1
+                continue
+            if m.group(0) == ')':
+                depth -= 1
+            if depth:
+                continue
+            # end of geometry at depth 0
+            for geom in parseWKT(buf[start:scan].lstrip(' \t\r\n;,')):
+                yield geom
+            start = scan
+        buf = buf[start:]
+        scan -= start
+        if not chunk:
+            break
+    if buf.strip(' \t\r\n;,'):
+        raise ValueError('WKT: incomplete %r' % (buf[:20],))
+
+def _wktGeometry(wkt, pos, geoms):
+    """Parse one geometry at POS to GEOMS. Return next pos. See parseWKT."""
+    m = _wkt_token.match(wkt, pos)
+    tp = m.group(1).upper()
+    pos = m.end()
+    # ZM suffix or keyword
+    for suffix in ('ZM', 'Z', 'M'):
+        if tp.endswith(suffix) and tp[:-len(suffix)] in WKT_TYPES:
+            tp = tp[:-len(suffix)]
+    if not tp in WKT_TYPES:
+        raise ValueError('WKT: unknown type %r at %s' % (tp, pos))
+    m = _wkt_token.match(wkt, pos)
+    if m.group(1).upper() in ('Z', 'M', 'ZM'):
+        pos = m.end()
+        m = _wkt_token.match(wkt, pos)
+    if m.group(1).upper() == 'EMPTY':
+        if tp != 'GEOMETRYCOLLECTION':
+            geoms.append([tp, []])
+        return m.end()
+    if tp == 'GEOMETRYCOLLECTION':
+        pos = _wktExpect(wkt, pos, '(')
+        while True:
+            pos = _wktGeometry(wkt, pos, geoms)
+            m = _wkt_token.match(wkt, pos)
+            if m.group(1) != ',':
+                return _wktExpect(wkt, pos, ')')
+            pos = m.end()
+    depth = WKT_TYPES[tp]
+    # POINT, LINESTRING as one ring; MULTIPOINT, MULTILINESTRING, POLYGON as rings of one part
+    parts, pos = _wktList(wkt, pos, depth, tp == 'MULTIPOINT')
+    if depth == 1:
+        parts = [[parts]]
+    elif depth == 2:
+        parts = [parts]
+    if tp == 'MULTIPOINT':
+        parts = [[array('d', ring[i:i + 2])] for ring in parts[0] for i in range(0, len(ring), 2)]
+    geoms.append([tp, parts])
+    return pos
+
+def _wktExpect(wkt, pos, tok):
+    """Return pos after token TOK at POS or raise ValueError."""
+    m = _wkt_token.match(wkt, pos)
+    if m.group(1) != tok:
+        raise ValueError('WKT: expected %r at %s' % (tok, pos))
+    return m.end()
+
+def _wktList(wkt, pos, depth, ispoints=False):
+    """Parse nested lists of coords with DEPTH at POS. Return (list or ring, next pos)."""
+    pos = _wktExpect(wkt, pos, '(')
+    if depth == 1 or ispoints and _wkt_token.match(wkt, pos).group(1) != '(':
+        # coords up to close paren
+        end = wkt.find(')', pos)
+        if end < 0:
+            raise ValueError('WKT: expected %r at %s' % (')', pos))
+        ring = _wktRing(wkt[pos:end], pos)
+        return [ring, [ring]][depth > 1], end + 1
+    items = []
+    while True:
+        item, pos = _wktList(wkt, pos, depth - 1, ispoints)
+        items.append(item)
+        m = _wkt_token.match(wkt, pos)
+        if m.group(1) != ',':
+            break
+        pos = m.end()
+    pos = _wktExpect(wkt, pos, ')')
+    if ispoints:
+        # MULTIPOINT((x y),(x1 y1)) as one ring
+        ring = array('d')
+        for x in items:
+            ring.extend(x)
+        return [ring], pos
+    return items, pos
+
+def _wktRing(text, pos=0):
+    """Return flat array('d') [x,y,x1,y1...] from coords text 'x y [z [m]],...'."""
+    comma = text.find(',')
+    dims = len(text[:[comma, len(text)][comma < 0]].split())
+    try:
+        values = array('d', map(float, text.replace(',', ' ').split()))
+    except ValueError:
+        raise ValueError('WKT: invalid coords at %s' % (pos,))
+    if dims < 2 or len(values) % dims:
+        raise ValueError('WKT: invalid coords at %s' % (pos,))
+    if dims == 2:
+        return values
+    ring = array('d', values[:2 * (len(values) // dims)])
+    ring[0::2] = values[0::dims]
+    ring[1::2] = values[1::dims]
+    return ring
+
+"""WKB geometry type codes."""
+WKB_TYPES = dict(enumerate(('GEOMETRY', 'POINT', 'LINESTRING', 'POLYGON', 'MULTIPOINT', 'MULTILINESTRING', 'MULTIPOLYGON', 'GEOMETRYCOLLECTION')))
+
+def parseWKB(wkb):
+    """Return list of geometries [[type, parts],...] from WKB as parseWKT.
+    ISO (Z, M as type + 1000, 2000, 3000) and EWKB (flags, SRID) are allowed.
+    Z, M values are dropped, GEOMETRYCOLLECTION is unfolded. Raise ValueError if invalid.
+    WKB bytes or memoryview."""
+    geoms = []
+    wkb = memoryview(wkb)
+    try:
+        pos = _wkbGeometry(wkb, 0, geoms)
+    except struct.error:
+        raise ValueError('WKB: unexpected end of data')
+    if pos != len(wkb):
+        raise ValueError('WKB: unexpected data at %s' % (pos,))
+    return geoms
+
+def _wkbGeometry(wkb, pos, geoms, tp=None):
+    """Parse one geometry at POS to GEOMS. Return next pos. See parseWKB.
+    TP (opt.) type expected by parent multi-geometry."""
+    order = '<>'[wkb[pos:pos + 1].tobytes() == b'\x00']
+    code, = struct.unpack_from(order + 'I', wkb, pos + 1)
+    pos += 5
+    dims = 2 + bool(code & 0x80000000) + bool(code & 0x40000000)
+    if code & 0x20000000:
+        pos += 4  # skip SRID
+    code &= 0x0fffffff
+    ptp = WKB_TYPES.get(code % 1000)
+    if ptp in (None, 'GEOMETRY') or code >= 4000 or tp and ptp != tp:
+        raise ValueError('WKB: unknown type %s at %s' % (code, pos - 5))
+    # ISO Z, M, ZM
+    dims += (0, 1, 1, 2)[code // 1000]
+    if dims > 4:
+        raise ValueError('WKB: unknown type %s at %s' % (code, pos - 5))
+    if ptp == 'GEOMETRYCOLLECTION':
+        n, = struct.unpack_from(order + 'I', wkb, pos)
+        pos += 4
+        for i in range(n):
+            pos = _wkbGeometry(wkb, pos, geoms)
+        return pos
+    if ptp == 'POINT':
+        ring, pos = _wkbRing(wkb, pos, order, dims, 1)
+        # NaN coords as empty point
+        geoms.append([ptp, [[ring]][:ring[0] == ring[0]]])
+        return pos
+    if ptp == 'LINESTRING':
+        n, = struct.unpack_from(order + 'I', wkb, pos)
+        ring, pos = _wkbRing(wkb, pos + 4, order, dims, n)
+        geoms.append([ptp, [[ring]][:n > 0]])
+        return pos
+    n, = struct.unpack_from(order + 'I', wkb, pos)
+    pos += 4
+    if ptp == 'POLYGON':
+        rings = []
+        for i in range(n):
+            k, = struct.unpack_from(order + 'I', wkb, pos)
+            ring, pos = _wkbRing(wkb, pos + 4, order, dims, k)
+            rings.append(ring)
+        geoms.append([ptp, [rings][:n > 0]])
+        return pos
+    # MULTIPOINT, MULTILINESTRING, MULTIPOLYGON of simple geometries
+    items = []
+    for i in range(n):
+        pos = _wkbGeometry(wkb, pos, items, ptp[5:])
+    parts = [part for x in items for part in x[1]]
+    if ptp == 'MULTILINESTRING':
+        parts = [[part[0] for part in parts]][:len(parts) > 0]
+    geoms.append([ptp, parts])
+    return pos
+
+def _wkbRing(wkb, pos, order, dims, n):
+    """Return (flat array('d') [x,y,x1,y1...] of N points with DIMS at POS, next pos)."""
+    end = pos + 8 * dims * n
+    if end > len(wkb):
+        raise ValueError('WKB: unexpected end of data')
+    values = array('d')
+    if sys.version_info[0] == 3:
+        values.frombytes(wkb[pos:end].tobytes())
+    else:
+        values.fromstring(wkb[pos:end].tobytes())
+    if order != ['>', '<'][sys.byteorder == 'little']:
+        values.byteswap()
+    if dims == 2:
+        return values, end
+    ring = array('d', values[:2 * n])
+    ring[0::2] = values[0::dims]
+    ring[1::2] = values[1::dims]
+    return ring, end
+
+def pairsOf(ring):
+    """Return list of coords [[x,y],[x1,y1]...] from flat RING [x,y,x1,y1...]."""
+    return [[x, y] for x, y in zip(ring[0::2], ring[1::2])]
+
+DATA_MAGIC = b'DBCARTA\0'
+DATA_VERSION = 1
+DATA_HEADER = struct.Struct('<8sHcxHxxIIIIII')  # magic, version, typecode, grouped, ngroups, nrecords, nfields, nstrings, strbytes, nvalues
+DATA_FIELD = '<BIId'  # kind, a, b, value
+
+def _dataAlign(pos):
+    """Return POS padded to 8 bytes."""
+    return pos + -pos % 8
+
+def writeData(path, data, typecode='d'):
+    """Write DATA to binary dataset file PATH. See DataFile.
+    DATA list of records [field,...] or dict {name: [record,...],...} of grouped records.
+    Fields are None, int, float, str, list of numbers [x,y...] or coords [[x,y],[x1,y1]...].
+    TYPECODE (opt.) 'd' float64 or 'f' float32 coords."""
+    strtypes = (str, type(u''))
+    groups = []
+    if isinstance(data, dict):
+        records = []
+        for name, value in data.items():
+            groups.append((name, len(records), len(value)))
+            records.extend(value)
+    else:
+        records = data
+    strings, sids = [], {}
+    def sid(s):
+        if not isinstance(s, bytes):
+            s = s.encode('utf8')
+        if s not in sids:
+            sids[s] = len(strings)
+            strings.append(s)
+        return sids[s]
+    groups = [(sid(name), first, count) for name, first, count in groups]
+    firsts, fields, values = [], [], array(typecode)
+    for record in records:
+        firsts.append(len(fields))
+        for v in record:
+            if v is None:
+                fields.append((0, 0, 0, 0.))
+            elif isinstance(v, (bool, int)) or type(v).__name__ == 'long':
+                fields.append((1, 0, 0, float(v)))
+            elif isinstance(v, float):
+                fields.append((2, 0, 0, v))
+            elif isinstance(v, strtypes):
+                fields.append((3, sid(v), 0, 0.))
+            elif isinstance(v, (list, tuple, Coords)) and len(v) and isinstance(v[0], (list, tuple)):
+                fields.append((4, len(values), len(v), 0.))
+                values.extend([float(c) for xy in v for c in xy[:2]])
+            elif isinstance(v, (list, tuple)):
+                fields.append((5, len(values), len(v), 0.))
+                values.extend([float(c) for c in v])
+            else:
+                raise ValueError('Data: unsupported field %r' % (v,))
+    firsts.append(len(fields))
+    if sys.byteorder != 'little':
+        values.byteswap()
+    strpos = [0]
+    for s in strings:
+        strpos.append(strpos[-1] + len(s))
+    chunks = [DATA_HEADER.pack(DATA_MAGIC, DATA_VERSION, typecode.encode('ascii'), int(isinstance(data, dict)),
+                               len(groups), len(records), len(fields), len(strings), strpos[-1], len(values))]
+    chunks += [struct.pack('<III', *group) for group in groups]
+    chunks += [struct.pack('<%dI' % len(firsts), *firsts)]
+    chunks += [struct.pack(DATA_FIELD, *field) for field in fields]
+    chunks += [struct.pack('<%dI' % len(strpos), *strpos)] + strings
+    size = sum([len(chunk) for chunk in chunks])
+    chunks += [b'\0' * (_dataAlign(size) - size), values.tobytes() if hasattr(values, 'tobytes') else values.tostring()]
+    f = open(path, 'wb')
+    try:
+        f.write(b''.join(chunks))
+    finally:
+        f.close()
+
+class DataFile(object):
+    """Binary dataset file made by writeData and read by mmap.
+    Layout: header, groups table [name,first,count], records table [first field],
+    fields table [kind,a,b,value], strings table with utf8 data and 8 bytes aligned
+    flat float32 or float64 coords block.
+    Records are read on demand as lists of fields, coords as Coords
+    ready for loadCarta."""
+
+    def __init__(self, path):
+        f = open(path, 'rb')
+        try:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        (magic, version, typecode, self.grouped, self.ngroups, self.nrecords, nfields,
+         nstrings, strbytes, nvalues) = DATA_HEADER.unpack_from(self.mm, 0)
+        if magic != DATA_MAGIC or version != DATA_VERSION:
+            self.mm.close()
+            raise ValueError('Data: unknown format of %s' % path)
+        self.typecode = typecode.decode('ascii')
+        self.itemsize = array(self.typecode).itemsize
+        self.groupspos = DATA_HEADER.size
+        self.recordspos = self.groupspos + 12 * self.ngroups
+        self.fieldspos = self.recordspos + 4 * (self.nrecords + 1)
+        self.fieldsize = struct.calcsize(DATA_FIELD)
+        self.stringspos = self.fieldspos + self.fieldsize * nfields
+        self.strdatapos = self.stringspos + 4 * (nstrings + 1)
+        self.valuespos = _dataAlign(self.strdatapos + strbytes)
+
+    def __len__(self):
+        return self.nrecords
+
+    def __iter__(self):
+        for i in range(self.nrecords):
+            yield self.record(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(self.nrecords))]
+        if index < 0:
+            index += self.nrecords
+        if not 0 <= index < self.nrecords:
+            raise IndexError('Data: record index out of range')
+        return self.record(index)
+
+    def string(self, sid):
+        """Return string by SID."""
+        start, end = struct.unpack_from('<II', self.mm, self.stringspos + 4 * sid)
+        s = self.mm[self.strdatapos + start:self.strdatapos + end]
+        if sys.version_info[0] == 3:
+            return s.decode('utf8')
+        return s
+
+    def values(self, pos, n):
+        """Return flat array('d') of N values from POS in coords block."""
+        start = self.valuespos + self.itemsize * pos
+        values = array(self.typecode)
+        if sys.version_info[0] == 3:
+            values.frombytes(self.mm[start:start + self.itemsize * n])
+        else:
+            values.fromstring(self.mm[start:start + self.itemsize * n])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        if self.typecode != 'd':
+            values = array('d', values)
+        return values
+
+    def record(self, index):
+        """Return record by INDEX as list of fields."""
+        first, end = struct.unpack_from('<II', self.mm, self.recordspos + 4 * index)
+        n = end - first
+        fields = struct.unpack_from('<' + DATA_FIELD[1:] * n, self.mm, self.fieldspos + self.fieldsize * first)
+        record = []
+        for i in range(0, 4 * n, 4):
+            kind, a, b, value = fields[i:i + 4]
+            if kind == 0:
+                record.append(None)
+            elif kind == 1:
+                record.append(int(value))
+            elif kind == 2:
+                record.append(value)
+            elif kind == 3:
+                record.append(self.string(a))
+            elif kind == 4:
+                record.append(Coords(flat=self.values(a, 2 * b)))
+            else:
+                record.append(list(self.values(a, b)))
+        return record
+
+    def groups(self):
+        """Return OrderedDict {name: DataView,...} of grouped records."""
+        groups = OrderedDict()
+        for i in range(self.ngroups):
+            sid, first, count = struct.unpack_from('<III', self.mm, self.groupspos + 12 * i)
+            groups[self.string(sid)] = DataView(self, first, count)
+        return groups
+
+    def close(self):
+        self.mm.close()
+
+class DataView(object):
+    """Sequence of COUNT records of DataFile SOURCE from FIRST."""
+
+    def __init__(self, source, first, count):
+        self.source, self.first, self.count = source, first, count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.first, self.first + self.count):
+            yield self.source.record(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.source.record(self.first + i) for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('Data: record index out of range')
+        return self.source.record(self.first + index)
+
+def readData(path):
+    """Open binary dataset file PATH made by writeData.
+    Return DataFile of records or OrderedDict {name: DataView,...} if grouped."""
+    data = DataFile(path)
+    if data.grouped:
+        return data.groups()
+    return data
 
 def setLanguage(lang='', tr='dbcarta'):
     """Return tuple (`translation function`, `lang.name`) for language.
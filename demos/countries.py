@@ -5,9 +5,11 @@ World countries.
 
 from __init__ import *
 from dbcarta import *
-from data.countriesd import *
+from data import dataset
 from data.continents import *
 
+COUNTRIES = dataset('countriesd', 'COUNTRIES')
+
 def paint_dbcarta():
     cntrylist = list(COUNTRIES)
     cntrylist.sort()
@@ -0,0 +1,55 @@
+"""
+Demo datasets as Python modules and packed binary files.
+Binary file MODULE.NAME.dbc is made from NAME of data MODULE by writeData
+(see convert2dbc.py) and read by mmap with readData.
+Files not made by convert2dbc.py are made at first use in CACHE_DIR.
+"""
+
+import os, sys, importlib, warnings
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get('DBCARTA_CACHE') or \
+    os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'dbcarta')
+
+def dbcname(module, name, directory=DATA_DIR):
+    """Return path to binary file of NAME from data MODULE in DIRECTORY (opt.)."""
+    return os.path.join(directory, '%s.%s.dbc' % (module, name))
+
+def convert(module, names=None, typecode='d', directory=DATA_DIR):
+    """Write binary files of NAMES (default all lists and dicts of lists) from data MODULE.
+    TYPECODE (opt.) 'd' float64 or 'f' float32 coords.
+    DIRECTORY (opt.) directory of files (DATA_DIR default).
+    Return list of written paths."""
+    from dbcarta import writeData
+    m = importlib.import_module('data.' + module)
+    paths = []
+    for name in names or [x for x in dir(m) if x.isupper()]:
+        value = getattr(m, name)
+        if isinstance(value, dict) and not all([isinstance(x, list) for x in value.values()]):
+            continue
+        if isinstance(value, (list, dict)):
+            writeData(dbcname(module, name, directory), value, typecode)
+            paths.append(dbcname(module, name, directory))
+    return paths
+
+def dataset(module, name):
+    """Return NAME from data MODULE read from binary file (list of records or
+    dict of lists for grouped data). File made by convert2dbc.py is used if it
+    is newer than module, else file is made in CACHE_DIR at first use and
+    when module is newer (as .pyc). Return value from module with warning
+    if file can't be made or read."""
+    from dbcarta import readData
+    source = os.path.join(DATA_DIR, module + '.py')
+    fresh = lambda path: os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source)
+    path = dbcname(module, name)
+    try:
+        if not fresh(path):
+            path = dbcname(module, name, CACHE_DIR)
+            if not fresh(path):
+                if not os.path.isdir(CACHE_DIR):
+                    os.makedirs(CACHE_DIR)
+                convert(module, [name], directory=CACHE_DIR)
+        return readData(path)
+    except (IOError, OSError, ValueError):
+        warnings.warn('dataset %s.%s: %s, read from module' % (module, name, sys.exc_info()[1]))
+        return getattr(importlib.import_module('data.' + module), name)
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+"""
+Convert data modules to packed binary files MODULE.NAME.dbc for readData.
+Usage: convert2dbc.py [-f] [module ...]
+  -f  float32 coords (default float64)
+"""
+
+import os, sys
+
+d = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(d + '/..'))
+sys.path.insert(0, os.path.abspath(d + '/../..'))
+
+from data import convert, DATA_DIR
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    typecode = ['d', 'f']['-f' in args]
+    modules = [x for x in args if x != '-f'] or ['citiesd', 'constellations', 'continents', 'countries', 'countriesd', 'mosmetro', 'stars']
+    for module in modules:
+        for path in convert(module, typecode=typecode):
+            print('%s %d' % (os.path.basename(path), os.path.getsize(path)))
@@ -3,6 +3,9 @@
 This is a minimally-edited copy of "sgp4io.cpp".
 
 """
+import hashlib
+import json
+import os
 import re
 from math import pi, pow
 from sgp4.ext import days2mdhms, jday
@@ -11,6 +14,7 @@ from sgp4.propagation import sgp4init
 
 INT_RE = re.compile(r'[+-]?\d*')
 FLOAT_RE = re.compile(r'[+-]?\d*(\.\d*)?')
+CACHE_VERSION = 1
 
 
 """
@@ -176,6 +180,18 @@ def twoline2rv(longstr1, longstr2, whichconst, afspc_mode=False):
                sscanf(longstr2,"%2d %5ld %9lf %9lf %8lf %9lf %9lf %11lf %6ld \n",
                       )
 
+       _elements2rv(satrec, nexp, ibexp, whichconst, opsmode)
+       return satrec
+
+
+def _elements2rv(satrec, nexp, ibexp, whichconst, opsmode):
+       """Convert raw TLE elements of `satrec` to sgp4 units and initialize."""
+
+       deg2rad  =   pi / 180.0;         #    0.0174532925199433
+       xpdotp   =  1440.0 / (2.0 *pi);  #  229.1831180523293
+
+       tumin = whichconst.tumin
+
        #  ---- find no, ndot, nddot ----
        satrec.no   = satrec.no / xpdotp; #   rad/min
        satrec.nddot= satrec.nddot * pow(10.0, nexp);
@@ -218,8 +234,6 @@ def twoline2rv(longstr1, longstr2, whichconst, afspc_mode=False):
                  satrec.ecco, satrec.argpo, satrec.inclo, satrec.mo, satrec.no,
                  satrec.nodeo, satrec);
 
-       return satrec
-
 
 def sscanf(data, format):
     """Yes: a bootleg sscanf(), instead of tediously rewriting the above!"""
@@ -269,3 +283,111 @@ def sscanf(data, format):
         start = end
 
     return values
+
+
+def fixed2rv(longstr1, longstr2, whichconst, afspc_mode=False):
+    """Return a Satellite imported from two lines of TLE data.
+
+    Same as `twoline2rv()` but the fields are sliced from their fixed
+    columns of the TLE format instead of scanned, which is much faster
+    for whole catalogues of well-formed element sets.
+
+    """
+    opsmode = 'a' if afspc_mode else 'i'
+
+    satrec = Satellite()
+    satrec.error = 0
+    satrec.whichconst = whichconst
+
+    satrec.satnum = int(longstr1[2:7])
+    satrec.epochyr = int(longstr1[18:20])
+    satrec.epochdays = float(longstr1[20:32])
+    satrec.ndot = float(longstr1[33:43])
+    satrec.nddot = float(longstr1[44:45].strip() + '.' + longstr1[45:50].replace(' ', '0'))
+    nexp = int(longstr1[50:52].replace(' ', '') or 0)
+    satrec.bstar = float(longstr1[53:54].strip() + '.' + longstr1[54:59].replace(' ', '0'))
+    ibexp = int(longstr1[59:61].replace(' ', '') or 0)
+
+    satrec.inclo = float(longstr2[8:16])
+    satrec.nodeo = float(longstr2[17:25])
+    satrec.ecco = float('.' + longstr2[26:33].replace(' ', '0'))
+    satrec.argpo = float(longstr2[34:42])
+    satrec.mo = float(longstr2[43:51])
+    satrec.no = float(longstr2[52:63])
+
+    _elements2rv(satrec, nexp, ibexp, whichconst, opsmode)
+    return satrec
+
+
+def iter_tle(lines):
+    """Yield `(name, line1, line2)` from TLE or 3LE text lines.
+
+    `lines` may be any iterable of lines, like an open file, so that
+    large catalogues are streamed.  `name` is None for bare two-line
+    sets; a leading "0 " of 3LE names is removed.
+
+    """
+    name = line1 = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.startswith('1 ') and len(line) >= 64:
+            line1 = line
+        elif line.startswith('2 ') and line1 is not None and len(line) >= 63:
+            yield name, line1, line
+            name = line1 = None
+        elif line.strip():
+            name = line[2:].strip() if line.startswith('0 ') else line.strip()
+            line1 = None
+
+
+def tle_checksum(longstr1, longstr2, whichconst, afspc_mode=False):
+    """Return a key of a TLE set with its constants and mode."""
+    text = '%s\n%s\n%r %r' % (longstr1.rstrip(), longstr2.rstrip(),
+                              tuple(whichconst), bool(afspc_mode))
+    return hashlib.sha1(text.encode('ascii', 'replace')).hexdigest()
+
+
+def load_catalog(lines, whichconst, afspc_mode=False, cache=None):
+    """Return a list of `(name, satellite)` read from TLE or 3LE lines.
+
+    If `cache` names a file, initialized satellites are kept there by
+    `tle_checksum()` so that unchanged element sets are restored on
+    the next load without running `sgp4init()` again.  The file is
+    plain JSON of attribute names and values, never executed; a file
+    of another version or unreadable one is ignored.  The file is
+    rewritten only when the catalogue has changed.
+
+    """
+    keys, entries = [], {}
+    if cache and os.path.exists(cache):
+        try:
+            with open(cache) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            data = None
+        if isinstance(data, dict) and data.get('version') == CACHE_VERSION:
+            keys, entries = data.get('keys', []), data.get('entries', {})
+            if not isinstance(keys, list) or not isinstance(entries, dict):
+                keys, entries = [], {}
+
+    satellites = []
+    used = {}
+    for name, line1, line2 in iter_tle(lines):
+        checksum = tle_checksum(line1, line2, whichconst, afspc_mode)
+        values = entries.get(checksum)
+        if isinstance(values, list) and len(values) == len(keys):
+            satrec = Satellite()
+            satrec.__dict__.update(zip(keys, values))
+            satrec.whichconst = whichconst
+        else:
+            satrec = fixed2rv(line1, line2, whichconst, afspc_mode)
+            if not keys:
+                keys = sorted(k for k in satrec.__dict__ if k != 'whichconst')
+            values = [getattr(satrec, k) for k in keys]
+        used[checksum] = values
+        satellites.append((name, satrec))
+
+    if cache and set(used) != set(entries):
+        with open(cache, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'keys': keys, 'entries': used}, f)
+    return satellites
@@ -1,7 +1,13 @@
 """The Satellite class."""
 
+from array import array
 from sgp4.ext import jday
-from sgp4.propagation import sgp4
+from sgp4.propagation import sgp4, sgp4_many
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 minutes_per_day = 1440.
 
@@ -48,3 +54,44 @@ class Satellite(object):
         m = (j - self.jdsatepoch) * minutes_per_day
         r, v = sgp4(self, m)
         return r, v
+
+    def propagate_many(self, jd):
+        """Return positions, velocities and error codes for many Julian dates.
+
+        The dates are converted once to minutes since epoch and passed
+        to ``sgp4_many()``, which also describes the returned arrays.
+
+        """
+        if numpy is not None:
+            m = (numpy.asarray(jd, dtype=float) - self.jdsatepoch) * minutes_per_day
+        else:
+            m = [(j - self.jdsatepoch) * minutes_per_day for j in jd]
+        return sgp4_many(self, m)
+
+def propagate_catalog(satellites, jd):
+    """Return positions, velocities and error codes of many satellites.
+
+    ``jd`` is either one sequence of Julian dates shared by every
+    satellite or one row of dates per satellite.  With numpy the result
+    is ``(r, v, error)`` as contiguous arrays of shape (satellites,
+    dates, 3), (satellites, dates, 3) and (satellites, dates); without
+    it, flat ``array('d')`` and ``array('i')`` in the same order.
+
+    """
+    rows = len(jd) and hasattr(jd[0], '__len__')
+    if numpy is not None:
+        jd = numpy.asarray(jd, dtype=float)
+        n = jd.shape[-1] if jd.ndim else 0
+        r = numpy.empty((len(satellites), n, 3))
+        v = numpy.empty((len(satellites), n, 3))
+        error = numpy.empty((len(satellites), n), dtype=int)
+        for i, satellite in enumerate(satellites):
+            r[i], v[i], error[i] = satellite.propagate_many(jd[i] if rows else jd)
+        return r, v, error
+    r, v, error = array('d'), array('d'), array('i')
+    for i, satellite in enumerate(satellites):
+        ri, vi, errori = satellite.propagate_many(jd[i] if rows else jd)
+        r.extend(ri)
+        v.extend(vi)
+        error.extend(errori)
+    return r, v, error
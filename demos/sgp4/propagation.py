@@ -17,12 +17,19 @@ code for the first time here in its Python form.
 |   On a very hot August day in 2012
 """
 
+from array import array
 from math import atan2, cos, fabs, floor, fmod, pi, sin, sqrt
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 deg2rad = pi / 180.0;
 false = None
 true = True
 twopi = 2.0 * pi
+nan = float('nan')
 
 """
 /*     ----------------------------------------------------------------
@@ -1901,6 +1908,332 @@ def sgp4(satrec, tsince, whichconst=None):
 
      return r, v;
 
+"""
+/* -----------------------------------------------------------------------------
+*
+*                             function sgp4_many
+*
+*  this function is sgp4() over a whole array of times since epoch.  with
+*    numpy every step runs once over the array, time-dependent deep space
+*    resonance integration runs in order of increasing time from epoch so the
+*    integrator continues from the previous time instead of restarting.
+*    the satellite record is left unchanged.
+*
+*  inputs        :
+*    satrec    - initialised structure from sgp4init() call.
+*    tsince    - sequence of times since epoch (minutes)
+*
+*  outputs       :
+*    r         - position vectors (km), array (n, 3) or flat array('d')
+*    v         - velocity vectors (km/sec), array (n, 3) or flat array('d')
+*    error     - error codes as satrec.error, 0 if ok; r, v are nan on error
+* --------------------------------------------------------------------------- */
+"""
+
+def sgp4_many(satrec, tsince, whichconst=None):
+
+     if whichconst is None:
+          whichconst = satrec.whichconst
+
+     if numpy is None:
+          r, v, error = array('d'), array('d'), array('i')
+          for t in tsince:
+               rt, vt = sgp4(satrec, t, whichconst)
+               r.extend(rt or (nan, nan, nan))
+               v.extend(vt or (nan, nan, nan))
+               error.append(satrec.error)
+          return r, v, error
+
+     with numpy.errstate(all='ignore'):
+          return _sgp4_many(satrec, numpy.asarray(tsince, dtype=float).reshape(-1), whichconst)
+
+def _sgp4_many(satrec, t, whichconst):
+
+     temp4 = 1.5e-12
+     x2o3  = 2.0 / 3.0
+     tumin, mu, radiusearthkm, xke, j2, j3, j4, j3oj2 = whichconst
+     vkmpersec = radiusearthkm * xke/60.0
+     error = numpy.zeros(len(t), dtype=int)
+
+     #  ------- update for secular gravity and atmospheric drag -----
+     xmdf   = satrec.mo + satrec.mdot * t
+     argpdf = satrec.argpo + satrec.argpdot * t
+     nodedf = satrec.nodeo + satrec.nodedot * t
+     argpm  = argpdf
+     mm     = xmdf
+     t2     = t * t
+     nodem  = nodedf + satrec.nodecf * t2
+     tempa  = 1.0 - satrec.cc1 * t
+     tempe  = satrec.bstar * satrec.cc4 * t
+     templ  = satrec.t2cof * t2
+
+     if satrec.isimp != 1:
+
+         delomg   = satrec.omgcof * t
+         delmtemp = 1.0 + satrec.eta * numpy.cos(xmdf)
+         delm     = satrec.xmcof * (delmtemp * delmtemp * delmtemp - satrec.delmo)
+         temp     = delomg + delm
+         mm       = xmdf + temp
+         argpm    = argpdf - temp
+         t3       = t2 * t
+         t4       = t3 * t
+         tempa    = tempa - satrec.d2 * t2 - satrec.d3 * t3 - satrec.d4 * t4
+         tempe    = tempe + satrec.bstar * satrec.cc5 * (numpy.sin(mm) - satrec.sinmao)
+         templ    = templ + satrec.t3cof * t3 + t4 * (satrec.t4cof + t * satrec.t5cof)
+
+     nm    = numpy.full(len(t), satrec.no)
+     em    = numpy.full(len(t), satrec.ecco)
+     inclm = numpy.full(len(t), satrec.inclo)
+     if satrec.method == 'd':
+
+         if satrec.irez == 0:
+             em    = em + satrec.dedt * t
+             inclm = inclm + satrec.didt * t
+             argpm = argpm + satrec.domdt * t
+             nodem = nodem + satrec.dnodt * t
+             mm    = mm + satrec.dmdt * t
+         else:
+             argpm, mm, nodem = argpm.copy(), mm.copy(), nodem.copy()
+             atime, xli, xni = satrec.atime, satrec.xli, satrec.xni
+             for i in numpy.lexsort((numpy.fabs(t), t > 0.0)):
+                 (
+                     atime, em[i], argpm[i], inclm[i], xli,
+                     mm[i], xni,   nodem[i], dndt,     nm[i],
+                 ) = _dspace(
+                       satrec.irez,
+                       satrec.d2201, satrec.d2211, satrec.d3210,
+                       satrec.d3222, satrec.d4410, satrec.d4422,
+                       satrec.d5220, satrec.d5232, satrec.d5421,
+                       satrec.d5433, satrec.dedt,  satrec.del1,
+                       satrec.del2,  satrec.del3,  satrec.didt,
+                       satrec.dmdt,  satrec.dnodt, satrec.domdt,
+                       satrec.argpo, satrec.argpdot, t[i], t[i],
+                       satrec.gsto, satrec.xfact, satrec.xlamo,
+                       satrec.no, atime,
+                       satrec.ecco, argpm[i], satrec.inclo, xli, mm[i], xni,
+                       nodem[i], satrec.no
+                     )
+
+     error[nm <= 0.0] = 2
+
+     am = numpy.power(xke / nm, x2o3) * tempa * tempa
+     nm = xke / numpy.power(am, 1.5)
+     em = em - tempe
+
+     #  fix tolerance for error recognition
+     error[(error == 0) & ((em >= 1.0) | (em < -0.001))] = 1
+
+     #  sgp4fix fix tolerance to avoid a divide by zero
+     em    = numpy.where(em < 1.0e-6, 1.0e-6, em)
+     mm    = mm + satrec.no * templ
+     xlm   = mm + argpm + nodem
+     emsq  = em * em
+     temp  = 1.0 - emsq
+
+     nodem = numpy.fmod(nodem, twopi)
+     argpm = numpy.fmod(argpm, twopi)
+     xlm   = numpy.fmod(xlm, twopi)
+     mm    = numpy.fmod(xlm - argpm - nodem, twopi)
+
+     #  ----------------- compute extra mean quantities -------------
+     sinim = numpy.sin(inclm)
+     cosim = numpy.cos(inclm)
+
+     #  -------------------- add lunar-solar periodics --------------
+     ep    = em
+     xincp = inclm
+     argpp = argpm
+     nodep = nodem
+     mp    = mm
+     sinip = sinim
+     cosip = cosim
+     aycof = satrec.aycof
+     xlcof = satrec.xlcof
+     con41  = satrec.con41
+     x1mth2 = satrec.x1mth2
+     x7thm1 = satrec.x7thm1
+     if satrec.method == 'd':
+
+         ep, xincp, nodep, argpp, mp = _dpper_many(
+               satrec, t, ep, xincp, nodep, argpp, mp, satrec.operationmode
+             )
+         flip  = xincp < 0.0
+         xincp = numpy.where(flip, -xincp, xincp)
+         nodep = numpy.where(flip, nodep + pi, nodep)
+         argpp = numpy.where(flip, argpp - pi, argpp)
+
+         error[(error == 0) & ((ep < 0.0) | (ep > 1.0))] = 3
+
+     #  -------------------- long period periodics ------------------
+         sinip = numpy.sin(xincp)
+         cosip = numpy.cos(xincp)
+         aycof = -0.5*j3oj2*sinip
+         #  sgp4fix for divide by zero for xincp = 180 deg
+         xlcof = -0.25 * j3oj2 * sinip * (3.0 + 5.0 * cosip) / \
+                 numpy.where(numpy.fabs(cosip+1.0) > 1.5e-12, 1.0 + cosip, temp4)
+
+     axnl = ep * numpy.cos(argpp)
+     temp = 1.0 / (am * (1.0 - ep * ep))
+     aynl = ep * numpy.sin(argpp) + temp * aycof
+     xl   = mp + argpp + nodep + temp * xlcof * axnl
+
+     #  --------------------- solve kepler's equation ---------------
+     u      = numpy.fmod(xl - nodep, twopi)
+     eo1    = u
+     tem5   = numpy.full(len(t), 9999.9)
+     sineo1 = numpy.zeros(len(t))
+     coseo1 = numpy.zeros(len(t))
+     for ktr in range(10):
+
+         active = numpy.fabs(tem5) >= 1.0e-12
+         if not active.any():
+             break
+         sineo1 = numpy.where(active, numpy.sin(eo1), sineo1)
+         coseo1 = numpy.where(active, numpy.cos(eo1), coseo1)
+         step   = 1.0 - coseo1 * axnl - sineo1 * aynl
+         step   = (u - aynl * coseo1 + axnl * sineo1 - eo1) / step
+         step   = numpy.where(numpy.fabs(step) >= 0.95, numpy.where(step > 0.0, 0.95, -0.95), step)
+         tem5   = numpy.where(active, step, tem5)
+         eo1    = numpy.where(active, eo1 + step, eo1)
+
+     #  ------------- short period preliminary quantities -----------
+     ecose = axnl*coseo1 + aynl*sineo1
+     esine = axnl*sineo1 - aynl*coseo1
+     el2   = axnl*axnl + aynl*aynl
+     pl    = am*(1.0-el2)
+     error[(error == 0) & (pl < 0.0)] = 4
+
+     rl     = am * (1.0 - ecose)
+     rdotl  = numpy.sqrt(am) * esine/rl
+     rvdotl = numpy.sqrt(pl) / rl
+     betal  = numpy.sqrt(1.0 - el2)
+     temp   = esine / (1.0 + betal)
+     sinu   = am / rl * (sineo1 - aynl - axnl * temp)
+     cosu   = am / rl * (coseo1 - axnl + aynl * temp)
+     su     = numpy.arctan2(sinu, cosu)
+     sin2u  = (cosu + cosu) * sinu
+     cos2u  = 1.0 - 2.0 * sinu * sinu
+     temp   = 1.0 / pl
+     temp1  = 0.5 * j2 * temp
+     temp2  = temp1 * temp
+
+     #  -------------- update for short period periodics ------------
+     if satrec.method == 'd':
+
+         cosisq = cosip * cosip
+         con41  = 3.0*cosisq - 1.0
+         x1mth2 = 1.0 - cosisq
+         x7thm1 = 7.0*cosisq - 1.0
+
+     mrt   = rl * (1.0 - 1.5 * temp2 * betal * con41) + \
+             0.5 * temp1 * x1mth2 * cos2u
+     su    = su - 0.25 * temp2 * x7thm1 * sin2u
+     xnode = nodep + 1.5 * temp2 * cosip * sin2u
+     xinc  = xincp + 1.5 * temp2 * cosip * sinip * cos2u
+     mvt   = rdotl - nm * temp1 * x1mth2 * sin2u / xke
+     rvdot = rvdotl + nm * temp1 * (x1mth2 * cos2u +
+             1.5 * con41) / xke
+
+     #  --------------------- orientation vectors -------------------
+     sinsu =  numpy.sin(su)
+     cossu =  numpy.cos(su)
+     snod  =  numpy.sin(xnode)
+     cnod  =  numpy.cos(xnode)
+     sini  =  numpy.sin(xinc)
+     cosi  =  numpy.cos(xinc)
+     xmx   = -snod * cosi
+     xmy   =  cnod * cosi
+     ux    =  xmx * sinsu + cnod * cossu
+     uy    =  xmy * sinsu + snod * cossu
+     uz    =  sini * sinsu
+     vx    =  xmx * cossu - cnod * sinsu
+     vy    =  xmy * cossu - snod * sinsu
+     vz    =  sini * cossu
+
+     #  --------- position and velocity (in km and km/sec) ----------
+     r = numpy.empty((len(t), 3))
+     r[:, 0] = (mrt * ux)* radiusearthkm
+     r[:, 1] = (mrt * uy)* radiusearthkm
+     r[:, 2] = (mrt * uz)* radiusearthkm
+     v = numpy.empty((len(t), 3))
+     v[:, 0] = (mvt * ux + rvdot * vx) * vkmpersec
+     v[:, 1] = (mvt * uy + rvdot * vy) * vkmpersec
+     v[:, 2] = (mvt * uz + rvdot * vz) * vkmpersec
+
+     #  sgp4fix for decaying satellites
+     error[(error == 0) & (mrt < 1.0)] = 6
+
+     r[error != 0] = nan
+     v[error != 0] = nan
+     return r, v, error
+
+def _dpper_many(satrec, t, ep, inclp, nodep, argpp, mp, opsmode):
+
+     #  _dpper() with init 'n' over arrays of times T and mean elements.
+     zns   = 1.19459e-5
+     zes   = 0.01675
+     znl   = 1.5835218e-4
+     zel   = 0.05490
+
+     #  --------------- calculate time varying periodics -----------
+     zm    = satrec.zmos + zns * t
+     zf    = zm + 2.0 * zes * numpy.sin(zm)
+     sinzf = numpy.sin(zf)
+     f2    =  0.5 * sinzf * sinzf - 0.25
+     f3    = -0.5 * sinzf * numpy.cos(zf)
+     ses   = satrec.se2 * f2 + satrec.se3 * f3
+     sis   = satrec.si2 * f2 + satrec.si3 * f3
+     sls   = satrec.sl2 * f2 + satrec.sl3 * f3 + satrec.sl4 * sinzf
+     sghs  = satrec.sgh2 * f2 + satrec.sgh3 * f3 + satrec.sgh4 * sinzf
+     shs   = satrec.sh2 * f2 + satrec.sh3 * f3
+     zm    = satrec.zmol + znl * t
+     zf    = zm + 2.0 * zel * numpy.sin(zm)
+     sinzf = numpy.sin(zf)
+     f2    =  0.5 * sinzf * sinzf - 0.25
+     f3    = -0.5 * sinzf * numpy.cos(zf)
+     sel   = satrec.ee2 * f2 + satrec.e3 * f3
+     sil   = satrec.xi2 * f2 + satrec.xi3 * f3
+     sll   = satrec.xl2 * f2 + satrec.xl3 * f3 + satrec.xl4 * sinzf
+     sghl  = satrec.xgh2 * f2 + satrec.xgh3 * f3 + satrec.xgh4 * sinzf
+     shll  = satrec.xh2 * f2 + satrec.xh3 * f3
+     pe    = ses + sel - satrec.peo
+     pinc  = sis + sil - satrec.pinco
+     pl    = sls + sll - satrec.plo
+     pgh   = sghs + sghl - satrec.pgho
+     ph    = shs + shll - satrec.pho
+     inclp = inclp + pinc
+     ep    = ep + pe
+     sinip = numpy.sin(inclp)
+     cosip = numpy.cos(inclp)
+
+     #  ----------------- apply periodics directly ------------
+     direct = inclp >= 0.2
+     phd    = ph / sinip
+     argpd  = argpp + (pgh - cosip * phd)
+     noded  = nodep + phd
+
+     #  ---- apply periodics with lyddane modification ----
+     sinop  = numpy.sin(nodep)
+     cosop  = numpy.cos(nodep)
+     alfdp  = sinip * sinop + (ph * cosop + pinc * cosip * sinop)
+     betdp  = sinip * cosop + (-ph * sinop + pinc * cosip * cosop)
+     nodel  = numpy.fmod(nodep, twopi)
+     if opsmode == 'a':
+         nodel = numpy.where(nodel < 0.0, nodel + twopi, nodel)
+     xls    = mp + argpp + cosip * nodel
+     dls    = pl + pgh - pinc * nodel * sinip
+     xls    = xls + dls
+     xnoh   = nodel
+     nodel  = numpy.arctan2(alfdp, betdp)
+     if opsmode == 'a':
+         nodel = numpy.where(nodel < 0.0, nodel + twopi, nodel)
+     nodel  = numpy.where(numpy.fabs(xnoh - nodel) > pi,
+                          numpy.where(nodel < xnoh, nodel + twopi, nodel - twopi), nodel)
+     argpl  = xls - (mp + pl) - cosip * nodel
+
+     return (ep, inclp, numpy.where(direct, noded, nodel),
+             numpy.where(direct, argpd, argpl), mp + pl)
+
 """
 /* -----------------------------------------------------------------------------
 *
@@ -1,15 +1,18 @@
 """Test suite for SGP4."""
 
+import json
 import os
 import sys
+import tempfile
 from doctest import DocTestSuite
 from unittest import TestCase
 from math import pi
 
 from sgp4.earth_gravity import wgs72
 from sgp4.ext import invjday, newtonnu, rv2coe
-from sgp4.io import twoline2rv
-from sgp4.propagation import sgp4
+from sgp4.io import CACHE_VERSION, fixed2rv, iter_tle, load_catalog, twoline2rv
+from sgp4.model import propagate_catalog
+from sgp4.propagation import sgp4, sgp4_many
 
 thisdir = os.path.dirname(__file__)
 error = 2e-7
@@ -96,6 +99,91 @@ class Tests(TestCase):
         self.assertEqual(newtonnu(1.1, 2.7),   # hyperbolic
                          (4.262200676156417, 34.76134082028372))
 
+    def test_sgp4_many(self):
+        # Array propagation should match the scalar sgp4() for near
+        # earth, deep space and resonant (12 hour) orbits and errors.
+
+        for line1, line2 in many_tles:
+            satrec = twoline2rv(line1, line2, wgs72)
+            tsince = [-3e6, -1440.0, -0.5, 0.0, 0.5, 720.0, 14400.0, 3e6]
+            r, v, error = sgp4_many(satrec, tsince)
+            r, v = list(r), list(v)
+            if len(r) == len(tsince) * 3:
+                r = [r[i:i + 3] for i in range(0, len(r), 3)]
+                v = [v[i:i + 3] for i in range(0, len(v), 3)]
+            for i, t in enumerate(tsince):
+                rt, vt = sgp4(satrec, t)
+                self.assertEqual(error[i], satrec.error)
+                if not satrec.error:
+                    for a, e in zip(list(r[i]) + list(v[i]), rt + vt):
+                        self.assertAlmostEqual(a, e, 8)
+
+        satellites = [twoline2rv(line1, line2, wgs72)
+                      for line1, line2 in many_tles]
+        jd = [[s.jdsatepoch + 0.25, s.jdsatepoch + 1.0] for s in satellites]
+        r, v, error = propagate_catalog(satellites, jd)
+        self.assertEqual(list(getattr(error, 'flat', error)), [0] * 6)
+        r1, v1, error1 = satellites[1].propagate_many(jd[1])
+        self.assertEqual(list(getattr(r[1], 'flat', r[6:12])),
+                         list(getattr(r1, 'flat', r1)))
+
+    def test_fixed2rv(self):
+        # Fixed-column parsing should build the same satellites as the
+        # scanning parser, also when restored from the catalogue cache.
+
+        for line1, line2 in many_tles:
+            self.assertEqual(fixed2rv(line1, line2, wgs72).__dict__,
+                             twoline2rv(line1, line2, wgs72).__dict__)
+
+        lines = []
+        for i, (line1, line2) in enumerate(many_tles):
+            lines += ['0 SAT %d' % i, line1, line2] if i else [line1, line2]
+        self.assertEqual([name for name, line1, line2 in iter_tle(lines)],
+                         [None, 'SAT 1', 'SAT 2'])
+
+        fd, cache = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(cache)
+        try:
+            first = load_catalog(lines, wgs72, cache=cache)
+            again = load_catalog(lines, wgs72, cache=cache)
+        finally:
+            if os.path.exists(cache):
+                os.remove(cache)
+        for (name1, sat1), (name2, sat2) in zip(first, again):
+            self.assertEqual(name1, name2)
+            self.assertEqual(sat1.__dict__, sat2.__dict__)
+
+    def test_load_catalog_cache(self):
+        # Cache of another version or format is not trusted and is
+        # rebuilt, pickled data is never loaded.
+
+        lines = [line for tle in many_tles for line in tle]
+        expected = [sat.__dict__ for name, sat in load_catalog(lines, wgs72)]
+        fd, cache = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            for data in (b'\x80\x04cos\nsystem\n.', b'{"version": 0, "keys": [], "entries": {}}',
+                         b'[1, 2]', b'{"version": 1, "keys": 5, "entries": []}'):
+                with open(cache, 'wb') as f:
+                    f.write(data)
+                actual = [sat.__dict__ for name, sat in load_catalog(lines, wgs72, cache=cache)]
+                self.assertEqual(actual, expected)
+                with open(cache) as f:
+                    self.assertEqual(json.load(f)['version'], CACHE_VERSION)
+        finally:
+            os.remove(cache)
+
+
+many_tles = [
+    ('1 25544U 98067A   12138.83290882  .00011789  00000-0  17152-3 0  5727',
+     '2 25544  51.6409 274.1861 0010682 328.0828 128.1508 15.56173799773289'),
+    ('1 24960U 97054A   04104.60038411 -.00000148  00000-0  10000-3 0  8467',
+     '2 24960  64.1699 306.8439 7209074 272.6281  14.3196  2.00635799 48072'),
+    ('1 28509U 04053B   14043.80544267  .00000056  00000-0  10000-3 0  5502',
+     '2 28509 063.1879 220.5982 0005958 137.7265 053.1785 02.13100546 71072'),
+]
+
 
 def generate_test_output(whichconst):
     """Generate lines like those in the test file tcppver.out.
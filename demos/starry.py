@@ -9,17 +9,33 @@ Satellite orbits computes by sgp4 module.
 __version__ = "0.5"
 
 import math, sys
+from array import array
 import calendar, datetime, time
 from __init__ import *
 from dbcarta import *
 from data.continents import *
-from data.constellations import *
-from data.stars import *
+from data import dataset
 from data.tledata import *
 from utils.solar import *
 from utils.mgeo import *
+from utils.satpool import SatPool
+from utils.terminator import Terminator
 from sgp4.earth_gravity import wgs84
-from sgp4.io import twoline2rv
+from sgp4.io import twoline2rv, fixed2rv
+from sgp4.ext import jday
+from sgp4.model import propagate_catalog
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+STARS = dataset('stars', 'STARS')
+CLNS = dataset('constellations', 'CLNS')
+CNTS = dataset('constellations', 'CNTS')
+SOLAR = [['Sun', -26, 'yellow', 'yellow'],
+         ['Moon', -16, 'lightgray', 'lightgray']] + \
+        [[p, 2, 'gray', rgb(255,155,128)] for p in ('Mercury', 'Venus', 'Mars', 'Jupiter', 'Saturn')]
 
 class Qn:
     """Spherical transformations."""
@@ -119,9 +135,108 @@ class Qn:
         gmst = 18.697374558 + 24.06570982441908 * d
         return gmst - int( gmst / 24.0 ) * 24.0
 
+class SkyData:
+    """Sky bodies `[ra, de, mag,...]` with positions converted once to unit
+    vectors as Qn.fromSpherical (numpy array Nx3 or arrays X, Y, Z).
+    Bodies are indexed by cells of about equal area: declination bands of BANDS
+    split by RA to cells of band height, see cellsOf."""
+    bands = 36
+
+    def __init__(self, data):
+        self.data = list(data)
+        ra = [body[0] for body in self.data]
+        de = [body[1] for body in self.data]
+        mag = [body[2] if len(body) > 2 else 10 for body in self.data]
+        if numpy is not None:
+            ra, de = numpy.array(ra, dtype=float), numpy.array(de, dtype=float)
+            self.xyz = numpy.column_stack((numpy.cos(de) * numpy.sin(ra), numpy.sin(de), numpy.cos(de) * numpy.cos(ra))).reshape(-1, 3)
+            self.mag = numpy.array(mag, dtype=float)
+        else:
+            self.x = array('d', [math.cos(b) * math.sin(a) for a, b in zip(ra, de)])
+            self.y = array('d', [math.sin(b) for b in de])
+            self.z = array('d', [math.cos(b) * math.cos(a) for a, b in zip(ra, de)])
+            self.mag = array('d', mag)
+        self.index(ra, de)
+
+    def __len__(self):
+        return len(self.data)
+
+    def index(self, ra, de):
+        """Sort bodies by cells of RA, DE (in radians)."""
+        height = math.pi / self.bands
+        # cells by band, first cell of band
+        counts = [max(1, int(round(2 * math.pi * math.cos(-math.pi / 2 + (k + 0.5) * height) / height))) for k in range(self.bands)]
+        firsts = [sum(counts[:k]) for k in range(self.bands)]
+        # cell centers as unit vectors and radii to its corners
+        centers, radii = [], []
+        for k, (count, first) in enumerate(zip(counts, firsts)):
+            d0, d1 = -math.pi / 2 + k * height, -math.pi / 2 + (k + 1) * height
+            dc, width = 0.5 * (d0 + d1), 2 * math.pi / count
+            radius = max([math.acos(max(-1.0, min(1.0, math.sin(dc) * math.sin(d) + math.cos(dc) * math.cos(d) * math.cos(width / 2)))) for d in (d0, d1)])
+            for j in range(count):
+                a = (j + 0.5) * width
+                centers.append([math.cos(dc) * math.sin(a), math.sin(dc), math.cos(dc) * math.cos(a)])
+                radii.append(radius)
+        if numpy is not None:
+            band = numpy.clip(((de + math.pi / 2) / height).astype(int), 0, self.bands - 1)
+            count = numpy.array(counts)[band]
+            cell = numpy.array(firsts)[band] + (numpy.mod(ra, 2 * math.pi) / (2 * math.pi) * count).astype(int) % count
+            self.cellorder = numpy.argsort(cell, kind='stable')
+            self.cellstart = numpy.searchsorted(cell[self.cellorder], numpy.arange(len(centers) + 1))
+            self.cellxyz = numpy.array(centers)
+            self.cellradius = numpy.array(radii)
+        else:
+            cells = [[] for c in centers]
+            for i, (a, d) in enumerate(zip(ra, de)):
+                k = min(self.bands - 1, max(0, int((d + math.pi / 2) / height)))
+                cells[firsts[k] + int(a % (2 * math.pi) / (2 * math.pi) * counts[k]) % counts[k]].append(i)
+            self.cells = cells
+            self.cellxyz = centers
+            self.cellradius = radii
+
+    def cellsOf(self, axis, radius):
+        """Return indexes of bodies in cells intersecting spherical cap
+        (numpy array or list).
+        AXIS unit vector `[x, y, z]` of cap center (see Qn.fromSpherical).
+        RADIUS angular radius of cap (in radians)."""
+        if numpy is not None:
+            cos = numpy.cos(numpy.minimum(radius + self.cellradius, math.pi))
+            cells = numpy.nonzero(self.cellxyz.dot(axis) >= cos - 1e-12)[0]
+            # ranges of cells in cellorder at once
+            starts, counts = self.cellstart[cells], self.cellstart[cells + 1] - self.cellstart[cells]
+            offsets = numpy.repeat(starts - numpy.cumsum(counts) + counts, counts)
+            return self.cellorder[offsets + numpy.arange(len(offsets))]
+        ax, ay, az = axis
+        index = []
+        for (x, y, z), r, cell in zip(self.cellxyz, self.cellradius, self.cells):
+            if cell and x * ax + y * ay + z * az >= math.cos(min(radius + r, math.pi)) - 1e-12:
+                index += cell
+        return index
+
+    def reach(self):
+        """Return max. angle between bodies of pairs (line ends), see Starry.clns."""
+        if not hasattr(self, '_reach'):
+            if numpy is not None:
+                n = len(self.xyz) // 2 * 2
+                dots = (self.xyz[0:n:2] * self.xyz[1:n:2]).sum(axis=1)
+                self._reach = float(numpy.arccos(numpy.clip(dots, -1.0, 1.0)).max()) if n else 0.0
+            else:
+                dots = [self.x[i] * self.x[i + 1] + self.y[i] * self.y[i + 1] + self.z[i] * self.z[i + 1] for i in range(0, len(self.x) - 1, 2)]
+                self._reach = max([math.acos(max(-1.0, min(1.0, dot))) for dot in dots] or [0.0])
+        return self._reach
+
 class Starry:
     """Render stars, planets, sattelites."""
     gmtm = time.gmtime(time.time()) # UTC date/time set
+    magbase = 5.0 # faintest star magnitude at min. zoom
+    magstep = 1.0 # magnitudes added per zoom doubling
+
+    movepx = 1.0  # move drawn items shifted more than it (in pixels)
+
+    def __init__(self):
+        self.satrecs = {} # Satellite by TLE lines
+        self.drawn = {}   # coords of drawn items by tag by layer
+        self.scale = None # scale of drawn coords
 
     def initSky(self):
         viewport_x, viewport_y = dbcarta.sizeOf()
@@ -144,11 +259,51 @@ class Starry:
         self.earthRadius = 180 / math.pi * dbcarta.delta * dbcarta.slider.var.get()
         self.skyRadius = 0.6 * sqrt(self.vx * self.vx + self.vy * self.vy)
 
+        # drawn items are scaled by canvas with zoom
+        scale = dbcarta.slider.var.get()
+        if self.scale and scale != self.scale:
+            ratio = scale / self.scale
+            for drawn in self.drawn.values():
+                for tag, coords in drawn.items():
+                    drawn[tag] = [v * ratio for v in coords]
+        self.scale = scale
+
         dbcarta.dw.config(bg=rgb(17,17,96))
         # viewport border
-        dbcarta.dw.create_rectangle(0, 0, self.vx, self.vy, 
-                                    outline=rgb(17,17,196), dash=(10,1),
-                                    tags=('.vpBorder', 'Line'))
+        if not dbcarta.dw.find_withtag('.vpBorder'):
+            dbcarta.dw.create_rectangle(0, 0, self.vx, self.vy, 
+                                        outline=rgb(17,17,196), dash=(10,1),
+                                        tags=('.vpBorder', 'Line'))
+
+    def clearSky(self, *mtags):
+        """Delete layers MTAGS and forget its drawn items."""
+        dbcarta.tkbatch.delete(*mtags)
+        for mtag in mtags:
+            self.drawn.pop(mtag, None)
+
+    def moveItem(self, drawn, tag, coords, label=None):
+        """Move drawn item TAG to COORDS (its label '.' + TAG to LABEL point)
+        if any point shifted more than movepx. Return False if TAG isn't drawn.
+        DRAWN coords of drawn items by tag of layer."""
+        old = drawn.get(tag)
+        if old is None:
+            return False
+        for v0, v in zip(old, coords):
+            if abs(v - v0) > self.movepx:
+                dbcarta.tkbatch.coords(tag, coords)
+                if label:
+                    dbcarta.tkbatch.coords('.' + tag, label)
+                drawn[tag] = coords
+                break
+        return True
+
+    def dropItems(self, drawn, seen):
+        """Delete drawn items (and labels) which tags aren't in SEEN."""
+        gone = [tag for tag in drawn if tag not in seen]
+        for tag in gone:
+            del drawn[tag]
+        if gone:
+            dbcarta.tkbatch.delete(*(gone + ['.' + tag for tag in gone]))
 
     def calcSkyPos(self, ra, de, darkhide=True, outhide=True):
         """RA, DEC convert to points."""
@@ -174,38 +329,127 @@ class Starry:
 
         return [x, y]
 
+    def magLimit(self):
+        """Faintest magnitude to render at current zoom.
+        MAGBASE at min. zoom, MAGSTEP brighter per zoom doubling."""
+        ratio = dbcarta.slider.var.get() / dbcarta.slider['from']
+        return self.magbase + self.magstep * math.log(max(ratio, 1.0), 2)
+
+    def viewCap(self):
+        """Return `[axis, radius]` of spherical cap covering sky visible in view rectangle
+        or None if sky is out of view. AXIS unit vector as Qn.fromSpherical, RADIUS in radians."""
+        r = self.skyRadius
+        if not r:
+            return
+        # view rectangle on sky disk as rotated unit vectors
+        x0, x1 = max(-1.0, (self.left - self.vx / 2.0) / r), min(1.0, (self.right - self.vx / 2.0) / r)
+        y0, y1 = max(-1.0, (self.vy / 2.0 - self.bottom) / r), min(1.0, (self.vy / 2.0 - self.top) / r)
+        if x0 > x1 or y0 > y1:
+            return
+        cx, cy = 0.5 * (x0 + x1), 0.5 * (y0 + y1)
+        n = math.hypot(cx, cy)
+        if n > 1:
+            cx, cy = cx / n, cy / n
+        cz = -math.sqrt(max(0.0, 1 - cx * cx - cy * cy))
+        # farthest visible point is rectangle corner, crossing of its edges with disk border
+        # or point of border opposite to axis
+        points = [[x, y] for x in (x0, x1) for y in (y0, y1) if x * x + y * y <= 1]
+        for v0 in (x0, x1, y0, y1):
+            for v1 in (math.sqrt(max(0.0, 1 - v0 * v0)), -math.sqrt(max(0.0, 1 - v0 * v0))):
+                points += [[v0, v1], [v1, v0]]
+        if n:
+            points += [[-cx / n, -cy / n]]
+        cos = min([cx * x + cy * y - cz * math.sqrt(max(0.0, 1 - x * x - y * y))
+                   for x, y in points if x0 <= x <= x1 and y0 <= y <= y1])
+        # axis by sky coords
+        m = self.skyAxisMatrix
+        axis = [m[i][0] * cx + m[i][1] * cy + m[i][2] * cz for i in range(3)]
+        return [axis, math.acos(max(-1.0, min(1.0, cos)))]
+
+    def skyPos(self, sky, darkhide=True, outhide=True, maglimit=None, cull=None):
+        """Return list of `[i, x, y]` of visible bodies of SKY (see SkyData).
+        Rotate all bodies by sky axis at once and filter by masks as calcSkyPos.
+        MAGLIMIT (opt.) skip bodies fainter than it.
+        CULL (opt.) rotate only bodies in cells of view cap widened by it (in radians),
+          see viewCap and SkyData.cellsOf."""
+        m = self.skyAxisMatrix
+        vx2, vy2, r = self.vx / 2.0, self.vy / 2.0, self.skyRadius
+        dark = (self.earthRadius / r) ** 2 if r else 0.0
+        index = None
+        if cull is not None:
+            cap = self.viewCap()
+            if not cap:
+                return []
+            # in order of bodies as without cull
+            index = sky.cellsOf(cap[0], cap[1] + cull)
+            index = numpy.sort(index) if numpy is not None else sorted(index)
+        if numpy is not None:
+            xyz, mag = sky.xyz, sky.mag
+            if index is not None:
+                xyz, mag = xyz[index], mag[index]
+            qx, qy, qz = xyz.dot(numpy.array([row[:3] for row in m[:3]])).T
+            mask = qz <= 0
+            if darkhide:
+                mask &= ~((qz < 0) & (qx * qx + qy * qy < dark))
+            if maglimit is not None:
+                mask &= mag < maglimit
+            x, y = vx2 + r * qx, vy2 - r * qy
+            if outhide:
+                mask &= (x >= self.left) & (x < self.right) & (y >= self.top) & (y < self.bottom)
+            hits = numpy.nonzero(mask)[0]
+            ids = hits if index is None else index[hits]
+            return list(zip(ids.tolist(), x[hits].tolist(), y[hits].tolist()))
+        (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = [row[:3] for row in m[:3]]
+        pos = []
+        for i in (range(len(sky)) if index is None else index):
+            vx, vy, vz, mag = sky.x[i], sky.y[i], sky.z[i], sky.mag[i]
+            qz = m02 * vx + m12 * vy + m22 * vz
+            if qz > 0 or (maglimit is not None and not mag < maglimit):
+                continue
+            qx = m00 * vx + m10 * vy + m20 * vz
+            qy = m01 * vx + m11 * vy + m21 * vz
+            if darkhide and qz < 0 and qx * qx + qy * qy < dark:
+                continue
+            x, y = vx2 + r * qx, vy2 - r * qy
+            if outhide and (x < self.left or x >= self.right or y < self.top or y >= self.bottom):
+                continue
+            pos.append([i, x, y])
+        return pos
+
     def clns(self, mtag, data=[]):
-        """Render constellations on map."""
+        """Render constellations on map.
+        DATA list of `[ra, de]` line ends or SkyData."""
         if dbcarta.isSpherical():
-            for i in range(0, len(data), 2):
-                pos1 = self.calcSkyPos(data[i][0], data[i][1], False, False)
-                pos2 = self.calcSkyPos(data[i+1][0], data[i+1][1], False, False)
-
-                if pos1 and pos2:
-                    pts = pos1 + pos2
-                else:
-                    continue
-
-                color = rgb(84,84,120)
-
-                dbcarta.dw.create_line(pts,
-                                       fill=color,
-                                       tags=(mtag + str(i), 'Line', mtag))
-
-    def stars(self, mtag, data=[]):
-        """Render body on map.
-        DATA list of list `[ra, de, mag, nbody, label]`.
-        DARKHIDE, OUTHIDE."""
+            sky = data if isinstance(data, SkyData) else SkyData(data)
+            # lines crossing view have ends near it
+            pos = dict([[i, [x, y]] for i, x, y in self.skyPos(sky, False, False, cull=sky.reach())])
+            color = rgb(84,84,120)
+            drawn = self.drawn.setdefault(mtag, {})
+            seen = set()
+            for i in sorted(pos):
+                if not i % 2 and i + 1 in pos:
+                    ftag = mtag + str(i)
+                    seen.add(ftag)
+                    if self.moveItem(drawn, ftag, pos[i] + pos[i+1]):
+                        continue
+                    dbcarta.tkbatch.create('line', pos[i] + pos[i+1],
+                                           fill=color,
+                                           tags=(ftag, 'Line', mtag))
+                    drawn[ftag] = pos[i] + pos[i+1]
+            self.dropItems(drawn, seen)
+
+    def stars(self, mtag, data=[], maglimit=None):
+        """Render body on map. Bodies drawn before are moved, see moveItem.
+        DATA list of list `[ra, de, mag, nbody, label]` or SkyData.
+        MAGLIMIT (opt.) skip bodies fainter than it, see magLimit."""
         if dbcarta.isSpherical():
-            for i, body in enumerate(data):
+            sky = data if isinstance(data, SkyData) else SkyData(data)
+            drawn = self.drawn.setdefault(mtag, {})
+            seen = set()
+            for i, x, y in self.skyPos(sky, maglimit=maglimit, cull=0.0):
+                body = sky.data[i]
                 dd = dict([[k,v] for k, v in enumerate(body)])
                 ra, de = [dd[0], dd[1]]
-                pos = self.calcSkyPos(ra, de)
-
-                if not pos:
-                    continue
-
-                x, y, = pos
                 mag = dd.get(2, 10)
                 nbody = dd.get(3, i)
                 label = dd.get(4, '')
@@ -222,42 +466,72 @@ class Starry:
                 elif ( mag < 5 ): size = 1
                 else: size = 0
 
-                if label:
-                    dbcarta.dw.create_text([x, y],
-                                           fill=labelcolor, 
-                                           text=_(label), anchor='sw',
-                                           tags=('.' + mtag + str(nbody), mtag))
-                if (len(body) > 5): # solar
-                    dbcarta.dw.create_oval(x-size/2.0, y-size/2.0, x+size/2.0, y+size/2.0,
-                                           outline=color, fill=color,
-                                           tags=(mtag + str(nbody), 'DotPort', mtag))
-                else:               # stars
-                    dbcarta.dw.create_arc(x-size/2.0, y-size/2.0, x+size/2.0, y+size/2.0,
-                                           outline=color, fill=color,
-                                           tags=(mtag + str(nbody), 'DotPort', mtag))
-                dbcarta.usercl(mtag + str(nbody), {'coords': [['HD',nbody],['label',_(label)],['ra',ra],['dec',de],['mag',mag]]})
-
-    def sat(self, mtag, tledata=[]):
+                ftag = mtag + str(nbody)
+                seen.add(ftag)
+                bbox = [x-size/2.0, y-size/2.0, x+size/2.0, y+size/2.0]
+                if self.moveItem(drawn, ftag, bbox, label and [x, y]):
+                    if (len(body) <= 5): # stars info is constant
+                        continue
+                else:
+                    if label:
+                        dbcarta.tkbatch.create('text', [x, y],
+                                               fill=labelcolor, 
+                                               text=_(label), anchor='sw',
+                                               tags=('.' + ftag, mtag))
+                    if (len(body) > 5): # solar
+                        dbcarta.tkbatch.create('oval', bbox,
+                                               outline=color, fill=color,
+                                               tags=(ftag, 'DotPort', mtag))
+                    else:               # stars
+                        dbcarta.tkbatch.create('arc', bbox,
+                                               outline=color, fill=color,
+                                               tags=(ftag, 'DotPort', mtag))
+                    drawn[ftag] = bbox
+                dbcarta.usercl(ftag, {'coords': [['HD',nbody],['label',_(label)],['ra',ra],['dec',de],['mag',mag]]})
+            self.dropItems(drawn, seen)
+
+    def satellite(self, line1, line2):
+        """Return Satellite of TLE lines (parsed once)."""
+        if (line1, line2) not in self.satrecs:
+            self.satrecs[(line1, line2)] = fixed2rv(line1, line2, wgs84)
+        return self.satrecs[(line1, line2)]
+
+    def satTracks(self, tledata, steps=200):
+        """Return rows of Julian dates of orbit (by whorl) by satellite.
+        TLEDATA list of `[sat, line1, line2]`.
+        STEPS (opt.) points of orbit by satellite."""
+        jd = jday(*self.gmtm[:6])
+        # by 2 mean motion ago
+        return [[jd - i * 2.0 * math.pi * 180 / satellite.no / steps / 86400.0 for i in range(steps)]
+                for satellite in [self.satellite(line1, line2) for label, line1, line2 in tledata]]
+
+    def sat(self, mtag, tledata=[], steps=200):
         """Render satellite's orbit (by whorl) on map.
-        TLEDATA list of `[sat, line1, line2]`."""
+        TLEDATA list of `[sat, line1, line2]`.
+        STEPS (opt.) points of orbit by satellite."""
         if dbcarta.isSpherical():
-            for label, line1, line2 in tledata:
-                satellite = twoline2rv(line1, line2, wgs84)
-                ps = 2.0 * math.pi * 180/satellite.no
-                utc1 = utc2 = datetime.datetime(*self.gmtm[:6])
-                # by 2 mean motion ago
-                delta = datetime.timedelta(0, ps)
-                step = delta.total_seconds() / 200.0
-                i = 0
-                while (utc1 - utc2 < delta):
-                    pos, vel = satellite.propagate(*utc2.timetuple()[:6])
-                    utc2 = utc2 - datetime.timedelta(0, step)
-                    xe, ye, ze = pos
-                    ra, dec, r = rect2spheric(*pos) 
+            satellites = [self.satellite(line1, line2) for label, line1, line2 in tledata]
+            mpos, mvel, merror = propagate_catalog(satellites, self.satTracks(tledata, steps))
+            self.drawSat(mtag, tledata, mpos, steps)
+
+    def drawSat(self, mtag, tledata, mpos, steps):
+        """Render satellite's orbit by positions.
+        TLEDATA list of `[sat, line1, line2]`.
+        MPOS positions (km) as array (satellites, steps, 3) or flat array, nan on errors."""
+        if dbcarta.isSpherical():
+            if hasattr(mpos, 'reshape'):
+                mpos = mpos.reshape(-1, 3).tolist()
+            else:
+                mpos = [mpos[j:j+3] for j in range(0, len(mpos), 3)]
+            for k, (label, line1, line2) in enumerate(tledata):
+                for i in range(steps):
+                    xe, ye, ze = pos = mpos[k * steps + i]
+                    if xe != xe: # sgp4 error
+                        continue
                     re = math.sqrt(xe*xe + ye*ye + ze*ze)
 
                     qpos = [0, ye/re, ze/re, xe/re] # rotate axis
-                    w, qx, qy, qz = Qn.rotateAroundAxis(qpos, self.skyAxisMatrix)                    
+                    w, qx, qy, qz = Qn.rotateAroundAxis(qpos, self.skyAxisMatrix)
                     skyRadius = self.earthRadius * re / self.earthRadiusKm
 
                     earthCenteredX = qx * skyRadius
@@ -269,9 +543,6 @@ class Starry:
                     x = (self.vx / 2.0 + skyRadius * qx)
                     y = (self.vy / 2.0 - skyRadius * qy)
 
-                    #if ( (x < self.left or x >= self.right) or (y < self.top or y >= self.bottom) ):
-                    #    continue
-
                     if not i: size = 7
                     else: size = 1
 
@@ -280,51 +551,142 @@ class Starry:
 
                     if not i: color = labelcolor
 
-                    dbcarta.dw.create_oval(x-size/2.0, y-size/2.0, x+size/2.0, y+size/2.0,
+                    dbcarta.tkbatch.create('oval', [x-size/2.0, y-size/2.0, x+size/2.0, y+size/2.0],
                                            outline=color, fill=color,
                                            tags=(mtag + label, 'DotPort', mtag))
                     if not i:
-                        dbcarta.dw.create_text([x, y], 
+                        ra, dec, r = rect2spheric(*pos)
+                        dbcarta.tkbatch.create('text', [x, y],
                                                fill=labelcolor,
                                                text=label, anchor='sw',
                                                tags=('.' + mtag + label, mtag))
                         dbcarta.usercl(mtag + label, {'coords': [['n',label],['ra',ra],['dec',dec]]})
-                    i += 1
+
+class Animation:
+    """Advance UTC of Starry at RATE on fixed FPS `after` loop.
+    Frames overrunning its budget skip next frames, simulated time goes by real time."""
+    def __init__(self, master, starry, onframe, rate=60.0, fps=25):
+        """MASTER Tk widget to run `after` loop.
+        STARRY Starry to advance gmtm.
+        ONFRAME called to render frame.
+        RATE (opt.) simulated seconds by real second.
+        FPS (opt.) frames per second."""
+        self.master = master
+        self.starry = starry
+        self.onframe = onframe
+        self.rate = rate
+        self.fps = fps
+        self.job = None
+        self.reset()
+
+    def reset(self):
+        """Clear frame-time statistics."""
+        self.frames = 0     # rendered frames
+        self.skipped = 0    # frames skipped by overrun
+        self.lastms = 0.0   # last frame time (in ms)
+        self.totalms = 0.0
+        self.maxms = 0.0
+
+    def stats(self):
+        """Return frame-time statistics as dict
+        frames, skipped, last, mean, max (in ms)."""
+        return {'frames': self.frames, 'skipped': self.skipped, 'last': self.lastms,
+                'mean': self.totalms / max(self.frames, 1), 'max': self.maxms}
+
+    def running(self):
+        return self.job is not None
+
+    def start(self):
+        """Start animation from UTC of starry."""
+        if self.job is None:
+            self.utc = calendar.timegm(self.starry.gmtm)
+            self.gmtm = self.starry.gmtm
+            self.clock = time.time()
+            self.job = self.master.after(0, self.__frame)
+
+    def stop(self):
+        if self.job is not None:
+            self.master.after_cancel(self.job)
+            self.job = None
+
+    def toggle(self):
+        """Start or stop animation."""
+        [self.start, self.stop][self.running()]()
+
+    def __frame(self):
+        """Advance time, render frame and schedule next one."""
+        budget = 1000.0 / self.fps
+        clock = time.time()
+        if self.starry.gmtm != self.gmtm: # time set by user
+            self.utc = calendar.timegm(self.starry.gmtm)
+        else:
+            self.utc += self.rate * (clock - self.clock)
+        self.clock = clock
+        self.starry.gmtm = self.gmtm = time.gmtime(self.utc)
+        self.onframe()
+        self.lastms = (time.time() - clock) * 1000
+        self.frames += 1
+        self.totalms += self.lastms
+        self.maxms = max(self.maxms, self.lastms)
+        # skip frames overrun by this one
+        skip = int(self.lastms // budget)
+        self.skipped += skip
+        self.job = self.master.after(max(int(budget * (skip + 1) - self.lastms), 1), self.__frame)
 
 def renderSat():
     """Render sat tracs."""
     if dbcarta.isSpherical():
-        dbcarta.dw.delete('iss')
-        starry.sat( 'iss', TLEDATA[:3] )
+        steps = 200
+        def draw(first, mpos):
+            count = len(mpos) if hasattr(mpos, 'reshape') else len(mpos) // (3 * steps)
+            tledata = TLEDATA[first:first + count]
+            with dbcarta.batch():
+                # replace tracks of chunk
+                for label, line1, line2 in tledata:
+                    dbcarta.tkbatch.delete('iss' + label, '.iss' + label)
+                starry.drawSat( 'iss', tledata, mpos, steps )
+        satpool.submit( TLEDATA, starry.satTracks(TLEDATA, steps), draw )
     else:
-        dbcarta.dw.delete('solar', 'stars', 'clns', 'cnts', 'iss')
+        animation.stop()
+        satpool.cancel()
+        starry.clearSky('solar', 'stars', 'clns', 'cnts', 'iss')
         dbcarta.dw.config(bg=rgb(186,196,205))
 
-def renderSky():
-    """Render sky bodies."""
+def renderSky(move=False):
+    """Render sky bodies.
+    MOVE (opt.) move drawn bodies instead of redraw, see Starry.moveItem."""
     # calc solar bodies pos.
     solar = []
     d = timeScale(*starry.gmtm[:6])
-    ra, dec, r = eq2radec(*ecl2eq(*Sun(d) + [d]))
-    solar += [[ra, dec, -26, 'Sun', 'Sun', 'yellow', 'yellow']]
-    ra, dec, r = eq2radec(*ecl2eq(*Moon(d) + [d]))
-    solar += [[ra, dec, -16, 'Moon', 'Moon', 'lightgray', 'lightgray']]
-    for p in ('Mercury', 'Venus', 'Mars', 'Jupiter', 'Saturn'):
-        ra, dec, r = eq2radec(*ecl2eq(*ecl_helio2geo(*eval(p + "(d)") + [d]) + [d]))
-        solar += [[ra, dec, 2, p, p, 'gray', rgb(255,155,128)]]
-
-    dbcarta.dw.delete('solar', 'stars', 'clns', 'cnts')
-    starry.initSky()
-    starry.stars( 'solar', solar )
-    starry.stars( 'stars', STARS )
-    starry.clns( 'clns', CLNS )
-    starry.stars( 'cnts', [cnt + ['', rgb(0,200,0)] for cnt in CNTS] )
+    for p, mag, color, labelcolor in SOLAR:
+        ra, dec, r = ephemeris.radec(p, d)
+        solar += [[ra, dec, mag, p, p, color, labelcolor]]
+
+    with dbcarta.batch():
+        if not move:
+            starry.clearSky('solar', 'stars', 'clns', 'cnts')
+        starry.initSky()
+        starry.stars( 'solar', solar )
+        starry.stars( 'stars', SKYSTARS, starry.magLimit() )
+        starry.clns( 'clns', SKYCLNS )
+        starry.stars( 'cnts', SKYCNTS )
+    if terminator:
+        terminator.update( starry.gmtm )
 
     cx, cy = dbcarta.centerOf()[0]
     centerof = ( math.degrees(P(math.radians(cx), math.pi)),
                  math.degrees(P(math.radians(cy), math.pi/2.0)) * [-1, 1][math.cos(math.radians(cy)) > 0] )
-    tmsg_var.set( 'X %s Y %s ' % centerof +
-                  'T %s-%s-%s %s:%s:%s' % starry.gmtm[:6] )
+    tmsg = 'X %s Y %s ' % centerof + 'T %s-%s-%s %s:%s:%s' % starry.gmtm[:6]
+    if animation.running():
+        tmsg += ' x%g %%(mean).1f/%%(max).1f ms, %%(skipped)s/%%(frames)s skipped' % animation.rate % animation.stats()
+    tmsg_var.set( tmsg )
+
+def renderFrame():
+    """Render animation frame. Sat tracks are resubmitted when previous ones are done."""
+    if dbcarta.isSpherical():
+        renderSky(move=True)
+        if not satpool.pending:
+            renderSat()
 
 def setTime():
     """Set UTC."""
@@ -342,26 +704,38 @@ def setTime():
     except:
         print('setTime: ', sys.exc_info()[0], sys.exc_info()[1])
 
-root = Tk()
-root.geometry('1000x630+%s+%s' % (150, 10))
-dbcarta = dbCarta(root, viewportx=600, viewporty=400)
-_ = setLanguage(dbcarta.langOf(), 'starry')
-__ = setLanguage(dbcarta.langOf(), 'dbcarta')
-root.title(_('Starry Sky on Canvas'))
-f = Frame(root)
-f.pack(fill='both')
-Button(f, text='T', foreground=rgb(150,50,55), command=lambda : setTime() or renderSky()).pack(side='right')
-tmsg_var = StringVar()
-Label(f, textvariable=tmsg_var, anchor='w', justify='left').pack(fill='both')
-starry = Starry()
-dbcarta.changeProject(203, [[37.61,55.75]])
-renderSky()
-dbcarta.paintBound()
-dbcarta.loadCarta(CONTINENTS)
-dbcarta.loadCarta([('DotPort', 'Moscow', [[37.61,55.75]], _('Moscow'))])
-dbcarta.loadCarta(dbcarta.createMeridians())
-renderSat()
-dbcarta.usercl('changeProject', ['renderSky', locals()], 'Before')
-dbcarta.usercl('changeProject', ['renderSat', locals()], 'After')
-root.mainloop()
-root.destroy()
+if __name__ == '__main__':
+    root = Tk()
+    root.geometry('1000x630+%s+%s' % (150, 10))
+    dbcarta = dbCarta(root, viewportx=600, viewporty=400)
+    _ = setLanguage(dbcarta.langOf(), 'starry')
+    __ = setLanguage(dbcarta.langOf(), 'dbcarta')
+    root.title(_('Starry Sky on Canvas'))
+    f = Frame(root)
+    f.pack(fill='both')
+    Button(f, text='T', foreground=rgb(150,50,55), command=lambda : setTime() or renderSky()).pack(side='right')
+    Button(f, text='>', foreground=rgb(150,50,55), command=lambda : animation.toggle()).pack(side='right')
+    tmsg_var = StringVar()
+    Label(f, textvariable=tmsg_var, anchor='w', justify='left').pack(fill='both')
+    starry = Starry()
+    ephemeris = Ephemeris()
+    satpool = SatPool(root)
+    SKYSTARS = SkyData(STARS)
+    SKYCLNS = SkyData(CLNS)
+    SKYCNTS = SkyData([cnt[:3] + [i] + cnt[4:] + ['', rgb(0,200,0)] for i, cnt in enumerate(CNTS)])
+    animation = Animation(root, starry, renderFrame)
+    terminator = None
+    dbcarta.changeProject(203, [[37.61,55.75]])
+    renderSky()
+    dbcarta.paintBound()
+    dbcarta.loadCarta(CONTINENTS)
+    dbcarta.loadCarta([('DotPort', 'Moscow', [[37.61,55.75]], _('Moscow'))])
+    terminator = Terminator(dbcarta, ephemeris)
+    terminator.update(starry.gmtm)
+    dbcarta.loadCarta(dbcarta.createMeridians())
+    renderSat()
+    dbcarta.usercl('changeProject', ['renderSky', locals()], 'Before')
+    dbcarta.usercl('changeProject', ['renderSat', locals()], 'After')
+    root.mainloop()
+    satpool.close()
+    root.destroy()
@@ -0,0 +1,942 @@
+"""Test suite for dbCarta and demos utils without display.
+Run from demos as `python -m pytest tests.py` or `python -m unittest tests`."""
+
+import calendar
+import io
+import os
+import struct
+import sys
+import tempfile
+import time
+import warnings
+from unittest import TestCase
+from functools import reduce
+from math import radians, sin, cos, acos, exp, log, pi
+
+thisdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, thisdir)
+sys.path.insert(0, os.path.dirname(thisdir))
+
+import dbcarta
+import data
+from utils import satpool, solar, terminator
+import starry
+from data.tledata import TLEDATA
+from sgp4.earth_gravity import wgs84
+from sgp4.io import fixed2rv
+from sgp4.model import propagate_catalog
+
+dbcarta._ = starry._ = lambda s: s
+
+
+class Var:
+    """Tk variable of slider."""
+    def __init__(self, value): self.value = value
+    def get(self): return self.value
+    def set(self, value): self.value = value
+
+
+class Slider(dict):
+    """Scale widget with zoom options."""
+    def __init__(self, scale=0.0005):
+        dict.__init__(self, {'from': 0.0005, 'resolution': 0.0005})
+        self.var = Var(scale)
+    def get(self): return self.var.get()
+
+
+class Canvas:
+    """Canvas with whole map visible, records commands called at once or by TkBatch."""
+    def __init__(self):
+        self.tk = self
+        self.cmds = []
+        self.n = 0
+        self.calls = 0
+    def __str__(self): return '.dw'
+    def __getattr__(self, name):
+        # create_line, create_text...
+        if not name.startswith('create_'):
+            raise AttributeError(name)
+        def create(*points, **kw):
+            if len(points) == 1:
+                points = points[0]
+            return self.call('', [(str(self), 'create', name[7:], tuple(points)) + self.options(kw)])[0]
+        return create
+    def options(self, kw):
+        return sum([('-' + k, v) for k, v in kw.items() if v is not None], ())
+    def eval(self, script): pass
+    def splitlist(self, value): return tuple(value)
+    def call(self, proc, cmds):
+        self.calls += 1
+        res = []
+        for cmd in cmds:
+            self.cmds.append(cmd)
+            if cmd[1] == 'create':
+                self.n += 1
+            res.append([self.n, ''][cmd[1] != 'create'])
+        return tuple(res)
+    def __setitem__(self, key, value): pass
+    def config(self, **kw): pass
+    def delete(self, *tags): self.call('', [(str(self), 'delete') + tags])
+    def coords(self, tag, *points): self.call('', [(str(self), 'coords', tag, points)])
+    def itemconfigure(self, tag, **kw): self.call('', [(str(self), 'itemconfigure', tag) + self.options(kw)])
+    def scale(self, *args): self.call('', [(str(self), 'scale') + args])
+    def tag_lower(self, tag, below): self.call('', [(str(self), 'lower', tag, below)])
+    def find_withtag(self, tag): return ()
+    def xview(self, *args): return (0.0, 1.0)
+    def yview(self, *args): return (0.0, 1.0)
+
+
+class Master:
+    """Container with callbacks called by run."""
+    def __init__(self): self.queue, self.delays, self.n = [], [], 0
+    def after(self, ms, func):
+        self.n += 1
+        self.delays.append(ms)
+        self.queue.append(('after#%s' % self.n, func))
+        return self.queue[-1][0]
+    after_idle = lambda self, func: self.after(0, func)
+    def after_cancel(self, id):
+        self.queue = [x for x in self.queue if x[0] != id]
+    def step(self):
+        self.queue.pop(0)[1]()
+    def run(self):
+        while self.queue:
+            self.step()
+
+
+def carta(project=0, centerof=None):
+    """Return dbCarta by PROJECT without widgets."""
+    carta = dbcarta.dbCarta.__new__(dbcarta.dbCarta)
+    carta._dbCarta__temp = {'centerof': centerof or [[0, 0]]}
+    carta._dbCarta__usercl = {}
+    carta.master = Master()
+    carta.slider = Slider()
+    carta.dw = Canvas()
+    carta.tkbatch = dbcarta.TkBatch(carta.dw)
+    carta.mflood = {}
+    carta.pcache = dbcarta.ProjCache()
+    carta.sindex = dbcarta.GridIndex()
+    carta.layers = dbcarta.LayerIndex()
+    carta.events = {}
+    carta.cull = 0
+    carta.viewportx, carta.viewporty = 540, 270
+    carta.project = project
+    carta.scaleX = carta.viewportx * carta.delta
+    carta.scaleY = carta.viewporty * carta.delta
+    if project == 101:
+        carta.scaleY = carta.toMercator(90.0) * carta.delta * carta.viewporty / 90.0
+    carta.halfX, carta.halfY = carta.scaleX / 2.0, carta.scaleY / 2.0
+    return carta
+
+
+class usenumpy:
+    """Context of MODULE (opt., dbcarta default) with NUMPY module (None for pure Python paths)."""
+    def __init__(self, numpy, module=dbcarta):
+        self.value, self.module = numpy, module
+    def __enter__(self):
+        self.numpy, self.module.numpy = self.module.numpy, self.value
+    def __exit__(self, *exc):
+        self.module.numpy = self.numpy
+
+# numpy (if installed) and pure Python paths
+paths = [dbcarta.numpy, None][not dbcarta.numpy:]
+
+
+def segmentDist(xy, xy1, xy2):
+    """Return distance from point XY to segment XY1, XY2."""
+    dx, dy = xy2[0] - xy1[0], xy2[1] - xy1[1]
+    t = ((xy[0] - xy1[0]) * dx + (xy[1] - xy1[1]) * dy) / float(dx * dx + dy * dy or 1)
+    t = min(1.0, max(0.0, t))
+    return ((xy1[0] + t * dx - xy[0]) ** 2 + (xy1[1] + t * dy - xy[1]) ** 2) ** 0.5
+
+
+# sky bodies [ra, de, mag] spread over sphere
+skydata = [[i * 2.399963 % (2 * pi), acos(1 - (i + 0.5) / 1000.0) - pi / 2, i * 0.37 % 8 - 1] for i in range(2000)]
+
+
+def skyView(scale=0.0005, centerof=None, xview=(0.0, 1.0), gmtm=(2020, 3, 20, 12, 0, 0, 4, 80, 0)):
+    """Return Starry on Globe by CENTEROF zoomed to SCALE with visible part XVIEW."""
+    view = carta(203, centerof)
+    view.slider.var.set(scale)
+    view.dw.xview = lambda *args: xview
+    starry.dbcarta = view
+    sky = starry.Starry()
+    sky.gmtm = gmtm
+    sky.initSky()
+    return sky
+
+
+def globeArea(coords, center):
+    """Return area of ring COORDS on orthographic Globe by CENTER in parts of Globe disk."""
+    cx, cy = [radians(x) for x in center]
+    xs, ys = [], []
+    for x, y in coords:
+        x, y = radians(x), radians(y)
+        xs.append(cos(y) * sin(x - cx))
+        ys.append(sin(y) * cos(cy) - cos(y) * sin(cy) * cos(x - cx))
+    return abs(sum([xs[i] * ys[i - 1] - xs[i - 1] * ys[i] for i in range(len(xs))])) / 2.0 / pi
+
+
+class Tests(TestCase):
+
+    def test_projection_roundtrip(self):
+        # fromPoints is reverse of toPoints by numpy and pure Python paths
+        coords = [[-170 + 0.85 * i, -80 + 0.4 * i] for i in range(400)]
+        for project in (0, 101, 203):
+            for z_angle in (0, 30):
+                view = carta(project, [[30, 40]])
+                view._dbCarta__temp['z_angle'] = z_angle
+                visible = [xy for xy in coords if view.toPoints([xy])]
+                for numpy in paths:
+                    with usenumpy(numpy):
+                        back = view.fromPoints(view.toPoints(visible, doscale=1), dosphere=1)
+                    self.assertEqual(len(back), len(visible))
+                    for xy, _xy in zip(visible, back):
+                        self.assertAlmostEqual(xy[0], _xy[0], 4)
+                        self.assertAlmostEqual(xy[1], _xy[1], 4)
+        # back side of Globe is dropped
+        self.assertEqual(carta(203).toPoints([[180, 0]]), [])
+
+    def test_projcache_lru(self):
+        cache = dbcarta.ProjCache(maxpoints=6)
+        cache.put('a', 'f1', [0, 0])
+        cache.put('a', 'f2', [0, 0])
+        cache.put('b', 'f1', [0, 0])
+        # f1 of a is recently used, f2 is dropped
+        self.assertEqual(cache.get('a', 'f1'), [0, 0])
+        cache.put('b', 'f2', [0, 0])
+        self.assertEqual(cache.get('a', 'f2'), None)
+        self.assertEqual(cache.npoints, 6)
+        # points of object in all projections
+        cache.discard('f1')
+        self.assertEqual([cache.get('a', 'f1'), cache.get('b', 'f1')], [None, None])
+        self.assertEqual(cache.npoints, 2)
+        # the last item is kept over limit
+        cache.put('c', 'f3', [0] * 10)
+        self.assertEqual(list(cache.items), [('c', 'f3')])
+
+    def test_project_carta_cache(self):
+        view = carta(0)
+        view.loadCarta([('Line', 'l1', [[0, 0], [10, 10]])])
+        ftag = list(view.mflood)[0]
+        points = view.projectCarta([ftag])
+        self.assertEqual(len(view.pcache.items), 1)
+        self.assertEqual(view.projectCarta([ftag]), points)
+        # other center of Globe is other key
+        view = carta(203)
+        view.loadCarta([('Line', 'l1', [[0, 0], [10, 10]])])
+        view.projectCarta(list(view.mflood))
+        view._dbCarta__temp['centerof'] = [[5, 5]]
+        view.projectCarta(list(view.mflood))
+        self.assertEqual(len([key for key, ftag in view.pcache.items if key[0] != 'densify']), 2)
+
+    def test_grid_index(self):
+        index = dbcarta.GridIndex(cell=10.0)
+        index.insert('a', [0, 0, 5, 5])
+        index.insert('b', [-179, -89, 179, 89])
+        index.insert('c', [100, 40, 120, 50])
+        self.assertEqual(index.query([1, 1, 2, 2]), set(['a', 'b']))
+        self.assertEqual(index.query([6, 6, 9, 9]), set(['b']))
+        self.assertEqual(index.query([110, 0, 130, 45], [0, 0, 1, 1]), set(['a', 'b', 'c']))
+        # move and delete
+        index.insert('a', [50, 50, 51, 51])
+        self.assertEqual(index.query([1, 1, 2, 2]), set(['b']))
+        index.remove('b')
+        self.assertEqual(index.query([-180, -90, 180, 90]), set(['a', 'c']))
+        self.assertTrue(index.intersects('c', [[0, 0, 1, 1], [119, 49, 130, 60]]))
+        index.clear()
+        self.assertEqual(index.query([-180, -90, 180, 90]), set())
+
+    def test_simplify_coords(self):
+        view = carta(0)
+        coords = [[0.01 * i, 2 * sin(0.01 * i) + 0.01 * sin(3.0 * i)] for i in range(1000)]
+        lod = view.simplifyCoords(coords, 'Line')
+        self.assertEqual(len(lod), len(view.lodtol))
+        for tol, level in zip(view.lodtol, lod):
+            self.assertEqual([level[0], level[-1]], [coords[0], coords[-1]])
+            # each point of line is within tolerance of segment of simplified one
+            j = 0
+            for xy in coords:
+                while xy[0] > level[j + 1][0]:
+                    j += 1
+                self.assertTrue(segmentDist(xy, level[j], level[j + 1]) <= tol + 1e-12)
+        # coarse levels have less points
+        self.assertTrue(len(lod[0]) <= len(lod[1]) <= len(lod[2]) <= len(lod[3]) < len(coords))
+        # short lines and dots are not simplified
+        self.assertEqual(view.simplifyCoords(coords[:4], 'Line'), None)
+        self.assertEqual(view.simplifyCoords(coords, 'Dot'), None)
+        # levels by scale, 0 for all points
+        self.assertEqual([view.lodOf(scale) for scale in (0.0002, 0.0005, 0.01, 1)], [1, 2, 4, 0])
+
+    def test_zoom_idle(self):
+        view = carta(0)
+        view.loadCarta([('Line', 'near', [[-150, 10], [-140, 20]]), ('Line', 'far', [[150, 10], [160, 20]])])
+        near, far = sorted(view.mflood, key=lambda ftag: view.mflood[ftag]['coords'][0][0])
+        zoom = []
+        view.bindEvent('zoom', lambda event, scale: zoom.append(scale))
+        keys = []
+        view.usercl('__master_keyPress', ['key', {'key': lambda: keys.append(view.slider.get())}])
+        # left quarter of map is visible
+        view.dw.xview = lambda *args: (0.0, 0.25)
+        class Event:
+            keysym = 'plus'
+        n = len(view.dw.cmds)
+        for i in range(3):
+            view._dbCarta__master_keyPress(Event)
+            view._dbCarta__zoomIdle(view.slider.get())
+        self.assertEqual(len(view.master.queue), 1)
+        view.master.run()
+        # steps are applied by one scale of canvas with whole ratio
+        scales = [cmd for cmd in view.dw.cmds[n:] if cmd[1] == 'scale']
+        self.assertEqual(len(scales), 1)
+        self.assertAlmostEqual(scales[0][-1], 4.0)
+        self.assertEqual(zoom, [0.002])
+        # user callback of keys once with new scale
+        self.assertEqual(keys, [0.002])
+        # far object is deleted before scale, painted by labelPoint when visible
+        unpainted = view._dbCarta__temp['unpainted']
+        self.assertEqual(unpainted, set([far]))
+        self.assertTrue(view.dw.cmds.index(('.dw', 'delete', far)) < view.dw.cmds.index(scales[0]))
+        view.dw.xview = lambda *args: (0.0, 1.0)
+        n = len(view.dw.cmds)
+        view.labelPoint()
+        self.assertEqual(unpainted, set())
+        created = [cmd for cmd in view.dw.cmds[n:] if cmd[1] == 'create']
+        self.assertEqual(len(created), 1)
+        self.assertTrue(far in created[0][created[0].index('-tags') + 1])
+
+    def test_label_diff(self):
+        view = carta(0)
+        view.loadCarta([('DotPort', 'p1', [[10, 10]], 'P1'), ('DotPort', 'p2', [[-60, -30]], 'P2')])
+        # labels are kept between calls
+        view.labelPoint()
+        self.assertEqual(view.labelstat, {'created': 0, 'moved': 0, 'deleted': 0})
+        view.slider.var.set(0.001)
+        view.labelPoint()
+        self.assertEqual(view.labelstat, {'created': 0, 'moved': 2, 'deleted': 0})
+        # label out of visible area
+        view.dw.xview = lambda: (0.5, 1.0)
+        n = len(view.dw.cmds)
+        view.labelPoint()
+        self.assertEqual(view.labelstat, {'created': 0, 'moved': 0, 'deleted': 1})
+        self.assertEqual([cmd[1] for cmd in view.dw.cmds[n:]], ['delete'])
+        view.dw.xview = lambda: (0.0, 1.0)
+        view.labelPoint()
+        self.assertEqual(view.labelstat, {'created': 1, 'moved': 0, 'deleted': 0})
+
+    def test_stream_carta(self):
+        view = carta(0)
+        rows = [('DotPort', 'p%s' % i, [[i, i]], 'P%s' % i) for i in range(10)]
+        progress, after = [], []
+        view.usercl('streamCarta', lambda: progress.append(dict(view.loadstat)), 'Progress')
+        view.usercl('streamCarta', lambda: after.append(len(view.mflood)), 'After')
+        class Clock:
+            # each call takes 1/64 s
+            t = 0.0
+            def time(self):
+                self.t += 1 / 64.0
+                return self.t
+        clock, dbcarta.time = dbcarta.time, Clock()
+        try:
+            # 2 rows by slice
+            view.streamCarta(rows, timeslice=1000 / 32.0)
+            self.assertEqual(view.mflood, {})
+            view.master.run()
+            self.assertEqual([x['done'] for x in progress], [2, 4, 6, 8, 10, 10])
+            self.assertEqual(progress[-1], {'done': 10, 'total': 10, 'cancel': 0})
+            self.assertEqual(after, [10])
+            self.assertEqual([view.mflood[ftag]['label'] for ftag in sorted(view.mflood)], [x[3] for x in rows])
+            # rows of slice are created by one Tcl call
+            self.assertEqual(len([x for x in view.dw.cmds if x[1] == 'create']), 20)
+            self.assertEqual(view.dw.calls, 6)
+            # generator of unknown length, cancel stops next steps
+            del progress[:]
+            view.streamCarta(iter(rows), timeslice=1000 / 32.0)
+            view.master.step()
+            view.master.step()
+            view.cancelCarta()
+            self.assertEqual(view.master.queue, [])
+            self.assertEqual(len(progress), 2)
+            self.assertEqual(view.loadstat, {'done': 4, 'total': None, 'cancel': 1})
+            self.assertEqual(len(view.mflood), 14)
+            self.assertEqual(after, [10])
+        finally:
+            dbcarta.time = clock
+
+    def test_parse_wkt(self):
+        def coords(geoms):
+            return [[tp, [[dbcarta.pairsOf(ring) for ring in part] for part in parts]] for tp, parts in geoms]
+        self.assertEqual(coords(dbcarta.parseWKT('POINT (10 20)')), [['POINT', [[[[10, 20]]]]]])
+        self.assertEqual(coords(dbcarta.parseWKT('MULTIPOINT((0 0),(20 30))')),
+                         coords(dbcarta.parseWKT('MULTIPOINT(0 0, 20 30)')))
+        self.assertEqual(coords(dbcarta.parseWKT('SRID=4326;LINESTRING Z (0 0 1, 1 1 2)')),
+                         [['LINESTRING', [[[[0, 0], [1, 1]]]]]])
+        self.assertEqual(coords(dbcarta.parseWKT('POLYGON((0 0,4 0,4 4,0 0),(1 1,2 1,1 2,1 1))')),
+                         [['POLYGON', [[[[0, 0], [4, 0], [4, 4], [0, 0]], [[1, 1], [2, 1], [1, 2], [1, 1]]]]]])
+        self.assertEqual(coords(dbcarta.parseWKT('MULTIPOLYGON(((0 0,1 0,0 1,0 0)),((5 5,6 5,5 6,5 5)))'))[0][1][1],
+                         [[[5, 5], [6, 5], [5, 6], [5, 5]]])
+        # collection is unfolded
+        self.assertEqual([tp for tp, parts in dbcarta.parseWKT('GEOMETRYCOLLECTION(POINT(1 2),LINESTRING EMPTY)')],
+                         ['POINT', 'LINESTRING'])
+        for wkt in ('POINT(1)', 'LINESTRING(0 0, 1 1', 'CIRCLE(0 0)', 'POINT(1 2) x', 'POINT(a b)'):
+            self.assertRaises(ValueError, dbcarta.parseWKT, wkt)
+        self.assertEqual(carta().fromWKT('POINT(1)'), None)
+
+    def test_iter_wkt(self):
+        wkt = u'POINT(1 2)\nLINESTRING(0 0, 1 1);POLYGON((0 0,1 0,0 1,0 0)), GEOMETRYCOLLECTION(POINT(3 4))\n'
+        for bufsize in (1, 7, 65536):
+            geoms = list(dbcarta.iterWKT(io.StringIO(wkt * 3), bufsize))
+            self.assertEqual([tp for tp, parts in geoms], ['POINT', 'LINESTRING', 'POLYGON', 'POINT'] * 3)
+        self.assertEqual(list(dbcarta.iterWKT(io.BytesIO(b'POINT(1 2)')))[0][0], 'POINT')
+        self.assertRaises(ValueError, list, dbcarta.iterWKT(io.StringIO(u'POINT(1 2) LINESTRING(0 0')))
+
+    def test_parse_wkb(self):
+        def wkb(code, *values, **kw):
+            order = kw.get('order', '<')
+            head = struct.pack(order + 'BI', order == '<', code)
+            return head + b''.join([x if isinstance(x, bytes) else struct.pack(order + ['d', 'I'][type(x) is int], x) for x in values])
+        def coords(geoms):
+            return [[tp, [[dbcarta.pairsOf(ring) for ring in part] for part in parts]] for tp, parts in geoms]
+        self.assertEqual(coords(dbcarta.parseWKB(wkb(1, 10.0, 20.0))), [['POINT', [[[[10, 20]]]]]])
+        # big endian, ISO Z, EWKB Z with SRID are the same line
+        line = coords(dbcarta.parseWKT('LINESTRING(0 0, 1 1)'))
+        self.assertEqual(coords(dbcarta.parseWKB(wkb(2, 2, 0.0, 0.0, 1.0, 1.0, order='>'))), line)
+        self.assertEqual(coords(dbcarta.parseWKB(wkb(1002, 2, 0.0, 0.0, 5.0, 1.0, 1.0, 5.0))), line)
+        self.assertEqual(coords(dbcarta.parseWKB(wkb(0xa0000002, 4326, 2, 0.0, 0.0, 5.0, 1.0, 1.0, 5.0))), line)
+        # multi and collection geometries
+        polygon = wkb(3, 1, 4, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+        self.assertEqual(coords(dbcarta.parseWKB(wkb(6, 2, polygon, polygon))),
+                         coords(dbcarta.parseWKT('MULTIPOLYGON(((0 0,1 0,0 1,0 0)),((0 0,1 0,0 1,0 0)))')))
+        self.assertEqual([tp for tp, parts in dbcarta.parseWKB(wkb(7, 2, polygon, wkb(1, 1.0, 2.0)))], ['POLYGON', 'POINT'])
+        # invalid
+        for data in (wkb(1, 10.0), wkb(1, 10.0, 20.0, 30.0), wkb(9, 1.0, 2.0), wkb(6, 1, wkb(1, 1.0, 2.0))):
+            self.assertRaises(ValueError, dbcarta.parseWKB, data)
+        self.assertEqual(carta().fromWKB(wkb(1, 10.0)), None)
+
+    def test_coords(self):
+        coords = dbcarta.Coords([[0, 1], [2, 3], [4, 5], [6, 7]])
+        self.assertEqual(len(coords), 4)
+        self.assertEqual([coords[0], coords[-1]], [[0, 1], [6, 7]])
+        self.assertRaises(IndexError, coords.__getitem__, 4)
+        self.assertRaises(IndexError, coords.__getitem__, -5)
+        self.assertRaises(IndexError, coords.__setitem__, 4, [0, 0])
+        # slices as Coords
+        self.assertTrue(isinstance(coords[1:3], dbcarta.Coords))
+        self.assertEqual(coords[1:3], [[2, 3], [4, 5]])
+        self.assertEqual(coords[::-2], [[6, 7], [2, 3]])
+        self.assertEqual(coords[3:1], [])
+        self.assertEqual(list(coords[-2:]), [[4, 5], [6, 7]])
+        coords[1] = [20, 30]
+        coords.append([8, 9])
+        coords += [[10, 11]]
+        self.assertEqual(coords.tolist(), [[0, 1], [20, 30], [4, 5], [6, 7], [8, 9], [10, 11]])
+        self.assertEqual(list(coords.flat), [0, 1, 20, 30, 4, 5, 6, 7, 8, 9, 10, 11])
+        # z, m values are dropped, flat array is not copied
+        self.assertEqual(dbcarta.Coords([[1, 2, 3]]), [[1, 2]])
+        flat = coords.flat
+        self.assertTrue(dbcarta.Coords(flat=flat).flat is flat)
+        self.assertFalse(dbcarta.Coords(coords).flat is flat)
+
+    def test_events(self):
+        view = carta(0)
+        calls = []
+        subscriber = view.bindEvent('zoom', lambda event, *args: calls.append((event,) + args))
+        view.bindEvent('changeProject.Before', lambda event: calls.append(event))
+        # user callbacks by name and when, as function or [name, symtable]
+        view.usercl('zoom', lambda: calls.append('zoom cl'))
+        view.usercl('changeProject', ['before', {'before': lambda: calls.append('before cl')}], 'Before')
+        view.fireEvent('zoom', 0.001)
+        view.fireEvent('changeProject.Before')
+        view.fireEvent('load', [])
+        self.assertEqual(calls, [('zoom', 0.001), 'zoom cl', 'changeProject.Before', 'before cl'])
+        view.unbindEvent('zoom', subscriber)
+        view.unbindEvent('changeProject.Before')
+        del calls[:]
+        view.fireEvent('zoom', 0.001)
+        view.fireEvent('changeProject.Before')
+        self.assertEqual(calls, ['zoom cl', 'before cl'])
+        # callback by caller name
+        def labelPoint():
+            view.clfunc()
+        view.usercl('labelPoint', lambda: calls.append('label cl'))
+        labelPoint()
+        self.assertEqual(calls[-1], 'label cl')
+
+    def test_layer_index(self):
+        layers = dbcarta.LayerIndex()
+        a1, a2 = layers.newTag('Area', 'a'), layers.newTag('Area', 'b')
+        l1 = layers.newTag('Line', 'a')
+        self.assertEqual([a1, a2, l1], ['0000_Area_a', '0001_Area_b', '0002_Line_a'])
+        self.assertEqual(layers.members('Area'), set([a1, a2]))
+        self.assertEqual([layers.count('Area'), layers.count('Dot')], [2, 0])
+        # move to other layer and delete
+        layers.add(a2, 'Line')
+        self.assertEqual(layers.members('Line'), set([a2, l1]))
+        layers.remove(a1)
+        self.assertEqual(layers.members('Area'), set())
+        self.assertFalse('Area' in layers.ftags)
+        # indexes of layer are not reused, start index is kept
+        self.assertEqual([layers.freeIndex('Figure') for i in range(3)], [1, 2, 3])
+        self.assertEqual(layers.freeIndex('Figure', 10), 10)
+        self.assertEqual(layers.freeIndex('Figure', 5), 11)
+        self.assertEqual(layers.freeIndex('Line', 5), 5)
+        layers.clear()
+        self.assertEqual(layers.members('Line'), set())
+        self.assertEqual(layers.newTag('Area', 'c'), '0003_Area_c')
+
+    def test_clear_layers(self):
+        view = carta(0)
+        view.loadCarta([('Line', 'l1', [[0, 0], [1, 1]]), ('Line', 'l2', [[0, 0], [2, 2]]),
+                        ('Area', 'a1', [[0, 0], [1, 0], [0, 1]])])
+        view.clearLayers('Line')
+        self.assertEqual([view.mflood[ftag]['ftype'] for ftag in view.mflood], ['Area'])
+        self.assertEqual(view.layers.members('Line'), set())
+        self.assertEqual(view.sindex.query([-180, -90, 180, 90]), set(view.mflood))
+
+    def test_drag_coarse(self):
+        view = carta(203)
+        coords = [[0.01 * i, 2 * sin(0.01 * i) + 0.01 * sin(3.0 * i)] for i in range(1000)]
+        view.loadCarta([('Line', 'l1', coords, 'L1')])
+        ftag = list(view.mflood)[0]
+        view.pcache.clear()
+        # drag frames are coalesced
+        view._dbCarta__dragIdle()
+        view._dbCarta__dragIdle()
+        self.assertEqual(len(view.master.queue), 1)
+        # coarse frame: coarsest level of detail, no cache, no labels
+        view._dbCarta__temp['coarse'] = 1
+        points = view.projectCarta([ftag], doscale=0)[0]
+        self.assertEqual(points, view.toPoints(view.levelCoords(ftag, len(view.lodtol))))
+        self.assertEqual(len(view.pcache.items), 0)
+        n = len(view.dw.cmds)
+        view.labelPoint()
+        self.assertEqual(len(view.dw.cmds), n)
+
+    def test_tk_batch(self):
+        canvas = Canvas()
+        batch = dbcarta.TkBatch(canvas)
+        with batch:
+            self.assertEqual(batch.create('line', [0, 0, 1, 1], tags=('a', 'b'), fill=None), 0)
+            with batch:
+                batch.coords('a', [1, 1, 2, 2])
+                batch.itemconfigure('a', fill='red')
+            # nested block is flushed by outer one
+            self.assertEqual(canvas.cmds, [])
+            batch.delete('b', 'c')
+        self.assertEqual(canvas.cmds, [('.dw', 'create', 'line', (0, 0, 1, 1), '-tags', ('a', 'b')),
+                                       ('.dw', 'coords', 'a', (1, 1, 2, 2)),
+                                       ('.dw', 'itemconfigure', 'a', '-fill', 'red'),
+                                       ('.dw', 'delete', 'b', 'c')])
+        # ids of created items by flush
+        with batch:
+            batch.create('text', [0, 0], text='x')
+            batch.create('oval', [0, 0, 1, 1])
+            self.assertEqual(batch.flush(), [2, 3])
+        self.assertEqual(batch.flush(), [])
+
+    def test_update_carta(self):
+        view = carta(0)
+        view.loadCarta([('DotPort', 'p1', [[10, 10]], 'P1'), ('Line', 'l1', [[0, 0], [1, 1]])])
+        dot, line = sorted(view.mflood)
+        points = view.projectCarta([line])
+        # updates are applied together once, the last coords win
+        view.updateCarta(dot, [[20, 20]])
+        view.updateCartaMany({dot: [[30, 40]], line: '(5,5),(6,6)'})
+        self.assertEqual(len(view.master.queue), 1)
+        self.assertEqual(view.mflood[dot]['coords'], [[10, 10]])
+        n = len(view.dw.cmds)
+        view.master.run()
+        self.assertEqual(view.mflood[dot]['coords'], [[30, 40]])
+        self.assertEqual(view.mflood[line]['coords'], [[5, 5], [6, 6]])
+        self.assertEqual(view.sindex.query([29, 39, 31, 41]), set([dot]))
+        self.assertNotEqual(view.projectCarta([line]), points)
+        # items are moved, not created again
+        self.assertEqual(set([cmd[1] for cmd in view.dw.cmds[n:]]), set(['coords']))
+
+    def test_data_roundtrip(self):
+        records = [['.Mainland', 'a', [[0.5, 1.5], [2.5, 3.5]], u'\u041c\u0438\u0440', None, 7, 1.25, [1, 2, 3]],
+                   ['DotPort', 'b', [[10, 20]], 'a', None, -1, 0.0, []]]
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            dbcarta.writeData(path, records)
+            data = dbcarta.readData(path)
+            self.assertEqual(len(data), 2)
+            self.assertEqual(data[0], records[0])
+            self.assertTrue(isinstance(data[0][2], dbcarta.Coords))
+            self.assertEqual(data[-1], records[1])
+            self.assertEqual(data[0:5], records)
+            self.assertRaises(IndexError, data.__getitem__, 2)
+            data.close()
+            # groups by name in order, float32 coords
+            dbcarta.writeData(path, dbcarta.OrderedDict([('z', records[:1]), ('a', records)]), 'f')
+            groups = dbcarta.readData(path)
+            self.assertEqual(list(groups), ['z', 'a'])
+            self.assertEqual([len(group) for group in groups.values()], [1, 2])
+            self.assertEqual(groups['a'][1], records[1])
+            self.assertEqual(list(groups['z']), records[:1])
+            self.assertRaises(IndexError, groups['z'].__getitem__, 1)
+            list(groups.values())[0].source.close()
+            with open(path, 'wb') as f:
+                f.write(b'\0' * 64)
+            self.assertRaises(ValueError, dbcarta.readData, path)
+        finally:
+            os.remove(path)
+
+    def test_dataset_cache(self):
+        # file not made by convert2dbc.py is made in cache directory, not in package
+        cachedir = tempfile.mkdtemp()
+        _cachedir, data.CACHE_DIR = data.CACHE_DIR, cachedir
+        try:
+            records = data.dataset('mosmetro', 'MLABELS')
+            self.assertTrue(isinstance(records, dbcarta.DataFile))
+            self.assertEqual(records[:], data.mosmetro.MLABELS)
+            self.assertTrue(os.path.exists(data.dbcname('mosmetro', 'MLABELS', cachedir)))
+            self.assertFalse(os.path.exists(data.dbcname('mosmetro', 'MLABELS')))
+            records.close()
+            # corrupt file is reported and module is read
+            with open(data.dbcname('mosmetro', 'MLABELS', cachedir), 'wb') as f:
+                f.write(b'\0' * 64)
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                self.assertTrue(data.dataset('mosmetro', 'MLABELS') is data.mosmetro.MLABELS)
+            self.assertEqual(len(caught), 1)
+            self.assertTrue('mosmetro.MLABELS' in str(caught[0].message))
+        finally:
+            data.CACHE_DIR = _cachedir
+            for name in os.listdir(cachedir):
+                os.remove(os.path.join(cachedir, name))
+            os.rmdir(cachedir)
+
+    def test_sky_pos(self):
+        for numpy in paths:
+            with usenumpy(numpy, starry):
+                sky = starry.SkyData(skydata)
+                for scale, centerof, xview in [(0.0005, [[37.61, 55.75]], (0.0, 1.0)), (0.002, [[0, 0]], (0.2, 0.7)),
+                                               (0.01, [[-120, -80]], (0.6, 0.9))]:
+                    view = skyView(scale, centerof, xview)
+                    # all bodies at once as calcSkyPos by one
+                    for masks in [(True, True), (False, False), (True, False)]:
+                        pos = view.skyPos(sky, *masks)
+                        expected = [[i] + xy for i, body in enumerate(skydata) for xy in [view.calcSkyPos(body[0], body[1], *masks)] if xy]
+                        self.assertTrue(expected)
+                        self.assertEqual([x[0] for x in pos], [x[0] for x in expected])
+                        for (i, x, y), (_i, _x, _y) in zip(pos, expected):
+                            self.assertAlmostEqual(x, _x, 6)
+                            self.assertAlmostEqual(y, _y, 6)
+                    # fainter stars by zoom
+                    maglimit = view.magLimit()
+                    self.assertEqual(maglimit, {0.0005: 5.0, 0.002: 7.0, 0.01: 5.0 + log(20, 2)}[scale])
+                    self.assertEqual([x[0] for x in view.skyPos(sky, maglimit=maglimit)],
+                                     [x[0] for x in view.skyPos(sky) if skydata[x[0]][2] < maglimit])
+
+    def satTest(self, processes):
+        """Check SatPool of PROCESSES with propagate_catalog."""
+        tledata = [list(x) for x in TLEDATA[:40]]
+        tledata[20][1] = tledata[20][1][:20] + 'x' + tledata[20][1][21:]
+        jd = [[2456700.5 + 0.01 * k + 0.001 * i for k in range(5)] for i in range(len(tledata))]
+        good = [i for i in range(len(tledata)) if i != 20]
+        r, v, error = propagate_catalog([fixed2rv(tledata[i][1], tledata[i][2], wgs84) for i in good], [jd[i] for i in good])
+        expected = list(getattr(r, 'flat', r))
+        master = Master()
+        pool = satpool.SatPool(master, processes)
+        try:
+            chunks, finished = {}, []
+            pool.submit(tledata, jd, lambda first, mpos: chunks.setdefault(first, list(getattr(mpos, 'flat', mpos))),
+                        finished.append)
+            while master.queue:
+                master.step()
+                if master.queue and pool.pool:
+                    time.sleep(0.01)
+            self.assertEqual(sorted(chunks), list(range(0, len(tledata), pool.chunk)))
+            positions = [x for first in sorted(chunks) for x in chunks[first]]
+            self.assertEqual(positions[:300] + positions[315:], expected)
+            # positions of bad TLE only are nan
+            self.assertTrue(all([x != x for x in positions[300:315]]))
+            self.assertEqual([i for i, message in finished[0]], [20])
+            # result of outdated submit is dropped
+            chunks.clear()
+            pool.submit(tledata[:3], jd[:3], lambda first, mpos: chunks.setdefault('first', first))
+            pool.submit(tledata[3:5], jd[3:5], lambda first, mpos: chunks.setdefault('second', list(getattr(mpos, 'flat', mpos))))
+            while master.queue:
+                master.step()
+                if master.queue and pool.pool:
+                    time.sleep(0.01)
+            self.assertEqual(list(chunks), ['second'])
+            self.assertEqual(chunks['second'], expected[45:75])
+            # cancel drops results and stops polling
+            pool.submit(tledata, jd, lambda first, mpos: chunks.setdefault('cancelled', first))
+            pool.cancel()
+            while master.queue:
+                master.step()
+            self.assertFalse('cancelled' in chunks)
+            return pool
+        finally:
+            pool.close()
+
+    def test_satpool(self):
+        # no-fork fallback in mainloop
+        pool = self.satTest(0)
+        self.assertEqual([pool.pool, pool.context], [None, None])
+        # pool of processes with shared buffers
+        pool = self.satTest(2)
+        if satpool._context():
+            self.assertFalse(isinstance(pool.buffers[0], satpool.array))
+
+    def test_chebyshev(self):
+        # polynomials of degree are exact
+        coeffs = solar.chebFit(lambda t: [t ** 3 - 2 * t, 1.0, t * t], -2.0, 4.0, 3)
+        for t in (-2.0, -0.5, 1.0, 3.7, 4.0):
+            x = (2 * t - 2.0) / 6.0
+            self.assertAlmostEqual(solar.chebEval(coeffs[0], x), t ** 3 - 2 * t, 9)
+            self.assertAlmostEqual(solar.chebEval(coeffs[1], x), 1.0, 9)
+            self.assertAlmostEqual(solar.chebEval(coeffs[2], x), t * t, 9)
+        # error of exp by degree is under bound of Chebyshev interpolation e / (2 ** n * (n + 1)!)
+        for degree in (4, 8, 12):
+            coeffs = solar.chebFit(lambda t: [exp(t), 0, 0], -1.0, 1.0, degree)
+            bound = exp(1) / 2 ** degree / reduce(lambda a, b: a * b, range(1, degree + 2))
+            error = max([abs(solar.chebEval(coeffs[0], -1 + i / 50.0) - exp(-1 + i / 50.0)) for i in range(101)])
+            self.assertTrue(error <= bound, (degree, error, bound))
+
+    def test_ephemeris(self):
+        # angle between formulae and Chebyshev positions within tolerance
+        ephemeris = solar.Ephemeris()
+        for body in solar.BODIES:
+            for i in range(40):
+                d = 7000.0 + 25.3 * i
+                p, q = solar.BODIES[body](d), ephemeris.rect(body, d)
+                dot = sum([x * y for x, y in zip(p, q)]) / sum([x * x for x in p]) ** 0.5 / sum([x * x for x in q]) ** 0.5
+                self.assertTrue(acos(min(1.0, dot)) <= ephemeris.tolerance, (body, d))
+            ra, dec, r = ephemeris.radec(body, 7000.5)
+            _ra, _dec, _r = solar.bodyRadec(body, 7000.5)
+            self.assertAlmostEqual(dec, _dec, 5)
+            self.assertAlmostEqual(r, _r, 5)
+
+    def test_animation(self):
+        class Clock:
+            # time by binary fractions of second
+            t = 0.0
+            gmtime = staticmethod(time.gmtime)
+            def time(self):
+                return self.t
+        class Sky:
+            gmtm = time.gmtime(1600000000)
+        sky, costs = Sky(), []
+        def onframe():
+            starry.time.t += costs.pop(0)
+        master = Master()
+        animation = starry.Animation(master, sky, onframe, rate=60.0, fps=16)
+        clock, starry.time = starry.time, Clock()
+        try:
+            animation.start()
+            self.assertEqual(master.delays, [0])
+            # frame in budget of 62.5 ms waits for the rest of it
+            costs.append(1 / 64.0)
+            master.step()
+            self.assertEqual([animation.frames, animation.skipped, master.delays[-1]], [1, 0, 46])
+            self.assertEqual(sky.gmtm, time.gmtime(1600000000))
+            # overrun frame skips next ones, time goes by clock at rate
+            starry.time.t = 0.25
+            costs.append(10 / 64.0)
+            master.step()
+            self.assertEqual([animation.frames, animation.skipped, master.delays[-1]], [2, 2, 31])
+            self.assertEqual(sky.gmtm, time.gmtime(1600000000 + 15))
+            starry.time.t = 1.0
+            costs.append(127 / 1024.0)
+            master.step()
+            self.assertEqual([animation.frames, animation.skipped, master.delays[-1]], [3, 3, 1])
+            self.assertEqual(sky.gmtm, time.gmtime(1600000000 + 60))
+            stats = animation.stats()
+            self.assertEqual([stats['frames'], stats['skipped'], stats['last'], stats['max']], [3, 3, 124.0234375, 156.25])
+            self.assertAlmostEqual(stats['mean'], (15.625 + 156.25 + 124.0234375) / 3)
+            # time set by user restarts from it
+            sky.gmtm = time.gmtime(1700000000)
+            starry.time.t = 2.0
+            costs.append(0.0)
+            master.step()
+            self.assertEqual(sky.gmtm, time.gmtime(1700000000))
+            starry.time.t = 2.5
+            costs.append(0.0)
+            master.step()
+            self.assertEqual(sky.gmtm, time.gmtime(1700000000 + 30))
+            animation.stop()
+            self.assertFalse(animation.running())
+            self.assertEqual(master.queue, [])
+        finally:
+            starry.time = clock
+
+    def test_sky_move(self):
+        for numpy in paths:
+            with usenumpy(numpy, starry):
+                sky = starry.SkyData(skydata)
+                view = skyView(0.002, [[37.61, 55.75]])
+                # items shifted not more than movepx are kept
+                cmds = starry.dbcarta.dw.cmds
+                n = len(cmds)
+                drawn = {'a': [0.0, 0.0, 2.0, 2.0]}
+                self.assertFalse(view.moveItem(drawn, 'b', [0.0, 0.0, 2.0, 2.0]))
+                self.assertTrue(view.moveItem(drawn, 'a', [0.5, 0.0, 2.5, 2.0]))
+                self.assertEqual(cmds[n:], [])
+                self.assertTrue(view.moveItem(drawn, 'a', [1.5, 0.0, 3.5, 2.0], [1.5, 0.0]))
+                self.assertEqual(cmds[n:], [('.dw', 'coords', 'a', (1.5, 0.0, 3.5, 2.0)), ('.dw', 'coords', '.a', (1.5, 0.0))])
+                self.assertEqual(drawn, {'a': [1.5, 0.0, 3.5, 2.0]})
+                # render by 1 s later moves nothing
+                def render(**kw):
+                    canvas = starry.dbcarta.dw
+                    n = len(canvas.cmds)
+                    view.gmtm = time.gmtime(calendar.timegm(view.gmtm) + kw.get('seconds', 0))
+                    canvas.xview = lambda *args: kw.get('xview', (0.0, 1.0))
+                    view.initSky()
+                    drawn = dict(view.drawn.get('stars', {}))
+                    with starry.dbcarta.tkbatch:
+                        view.stars('stars', sky)
+                    return drawn, [cmd for cmd in canvas.cmds[n:] if cmd[2] != 'rectangle']
+                drawn, cmds = render()
+                self.assertEqual(len(drawn), 0)
+                self.assertEqual(len(cmds), len(view.drawn['stars']))
+                drawn, cmds = render(seconds=1)
+                self.assertEqual(cmds, [])
+                # 10 min later moves drawn items, creates new ones and deletes gone
+                drawn, cmds = render(seconds=600)
+                moved = set([cmd[2] for cmd in cmds if cmd[1] == 'coords'])
+                created = set([cmd[cmd.index('-tags') + 1][0] for cmd in cmds if cmd[1] == 'create'])
+                deleted = set([tag for cmd in cmds if cmd[1] == 'delete' for tag in cmd[2:]])
+                self.assertTrue(moved)
+                self.assertFalse(created & set(drawn))
+                gone = set(drawn) - set(view.drawn['stars'])
+                self.assertEqual(deleted, gone | set(['.' + tag for tag in gone]))
+                pos = dict([['stars%s' % i, [x, y]] for i, x, y in view.skyPos(sky)])
+                for tag in set(drawn) - gone:
+                    x0, y0, x1, y1 = drawn[tag]
+                    shift = max(abs(pos[tag][0] - (x0 + x1) / 2.0), abs(pos[tag][1] - (y0 + y1) / 2.0))
+                    self.assertEqual(tag in moved, shift > view.movepx)
+                # items out of visible part are dropped
+                drawn, cmds = render(xview=(0.0, 0.5))
+                self.assertEqual(set(view.drawn['stars']), set(['stars%s' % x[0] for x in view.skyPos(sky)]))
+                gone = set(drawn) - set(view.drawn['stars'])
+                self.assertTrue(gone)
+                self.assertEqual(set([tag for cmd in cmds if cmd[1] == 'delete' for tag in cmd[2:]]), gone | set(['.' + tag for tag in gone]))
+
+    def test_terminator_rings(self):
+        # Sun altitude on border of area is altitude of ring, by numpy and pure Python
+        altitudes = [0.0, -6.0, -12.0, -18.0]
+        for lon, lat in ((0.0, 0.3), (170.0, 23.44), (-60.0, -10.0), (100.0, 10.0)):
+            mrings = []
+            for numpy in paths:
+                with usenumpy(numpy, terminator):
+                    mrings.append(terminator.terminatorRings(lon, lat, altitudes, 90))
+            for rings in mrings:
+                for h, (ring, copy) in zip(altitudes, rings):
+                    for x, y in ring:
+                        if abs(y) < 89.9:
+                            alt = sin(radians(y)) * sin(radians(lat)) + cos(radians(y)) * cos(radians(lat)) * cos(radians(x - lon))
+                            self.assertAlmostEqual(alt, sin(radians(h)), 6)
+                    self.assertTrue(len(copy) == 1 or len(copy) == len(ring))
+                    for x, y in ring + copy:
+                        self.assertTrue(-360 <= x <= 360 and -90 <= y <= 90)
+            for rings in mrings[1:]:
+                for (ring, copy), (_ring, _copy) in zip(rings, mrings[0]):
+                    for xy, _xy in zip(ring + copy, _ring + _copy):
+                        self.assertAlmostEqual(xy[0], _xy[0], 9)
+                        self.assertAlmostEqual(xy[1], _xy[1], 9)
+
+    def test_terminator_limb_rings(self):
+        # night (Sun under horizon) part of Globe disk is (1 - cos(angle)) / 2
+        # by angle between view center and subsolar point
+        for sun, center in [((0.0, 0.0), (90.0, 0.0)),
+                            ((0.0, 23.44), (0.0, 0.0)),
+                            ((0.0, 23.44), (180.0, 0.0)),
+                            ((30.0, -20.0), (37.61, 55.75)),
+                            ((-100.0, 10.0), (37.61, 55.75)),
+                            ((0.0, 0.0), (90.0, 90.0))]:
+            rings = terminator.terminatorLimbRings(sun[0], sun[1], [0.0, -6.0, -18.0], center, 360)
+            angle = acos(sin(radians(sun[1])) * sin(radians(center[1])) +
+                         cos(radians(sun[1])) * cos(radians(center[1])) * cos(radians(sun[0] - center[0])))
+            areas = [globeArea(ring, center) for ring, copy in rings]
+            self.assertAlmostEqual(areas[0], (1 - cos(angle)) / 2, 3)
+            # twilight layers are nested
+            self.assertTrue(areas[0] > areas[1] > areas[2])
+            for ring, copy in rings:
+                self.assertEqual(copy, ring[:1])
+
+    def test_terminator_limb_rings_out_of_view(self):
+        # Sun in view center: night is collapsed to antisolar point
+        rings = terminator.terminatorLimbRings(10.0, 20.0, [0.0, -18.0], (10.0, 20.0))
+        self.assertEqual([ring for ring, copy in rings], [[[-170.0, -20.0]]] * 2)
+        # antisolar point in view center: Globe in night, cap of -18 in front of Globe
+        rings = terminator.terminatorLimbRings(10.0, 20.0, [0.0, -18.0], (-170.0, -20.0))
+        self.assertAlmostEqual(globeArea(rings[0][0], (-170.0, -20.0)), 1.0, 3)
+        self.assertAlmostEqual(globeArea(rings[1][0], (-170.0, -20.0)), sin(radians(72.0)) ** 2, 3)
+
+    def test_sky_cull(self):
+        # lines from bodies to points up to 20 degrees off
+        lines = []
+        for i, (ra, de, mag) in enumerate(skydata[::4]):
+            lines += [[ra, de], [ra + radians(i % 21) / max(cos(de), 0.1), max(-pi / 2, min(pi / 2, de + radians(i % 13 - 6)))]]
+        for numpy in paths:
+            with usenumpy(numpy, starry):
+                sky, clns = starry.SkyData(skydata), starry.SkyData(lines)
+                for scale in (0.0005, 0.002, 0.01):
+                    for centerof in ([[37.61, 55.75]], [[0, 0]], [[-120, -80]], [[180, 89]]):
+                        for xview in ((0.0, 1.0), (0.2, 0.7), (0.6, 0.9), (0.45, 0.55), (0.1, 0.12)):
+                            view = skyView(scale, centerof, xview)
+                            # cells of view cap keep all visible bodies
+                            self.assertEqual(view.skyPos(sky, cull=0.0), view.skyPos(sky))
+                            self.assertEqual(view.skyPos(sky, maglimit=5.0, cull=0.0), view.skyPos(sky, maglimit=5.0))
+                            # cap widened by reach keeps both ends of lines crossing view
+                            pos = dict([[i, [x, y]] for i, x, y in view.skyPos(clns, False, False, cull=clns.reach())])
+                            ends = dict([[i, [x, y]] for i, x, y in view.skyPos(clns, False, False)])
+                            crossing = [i for i in ends if not i % 2 and i + 1 in ends and
+                                        any([view.left <= ends[i][0] + (ends[i + 1][0] - ends[i][0]) * t / 20.0 < view.right and
+                                             view.top <= ends[i][1] + (ends[i + 1][1] - ends[i][1]) * t / 20.0 < view.bottom
+                                             for t in range(21)])]
+                            self.assertTrue(crossing)
+                            for i in crossing:
+                                self.assertEqual([pos.get(i), pos.get(i + 1)], [ends[i], ends[i + 1]])
+
+    def test_densify(self):
+        view = carta(203)
+        coords = [[-170 + 5 * i, 60 * sin(0.3 * i)] for i in range(70)] + [[0, 0], [180, 0]]
+        step = view.densifyStep()
+        mdense = []
+        for numpy in paths:
+            with usenumpy(numpy):
+                mdense.append(view.densifyCoords(coords, step))
+        dense = mdense[0]
+        for _dense in mdense[1:]:
+            self.assertEqual(len(_dense), len(dense))
+            for xy, _xy in zip(dense, _dense):
+                self.assertAlmostEqual(xy[0], _xy[0], 9)
+                self.assertAlmostEqual(xy[1], _xy[1], 9)
+        # vertices are kept, segments are under step except antipodal one
+        dense = dense.tolist()
+        self.assertEqual([xy for xy in dense if xy in coords], coords)
+        for xy, _xy in zip(dense, dense[1:]):
+            if [xy, _xy] != [[0, 0], [180, 0]]:
+                self.assertTrue(radians(view.arcOf([xy, _xy])) <= step + 1e-9)
+        # step keeps segments within densifytol pixels of great circle at upper scale of band
+        for scale in (0.0005, 0.003, 0.1):
+            band, step = view.zoomBand(scale), view.densifyStep(scale)
+            self.assertTrue(2 ** (band - 1) < scale <= 2 ** band)
+            radius = 180 / pi * view.delta * 2 ** band
+            self.assertAlmostEqual(radius * (1 - cos(step / 2)), view.densifytol, 6)
+        self.assertTrue(view.densifyStep(0.1) < view.densifyStep(0.0005))
+
+    def test_densify_carta_cache(self):
+        view = carta(203)
+        view.loadCarta([('Line', 'l1', [[0, 0], [60, 30]])])
+        ftag = list(view.mflood)[0]
+        dense = view.densifyCarta(ftag)
+        self.assertTrue(len(dense) > 2)
+        self.assertTrue(view.densifyCarta(ftag) is dense)
+        # other zoom band
+        view.slider.var.set(0.01)
+        self.assertTrue(len(view.densifyCarta(ftag)) > len(dense))
+        self.assertEqual(set([key[1] for key, _ftag in view.pcache.items if key[0] == 'densify']), set([-10, -6]))
+        # projections are cached by zoom band of densified coords
+        view.projectCarta([ftag])
+        self.assertEqual(set([key[-1] for key, _ftag in view.pcache.items if key[0] != 'densify']), set([-10, -6]))
+        # flat projections are not densified
+        view = carta(0)
+        view.loadCarta([('Line', 'l1', [[0, 0], [60, 30]])])
+        self.assertEqual(len(view.densifyCarta(list(view.mflood)[0])), 2)
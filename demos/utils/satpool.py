@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+#-*- coding: utf8 -*-
+"""
+Satellite propagation service.
+Satellites are split by chunks across a multiprocessing pool, workers write
+positions to shared memory, results come back to Tk mainloop by `after` polling.
+"""
+
+import os, collections, multiprocessing, warnings
+from array import array
+from multiprocessing import sharedctypes
+from sgp4 import earth_gravity
+from sgp4.io import fixed2rv
+from sgp4.model import propagate_catalog
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_shared = None  # worker: (buffers, generation)
+_satrecs = {}   # worker: Satellite by TLE lines
+
+def _initWorker(buffers, generation):
+    """Keep shared BUFFERS, GENERATION in worker."""
+    global _shared
+    _shared = (buffers, generation)
+
+def _satellite(line1, line2, whichconst):
+    """Return Satellite of TLE lines (parsed once in process)."""
+    key = (line1, line2, whichconst)
+    if key not in _satrecs:
+        _satrecs[key] = fixed2rv(line1, line2, getattr(earth_gravity, whichconst))
+    return _satrecs[key]
+
+def propagateChunk(tles, jd, whichconst='wgs84'):
+    """Return flat positions (km) of TLES `[[line1, line2],...]` for JD rows
+    (one row of Julian dates by satellite). Nan on sgp4 errors."""
+    satellites = [_satellite(line1, line2, whichconst) for line1, line2 in tles]
+    r, v, error = propagate_catalog(satellites, jd)
+    if numpy is not None:
+        return r.reshape(-1)
+    return r
+
+def _writeChunk(buffer, start, r):
+    """Copy flat positions R to shared BUFFER from START."""
+    if numpy is not None:
+        numpy.frombuffer(buffer, dtype=float)[start:start + len(r)] = r
+    else:
+        buffer[start:start + len(r)] = r
+
+def _readChunk(buffer, start, count, steps):
+    """Return positions of COUNT satellites by STEPS from BUFFER at START
+    as array (count, steps, 3) or flat array('d')."""
+    n = count * steps * 3
+    if numpy is not None:
+        return numpy.frombuffer(buffer, dtype=float)[start:start + n].reshape(count, steps, 3).copy()
+    return array('d', buffer[start:start + n])
+
+def _computeChunk(tles, jd, whichconst):
+    """Return (positions, errors) of TLES by propagateChunk. Positions of satellites
+    which TLE can't be read are nan, ERRORS is list of `(index, message)` of them."""
+    errors = []
+    for i, (line1, line2) in enumerate(tles):
+        try:
+            _satellite(line1, line2, whichconst)
+        except ValueError as e:
+            errors.append((i, '%s' % (e,)))
+    if not errors:
+        return propagateChunk(tles, jd, whichconst), errors
+    bad = set([i for i, message in errors])
+    good = [i for i in range(len(tles)) if not i in bad]
+    n = len(jd[0]) * 3
+    r = array('d', [float('nan')]) * (len(tles) * n)
+    if good:
+        part = propagateChunk([tles[i] for i in good], [jd[i] for i in good], whichconst)
+        for k, i in enumerate(good):
+            r[i * n:(i + 1) * n] = array('d', part[k * n:(k + 1) * n])
+    return r, errors
+
+def _propagate(job, half, start, tles, jd, whichconst):
+    """Worker task: propagate and write chunk unless JOB is outdated.
+    Return (JOB, errors), see _computeChunk."""
+    buffers, generation = _shared
+    r, errors = _computeChunk(tles, jd, whichconst)
+    if generation.value == job:
+        _writeChunk(buffers[half], start, r)
+    return job, errors
+
+def _context():
+    """Return multiprocessing context with fork or None.
+    Spawned workers would run the importing demo script again."""
+    try:
+        return multiprocessing.get_context('fork')
+    except AttributeError:
+        return [None, multiprocessing][os.name == 'posix']
+    except ValueError:
+        return None
+
+class SatPool:
+    """Propagate satellite tracks on pool of processes."""
+    chunk = 16    # satellites by task
+    pollms = 40   # poll results interval (in ms)
+
+    def __init__(self, master, processes=None, whichconst='wgs84'):
+        """MASTER Tk widget to poll results by `after`.
+        PROCESSES (opt.) number of workers (default cpu count), 0 runs in mainloop.
+        WHICHCONST (opt.) gravity model name from sgp4.earth_gravity."""
+        self.master = master
+        self.processes = processes
+        self.whichconst = whichconst
+        self.pool = None
+        self.buffers = [array('d'), array('d')]
+        self.capacity = 0
+        self.context = processes != 0 and _context() or None
+        if self.context:
+            self.generation = self.context.RawValue('i', 0)
+        else:
+            self.generation = sharedctypes.RawValue('i', 0)
+        self.done = collections.deque()
+        self.tasks = collections.deque()
+        self.pending = 0
+        self.polling = None
+        self.ondone = self.onfinish = None
+        self.errors = []  # (index, message) of satellites not read
+
+    def __start(self, size):
+        """(Re)start pool with shared buffers of SIZE values at least."""
+        self.close()
+        self.capacity = max(size, 2 * self.capacity)
+        if self.context:
+            try:
+                self.buffers = [self.context.RawArray('d', self.capacity) for i in range(2)]
+                self.pool = self.context.Pool(self.processes, _initWorker, (self.buffers, self.generation))
+                return
+            except (OSError, ImportError):
+                # no semaphores or shared memory, run in mainloop
+                self.context = None
+        self.buffers = [array('d', [0.0]) * self.capacity for i in range(2)]
+
+    def submit(self, tledata, jd, ondone, onfinish=None):
+        """Propagate satellites in background. Drop previous submit.
+        TLEDATA list of `[label, line1, line2]`.
+        JD list of rows of Julian dates (same length) by satellite.
+        ONDONE called in mainloop as ondone(first, positions) by chunk of satellites
+          from index FIRST, see _readChunk.
+        ONFINISH (opt.) called when all chunks are done as onfinish(errors), ERRORS list
+          of `(index, message)` of satellites which TLE can't be read (nan positions).
+          Errors are warned without ONFINISH."""
+        self.generation.value += 1
+        job = self.generation.value
+        half = job % 2
+        steps = len(jd[0]) if jd else 0
+        size = len(tledata) * steps * 3
+        if size > self.capacity or (self.context and not self.pool):
+            self.__start(size)
+        self.ondone, self.onfinish = ondone, onfinish
+        self.done.clear()
+        self.tasks.clear()
+        self.pending = 0
+        self.errors = []
+        for first in range(0, len(tledata), self.chunk):
+            tles = [[line1, line2] for label, line1, line2 in tledata[first:first + self.chunk]]
+            task = (job, half, first * steps * 3, tles, jd[first:first + self.chunk], self.whichconst)
+            info = (job, half, first, len(tles), steps)
+            if self.pool:
+                self.pool.apply_async(_propagate, task, callback=lambda result, info=info: self.done.append(info + (result[1],)))
+            else:
+                self.tasks.append((task, info))
+            self.pending += 1
+        if self.polling is None:
+            self.polling = self.master.after(self.pollms, self.__poll)
+        return job
+
+    def __poll(self):
+        """Hand done chunks to ondone in mainloop."""
+        self.polling = None
+        if self.tasks:
+            # no pool: one chunk by poll
+            (job, half, start, tles, jd, whichconst), info = self.tasks.popleft()
+            r, errors = _computeChunk(tles, jd, whichconst)
+            _writeChunk(self.buffers[half], start, r)
+            self.done.append(info + (errors,))
+        while self.done:
+            job, half, first, count, steps, errors = self.done.popleft()
+            if job != self.generation.value:
+                continue
+            self.pending -= 1
+            self.errors += [(first + i, message) for i, message in errors]
+            self.ondone(first, _readChunk(self.buffers[half], first * steps * 3, count, steps))
+            if not self.pending:
+                if self.onfinish:
+                    self.onfinish(self.errors)
+                elif self.errors:
+                    warnings.warn('SatPool: TLE of %s satellites not read: %s' %
+                                  (len(self.errors), '; '.join(['%s %s' % x for x in self.errors[:3]])))
+        if self.pending > 0:
+            self.polling = self.master.after(self.pollms, self.__poll)
+
+    def cancel(self):
+        """Drop results of current submit."""
+        self.generation.value += 1
+        self.tasks.clear()
+        self.pending = 0
+
+    def close(self):
+        """Stop workers."""
+        if self.pool:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
@@ -8,6 +8,12 @@ See http://stjarnhimlen.se/comp/ppcomp.html.
 __version__ = "0.1"
 
 import time, math, sys
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 D = math.degrees
 R = math.radians
@@ -235,6 +241,135 @@ def Neptune(d):
 def Pluto(d):
     pass
 
+BODIES = {
+    'Sun': lambda d: ecl2eq(*Sun(d) + [d]),
+    'Moon': lambda d: ecl2eq(*Moon(d) + [d]),
+    'Mercury': lambda d: ecl2eq(*ecl_helio2geo(*Mercury(d) + [d]) + [d]),
+    'Venus': lambda d: ecl2eq(*ecl_helio2geo(*Venus(d) + [d]) + [d]),
+    'Mars': lambda d: ecl2eq(*ecl_helio2geo(*Mars(d) + [d]) + [d]),
+    'Jupiter': lambda d: ecl2eq(*ecl_helio2geo(*Jupiter(d) + [d]) + [d]),
+    'Saturn': lambda d: ecl2eq(*ecl_helio2geo(*Saturn(d) + [d]) + [d]),
+    'Uranus': lambda d: ecl2eq(*ecl_helio2geo(*Uranus(d) + [d]) + [d]),
+    'Neptune': lambda d: ecl2eq(*ecl_helio2geo(*Neptune(d) + [d]) + [d]),
+}
+
+def bodyRadec(body, d):
+    """Return list `[ra,dec,r]` of BODY from BODIES by formulae.
+    D day's fractions from epoch."""
+    return eq2radec(*BODIES[body](d))
+
+def chebFit(f, a, b, degree):
+    """Return Chebyshev coefficients of vector function F on [A, B].
+    F returns list `[x,y,z]`."""
+    n = degree + 1
+    nodes = [math.cos(math.pi * (k + 0.5) / n) for k in range(n)]
+    values = [f(0.5 * (b - a) * x + 0.5 * (b + a)) for x in nodes]
+    coeffs = []
+    for i in range(3):
+        coeffs.append([2.0 / n * sum([v[i] * math.cos(math.pi * j * (k + 0.5) / n) for k, v in enumerate(values)])
+                       for j in range(n)])
+    return coeffs
+
+def chebEval(coeffs, x):
+    """Return value of Chebyshev series COEFFS at X in [-1, 1] (Clenshaw).
+    X number or numpy array."""
+    b1 = b2 = 0.0
+    for c in coeffs[:0:-1]:
+        b1, b2 = 2.0 * x * b1 - b2 + c, b1
+    return x * b1 - b2 + 0.5 * coeffs[0]
+
+class Ephemeris:
+    """RA, Dec of BODIES from Chebyshev polynomials.
+    Geocentric equatorial rectangular coordinates of body are fitted by segments
+    of SPANS days on first query and checked against formulae, the segment
+    is split while error is over TOLERANCE."""
+    degree = 12
+    tolerance = 1e-6  # max. angular error (in radians)
+    spans = {'Moon': 8.0, 'Sun': 128.0, 'Mercury': 32.0, 'Venus': 64.0, 'Mars': 64.0}
+    span = 128.0      # default span of segment (in days)
+    minspan = 1 / 16.0
+
+    def __init__(self, bodies=BODIES):
+        """BODIES (opt.) dict of functions of geocentric equatorial rect. `[x,y,z]` by day."""
+        self.bodies = bodies
+        self.segments = {} # (body, k): [[a, b, coeffs],...]
+        self.last = {}     # (body, d): [ra, dec, r] of recent queries
+
+    def prepare(self, d0, d1, bodies=None):
+        """Fit segments of BODIES (default all) for days D0..D1."""
+        for body in bodies or self.bodies:
+            span = self.spans.get(body, self.span)
+            for k in range(int(math.floor(d0 / span)), int(math.floor(d1 / span)) + 1):
+                self.__segment(body, k)
+
+    def __segment(self, body, k):
+        """Return pieces `[a, b, coeffs]` of segment K of BODY."""
+        key = (body, k)
+        if key not in self.segments:
+            span = self.spans.get(body, self.span)
+            self.segments[key] = self.__fit(self.bodies[body], k * span, (k + 1) * span)
+        return self.segments[key]
+
+    def __fit(self, f, a, b):
+        """Return pieces `[a, b, coeffs]` fitting F on [A, B] within tolerance."""
+        coeffs = chebFit(f, a, b, self.degree)
+        if b - a > self.minspan:
+            n = 2 * self.degree + 3
+            for i in range(1, n):
+                d = a + (b - a) * i / float(n)
+                if self.__error(f(d), [chebEval(c, (2.0 * d - a - b) / (b - a)) for c in coeffs]) > self.tolerance:
+                    return self.__fit(f, a, 0.5 * (a + b)) + self.__fit(f, 0.5 * (a + b), b)
+        return [[a, b, coeffs]]
+
+    def __error(self, p, q):
+        """Return angle between vectors P and Q."""
+        cross = [p[1]*q[2] - p[2]*q[1], p[2]*q[0] - p[0]*q[2], p[0]*q[1] - p[1]*q[0]]
+        return math.atan2(math.sqrt(sum([x*x for x in cross])), sum([x*y for x, y in zip(p, q)]))
+
+    def rect(self, body, d):
+        """Return geocentric equatorial rect. `[x,y,z]` of BODY at day D."""
+        span = self.spans.get(body, self.span)
+        for a, b, coeffs in self.__segment(body, int(math.floor(d / span))):
+            if d < b:
+                break
+        x = (2.0 * d - a - b) / (b - a)
+        x2 = 2.0 * x
+        # Clenshaw by x, y, z at once
+        b1x = b1y = b1z = b2x = b2y = b2z = 0.0
+        for cx, cy, cz in list(zip(*coeffs))[:0:-1]:
+            b1x, b2x = x2 * b1x - b2x + cx, b1x
+            b1y, b2y = x2 * b1y - b2y + cy, b1y
+            b1z, b2z = x2 * b1z - b2z + cz, b1z
+        return [x * b1x - b2x + 0.5 * coeffs[0][0],
+                x * b1y - b2y + 0.5 * coeffs[1][0],
+                x * b1z - b2z + 0.5 * coeffs[2][0]]
+
+    def radec(self, body, d):
+        """Return list `[ra,dec,r]` of BODY at day D (see timeScale).
+        D sequence of days to return `[ra,dec,r]` arrays (numpy or array('d'))."""
+        if not hasattr(d, '__len__'):
+            key = (body, d)
+            if key not in self.last:
+                if len(self.last) > 1024:
+                    self.last.clear()
+                self.last[key] = eq2radec(*self.rect(body, d))
+            return list(self.last[key])
+        if numpy is None:
+            radec = [eq2radec(*self.rect(body, x)) for x in d]
+            return [array('d', [v[i] for v in radec]) for i in range(3)]
+        d = numpy.asarray(d, dtype=float)
+        span = self.spans.get(body, self.span)
+        xyz = numpy.empty((3, len(d)))
+        for k in numpy.unique(numpy.floor(d / span)).tolist():
+            for a, b, coeffs in self.__segment(body, int(k)):
+                mask = (d >= a) & (d < b)
+                if mask.any():
+                    x = (2.0 * d[mask] - a - b) / (b - a)
+                    for i in range(3):
+                        xyz[i][mask] = chebEval(coeffs[i], x)
+        x, y, z = xyz
+        return [numpy.arctan2(y, x), numpy.arctan2(z, numpy.sqrt(x*x + y*y)), numpy.sqrt(x*x + y*y + z*z)]
+
 if __name__ == '__main__':
     d = timeScale(1990, 4, 19)
     print('d', d)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+#-*- coding: utf8 -*-
+"""
+Day/night terminator and twilight layers on dbCarta.
+Areas where the Sun is under horizon (civil twilight), under -6, -12 degrees
+(nautical, astronomical twilight) and -18 degrees (night) are drawn one over
+another by layers TWILIGHT of dbCarta.mopt.
+"""
+
+import math
+from utils.solar import bodyRadec, timeScale, P1
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TWILIGHT = [['.CivilTwilight', 0.0],
+            ['.NauticalTwilight', -6.0],
+            ['.AstronomicalTwilight', -12.0],
+            ['.Night', -18.0]]
+
+def siderealDeg(d):
+    """Return Greenwich mean sidereal time (in degrees 0..360).
+    D day's fractions from epoch, see timeScale."""
+    return P1(280.46061837 + 360.98564736629 * (d - 1.5))
+
+def subSolar(d, ephemeris=None):
+    """Return `[lon, lat]` of subsolar point (in degrees).
+    D day's fractions from epoch, see timeScale.
+    EPHEMERIS (opt.) Ephemeris to compute Sun position."""
+    if ephemeris:
+        ra, dec, r = ephemeris.radec('Sun', d)
+    else:
+        ra, dec, r = bodyRadec('Sun', d)
+    return [P1(math.degrees(ra) - siderealDeg(d) + 180) - 180, math.degrees(dec)]
+
+def terminatorRings(lon, lat, altitudes, n=360):
+    """Return list of rings by altitude of areas where Sun is lower than altitude.
+    Rings of all altitudes are computed by one pass over longitude grid.
+    Area with pole is ring `[[lon, lat],...]` along meridians -180..180 closed by pole,
+    other one (island) is ring by meridians crossing it and its copy shifted
+    by 360 degrees if it crosses 180 meridian (else copy is collapsed to point).
+    LON, LAT subsolar point (in degrees), see subSolar.
+    ALTITUDES list of Sun altitudes (in degrees).
+    N (opt.) steps of longitude grid."""
+    dec = math.radians(lat)
+    lon0 = math.radians(lon)
+    anti = lon0 + math.pi
+    # pole of area: 1 north, -1 south, 0 island
+    poles, widths = [], []
+    for h in altitudes:
+        h = math.radians(h)
+        poles.append([[0, -1][dec > -h], 1][dec < h])
+        # half width of island by longitude
+        widths.append(math.asin(min(1.0, math.cos(h) / max(math.cos(dec), 1e-12))))
+    if numpy is not None:
+        u = numpy.linspace(-1.0, 1.0, n + 1)
+        p = numpy.array(poles, dtype=float)[:, None]
+        grid = numpy.where(p != 0, math.pi * u, anti + numpy.array(widths)[:, None] * u)
+        h = numpy.radians(numpy.array(altitudes, dtype=float))[:, None]
+        a = math.sin(dec)
+        b = math.cos(dec) * numpy.cos(grid - lon0)
+        r = numpy.hypot(a, b)
+        q = numpy.sin(h) / numpy.maximum(r, 1e-12)
+        alpha = numpy.arctan2(a, b)
+        beta = numpy.arccos(numpy.clip(q, -1.0, 1.0))
+        lat1 = (alpha + beta + math.pi) % (2 * math.pi) - math.pi
+        lat2 = (alpha - beta + math.pi) % (2 * math.pi) - math.pi
+        valid1 = numpy.abs(lat1) <= math.pi / 2 + 1e-9
+        valid2 = numpy.abs(lat2) <= math.pi / 2 + 1e-9
+        # boundary on meridians of area with pole: nearest crossing to opposite pole
+        edge = numpy.where(p > 0, numpy.maximum(lat1, lat2), numpy.minimum(lat1, lat2))
+        edge = numpy.where(valid1 & valid2, edge, numpy.where(valid1, lat1, numpy.where(valid2, lat2, p * math.pi / 2)))
+        edge = numpy.where(q >= 1.0, -p * math.pi / 2, numpy.where(q <= -1.0, p * math.pi / 2, edge))
+        upper = numpy.degrees(numpy.clip(numpy.where(p != 0, edge, numpy.maximum(lat1, lat2)), -math.pi / 2, math.pi / 2)).tolist()
+        lower = numpy.degrees(numpy.clip(numpy.minimum(lat1, lat2), -math.pi / 2, math.pi / 2)).tolist()
+        grid = numpy.degrees(grid).tolist()
+    else:
+        u = [-1.0 + 2.0 * i / n for i in range(n + 1)]
+        grid, upper, lower = [], [], []
+        for h, pole, width in zip(altitudes, poles, widths):
+            h = math.radians(h)
+            row = [[anti + width * x, math.pi * x][pole != 0] for x in u]
+            grid.append([math.degrees(x) for x in row])
+            upper.append([])
+            lower.append([])
+            for x in row:
+                a, b = math.sin(dec), math.cos(dec) * math.cos(x - lon0)
+                r = math.hypot(a, b)
+                q = math.sin(h) / max(r, 1e-12)
+                alpha = math.atan2(a, b)
+                beta = math.acos(min(1.0, max(-1.0, q)))
+                lats = [(alpha + beta + math.pi) % (2 * math.pi) - math.pi,
+                        (alpha - beta + math.pi) % (2 * math.pi) - math.pi]
+                valid = [y for y in lats if abs(y) <= math.pi / 2 + 1e-9]
+                if pole == 0:
+                    edge = max(lats)
+                elif q >= 1.0:
+                    edge = -pole * math.pi / 2
+                elif q <= -1.0 or not valid:
+                    edge = pole * math.pi / 2
+                else:
+                    edge = [min, max][pole > 0](valid)
+                upper[-1].append(math.degrees(min(math.pi / 2, max(-math.pi / 2, edge))))
+                lower[-1].append(math.degrees(min(math.pi / 2, max(-math.pi / 2, min(lats)))))
+    rings = []
+    for pole, x, y0, y1 in zip(poles, grid, upper, lower):
+        if pole:
+            ring = [[lon, lat] for lon, lat in zip(x, y0)] + [[180.0, 90.0 * pole], [-180.0, 90.0 * pole]]
+            rings.append([ring, ring[:1]])
+        else:
+            ring = [[lon, lat] for lon, lat in zip(x, y0)] + [[lon, lat] for lon, lat in zip(x[::-1], y1[::-1])]
+            # center of island in -180..180, copy across 180 meridian
+            offset = [0, -360][x[0] + x[-1] > 360]
+            ring = [[lon + offset, lat] for lon, lat in ring]
+            shift = [[0, 360][x[0] + offset < -180], -360][x[-1] + offset > 180]
+            rings.append([ring, [[lon + shift, lat] for lon, lat in ring] if shift else ring[:1]])
+    return rings
+
+def _vector(lon, lat):
+    """Return unit vector of point LON, LAT (in radians)."""
+    return [math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)]
+
+def _cross(a, b):
+    return [a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]]
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+def _circle(o, u, v, r, ts):
+    """Return list of `[lon, lat]` (in degrees) of points on circle of angular radius
+    R (in radians) around unit vector O at angles TS from unit vector U to V (both orthogonal to O)."""
+    cr, sr = math.cos(r), math.sin(r)
+    if numpy is not None:
+        ts = numpy.array(ts, dtype=float)[:, None]
+        p = cr * numpy.array(o) + sr * (numpy.cos(ts) * numpy.array(u) + numpy.sin(ts) * numpy.array(v))
+        return numpy.degrees(numpy.column_stack([numpy.arctan2(p[:, 1], p[:, 0]),
+                                                 numpy.arcsin(numpy.clip(p[:, 2], -1.0, 1.0))])).tolist()
+    ring = []
+    for t in ts:
+        ct, st = math.cos(t), math.sin(t)
+        p = [cr * o[i] + sr * (ct * u[i] + st * v[i]) for i in range(3)]
+        ring.append([math.degrees(math.atan2(p[1], p[0])), math.degrees(math.asin(min(1.0, max(-1.0, p[2]))))])
+    return ring
+
+def terminatorLimbRings(lon, lat, altitudes, center, n=360):
+    """Return list of rings by altitude of visible parts of areas where Sun is lower than
+    altitude on Globe (see terminatorRings). Area is cap around antisolar point, its visible
+    part is arc of cap border in front of Globe closed by arc of limb (Globe border).
+    Area out of view is collapsed to antisolar point, copy of ring is collapsed to point.
+    LON, LAT subsolar point (in degrees), see subSolar.
+    ALTITUDES list of Sun altitudes (in degrees).
+    CENTER view center `[lon, lat]` of Globe (in degrees), see dbCarta.centerOf.
+    N (opt.) steps of ring."""
+    alon, alat = P1(lon + 360) - 180, -lat
+    a = _vector(math.radians(alon), math.radians(alat))
+    c = _vector(math.radians(center[0]), math.radians(center[1]))
+    cos_d = max(-1.0, min(1.0, _dot(a, c)))
+    sin_d = math.sqrt(1 - cos_d * cos_d)
+    # frames of cap (around a) and limb (around c) by plane of a, c
+    if sin_d > 1e-12:
+        u = [(c[i] - cos_d * a[i]) / sin_d for i in range(3)]
+        u1 = [(a[i] - cos_d * c[i]) / sin_d for i in range(3)]
+    else:
+        u = u1 = _cross(a, [[1.0, 0, 0], [0, 0, 1.0]][abs(a[2]) < 0.9])
+        u = u1 = [x / math.sqrt(_dot(u, u)) for x in u]
+    v, v1 = _cross(a, u), _cross(c, u1)
+    # limb inside of Globe edge to keep its points visible
+    e = 1e-9
+    limb = math.acos(e)
+    rings = []
+    for h in altitudes:
+        rho = math.radians(90.0 + h)
+        # angle of cap border crossing limb from u
+        k = (e - math.cos(rho) * cos_d) / (math.sin(rho) * max(sin_d, 1e-12))
+        if k <= -1.0:
+            # cap in front of Globe
+            ring = _circle(a, u, v, rho, [2 * math.pi * i / n for i in range(n)])
+        elif k >= 1.0:
+            if cos_d > math.cos(rho):
+                # Globe in cap
+                ring = _circle(c, u1, v1, limb, [2 * math.pi * i / n for i in range(n)])
+            else:
+                ring = [[alon, alat]]
+        else:
+            t0 = math.acos(k)
+            ring = _circle(a, u, v, rho, [t0 * (2.0 * i / n - 1) for i in range(n + 1)])
+            # limb arc between ends of cap border through nearest point to antisolar one
+            ends = []
+            for lon1, lat1 in (ring[-1], ring[0]):
+                p = _vector(math.radians(lon1), math.radians(lat1))
+                ends.append(math.atan2(_dot(p, v1), _dot(p, u1)))
+            ring += _circle(c, u1, v1, limb, [ends[0] + (ends[1] - ends[0]) * i / n for i in range(1, n)])
+        rings.append([ring, ring[:1]])
+    return rings
+
+class Terminator:
+    """Twilight layers on dbCarta by UTC updated in place (see dbCarta.updateCartaMany).
+    Rings are cached by minute of time and view center of Globe. Layers on Globe are
+    updated by changeProject event (drag and turn)."""
+    steps = 360  # steps of longitude grid
+    cachesize = 64
+
+    def __init__(self, dbcarta, ephemeris=None, layers=TWILIGHT):
+        """DBCARTA dbCarta to draw.
+        EPHEMERIS (opt.) Ephemeris to compute Sun position (default by formulae).
+        LAYERS (opt.) list of `[layer, altitude]` (layer from mopt, altitude in degrees)."""
+        self.dbcarta = dbcarta
+        self.ephemeris = ephemeris
+        self.layers = layers
+        self.cache = {}  # (minute, center): rings
+        self.ftags = []  # tags of objects in mflood by ring
+        self.last = None # first ring drawn
+        self.gmtm = None # time drawn
+        dbcarta.bindEvent('changeProject.Before', self.__changeProject)
+
+    def rings(self, gmtm):
+        """Return list of rings of layers at GMTM (Y, M, D, h, m, s) by minute.
+        Rings on Globe are visible parts of layers, see terminatorLimbRings."""
+        minute = tuple(gmtm[:5])
+        center = None
+        if self.dbcarta.isSpherical():
+            center = tuple(self.dbcarta.centerOf()[0])
+        if (minute, center) not in self.cache:
+            if len(self.cache) > self.cachesize:
+                self.cache.clear()
+            lon, lat = subSolar(timeScale(*minute), self.ephemeris)
+            altitudes = [h for layer, h in self.layers]
+            if center is None:
+                self.cache[minute, center] = terminatorRings(lon, lat, altitudes, self.steps)
+            else:
+                self.cache[minute, center] = terminatorLimbRings(lon, lat, altitudes, center, self.steps)
+        return self.cache[minute, center]
+
+    def update(self, gmtm):
+        """Draw twilight layers at GMTM (Y, M, D, h, m, s). Move objects drawn before."""
+        self.gmtm = gmtm
+        rings = [ring for pair in self.rings(gmtm) for ring in pair]
+        if self.ftags and all([ftag in self.dbcarta.mflood for ftag in self.ftags]):
+            if self.last is not rings[0]:
+                self.dbcarta.updateCartaMany(dict(zip(self.ftags, rings)))
+        else:
+            self.clear()
+            data = []
+            for i, ring in enumerate(rings):
+                data.append((self.layers[i // 2][0], 'terminator%s' % i, ring))
+            self.dbcarta.loadCarta(data)
+            ftags = {}
+            for layer, h in self.layers:
+                for ftag in self.dbcarta.layers.members(layer):
+                    ftags[ftag.split('_', 2)[2]] = ftag
+            self.ftags = [ftags['terminator%s' % i] for i in range(len(rings))]
+        self.last = rings[0]
+
+    def __changeProject(self, event):
+        """Update drawn layers by new projection or view center of Globe."""
+        if self.ftags:
+            self.update(self.gmtm)
+
+    def clear(self):
+        """Delete twilight layers."""
+        self.dbcarta.clearCarta(*self.ftags)
+        self.ftags = []
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Well-Known Text (WKT) parsing benchmark.
+Compare parseWKT, iterWKT with old regex and eval parser on multi-megabyte WKT.
+Usage: wktbench.py [megabytes]
+"""
+
+from __init__ import *
+from dbcarta import *
+import io, random
+
+def evalWKT(wkt):
+    """Old fromWKT with regex and eval."""
+    r = '(-?\\d+\\.?\\d*)[ \t]+[ \t]*(-?\\d+\\.?\\d*)'
+    r1 = '((?:POINT|MULTIPOINT|LINESTRING|MULTILINESTRING|POLYGON|MULTIPOLYGON)[^a-zA-Z]+)'
+    wkt = wkt.replace("(", "[").replace(")", "]")
+    tp = wkt[:wkt.find("[")]
+    if (tp in ('GEOMETRYCOLLECTION')):
+        m = re.findall(r1, wkt[:len(wkt)-1])
+        coords = []
+        for x in m:
+            coords += evalWKT(x.rstrip(","))
+        return coords
+    try:
+        e = eval(re.sub(r, '[\\1,\\2]', wkt[wkt.find("["):]))
+    except:
+        return
+    if (tp in ('MULTIPOINT')):
+        return [[tp, [[[x]] for x in e]]]
+    if (tp in ('POINT', 'LINESTRING')):
+        return [[tp, [[e]]]]
+    if (tp in ('MULTILINESTRING', 'POLYGON')):
+        return [[tp, [e]]]
+    if (tp in ('MULTIPOLYGON')):
+        return [[tp, e]]
+
+def ring(n):
+    """Random closed ring of N points as WKT coords."""
+    x0, y0 = random.uniform(-170, 170), random.uniform(-80, 80)
+    pts = ['%.13f %.13f' % (x0 + cos(2 * pi * i / n) * random.uniform(1, 5), y0 + sin(2 * pi * i / n) * random.uniform(1, 5)) for i in range(n)]
+    return ','.join(pts + pts[:1])
+
+def polygons(size):
+    """List of polygons as WKT about SIZE bytes."""
+    polygons = []
+    length = 0
+    while length < size:
+        polygons += ['POLYGON((%s))' % ring(random.randint(50, 500))]
+        length += len(polygons[-1])
+    return polygons
+
+def bench(name, func, *args):
+    t = time.time()
+    n = func(*args)
+    print('%-30s %8.3f sec, %d geometries' % (name, time.time() - t, n))
+
+if __name__ == '__main__':
+    random.seed(1)
+    size = int(float(sys.argv[1:] and sys.argv[1] or 4) * 1024 * 1024)
+    data = polygons(size)
+    wkt = 'GEOMETRYCOLLECTION(%s)' % ','.join(data)
+    print('WKT %.1f Mb' % (len(wkt) / 1024.0 / 1024.0))
+    bench('regex + eval', lambda: len(evalWKT(wkt)))
+    bench('parseWKT', lambda: len(parseWKT(wkt)))
+    bench('iterWKT', lambda: len(list(iterWKT(io.BytesIO('\n'.join(data).encode('ascii'))))))